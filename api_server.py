@@ -1,11 +1,16 @@
 import os
+import re
 import tempfile
 import uvicorn
 import json
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import zipfile
+import time
+import asyncio
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
-import shutil
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from typing import Optional, List
+from pydantic import BaseModel
 import logging
 import sys
 from pathlib import Path
@@ -28,6 +33,32 @@ logger = logging.getLogger(__name__)
 from pdf_extract.CertificateParses import process_pdf_with_openai
 from find_specifications.spec_finder import research_specifications
 from final_analysis.calibration_analyzer import perform_analysis
+try:
+    # Optional second research provider, used to hedge slow research requests
+    from find_specifications import gemini_spec_finder
+except ImportError:
+    gemini_spec_finder = None
+from result_cache import ResultCache, hash_prompts, make_cache_key
+from spec_store import SpecStore, is_cacheable, make_spec_key, merge_specifications, SOURCE_AI, SOURCE_MANUAL
+from stage_executor import StageExecutor, StageTimeoutError
+from job_manager import JobManager, JobQueueFullError, STATUS_QUEUED, STATUS_RUNNING, STATUS_COMPLETED, STATUS_FAILED
+from batch_processor import expand_uploads, stream_batch, SharedResearch
+from instrument_fanout import split_instruments, fan_out, aggregate_instrument_results, instrument_label
+from tolerance_engine import evaluate_certificate, build_local_result, merge_results
+from pdf_preextract import preextract_pdf, is_complete, to_certificate_data, reduce_pdf, DEFAULT_MAX_PAGES
+from spec_research import SpecResearcher, SpecSource, KIND_AI, KIND_MANUAL
+from manual_library import ManualLibrary
+from run_store import RunStore, plan_reanalysis, stage_prompt_versions
+from singleflight import SingleFlight
+from llm_batch import current_batch_analyzer
+from prompt_renderer import (
+    PromptRenderer, trim_specifications, estimate_tokens, compact_json, tested_parameters, uncovered_parameters,
+    specification_group_words,
+)
+from metrics import (
+    RequestTimings, current_timings, record_cache, record_llm_usage, record_stage, render_metrics,
+    REQUEST_DURATION, STAGE_ACTIVE, STAGE_WAITING, JOBS,
+)
 
 app = FastAPI(title="Calibration Analyzer API", 
               description="API for analyzing calibration certificates",
@@ -40,23 +71,557 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["Server-Timing", "X-Cache"],
 )
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    """Observe the duration of every request, labelled by route template rather than raw path"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_DURATION.observe(time.perf_counter() - started, method=request.method,
+                                 route=getattr(route, "path", "unmatched"), status=status)
+
+# Prompt templates are loaded and validated once at startup
+prompt_renderer = PromptRenderer.from_env()
+PROMPTS_VERSION = hash_prompts()
+
+# Whole-result cache for repeated submissions of the same certificate
+result_cache = ResultCache.from_env()
+
+# Specifications persisted per manufacturer/model/equipment type
+spec_store = SpecStore.from_env()
+
+# Stage artifacts of every run, for re-analysis without redoing extraction and research
+run_store = RunStore.from_env()
+
+# Identical concurrent requests share one pipeline run, and one research call per model
+pipeline_flight = SingleFlight("pipeline")
+research_flight = SingleFlight("research")
+
+# Blocking pipeline stages run on a worker pool with per-stage limits
+stage_executor = StageExecutor.from_env()
+
+# Specification sources are queried concurrently with per-source deadlines and hedging
+spec_researcher = SpecResearcher.from_env(stage_executor)
+research_providers = [("spec_finder", research_specifications)]
+if getattr(gemini_spec_finder, "research_specifications", None):
+    research_providers.append(("gemini", gemini_spec_finder.research_specifications))
+elif os.getenv("SPEC_HEDGE_SAME_PROVIDER", "false").lower() in ("1", "true", "yes"):
+    research_providers.append(("spec_finder", research_specifications))
+spec_researcher.register(SpecSource(SOURCE_AI, KIND_AI, research_providers))
+
+# Indexed manufacturer manuals answer stage 2 locally when the library covers the instrument
+manual_library = ManualLibrary.from_env()
+spec_researcher.register(SpecSource(SOURCE_MANUAL, KIND_MANUAL, [("manual_library", manual_library.research)],
+                                    deadline=float(os.getenv("SPEC_DEADLINE_MANUAL_EXTRACTION", "10")), local=True))
+MANUAL_LIBRARY_INDEX_ON_STARTUP = os.getenv("MANUAL_LIBRARY_INDEX_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Decide common tolerance checks locally instead of asking the LLM
+LOCAL_TOLERANCE_ENGINE = os.getenv("LOCAL_TOLERANCE_ENGINE", "true").lower() in ("1", "true", "yes")
+
+# Upload size limits; uploads are read from Starlette's spooled buffer straight into memory
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024)
+MAX_BATCH_UPLOAD_BYTES = int(float(os.getenv("MAX_BATCH_UPLOAD_MB", "1024")) * 1024 * 1024)
+
+# Skip the LLM extractor when the local PyMuPDF parse finds the instrument and its test points
+PREEXTRACT_SKIP_LLM = os.getenv("PREEXTRACT_SKIP_LLM", "true").lower() in ("1", "true", "yes")
+PREEXTRACT_MAX_PAGES = int(os.getenv("PREEXTRACT_MAX_PAGES", str(DEFAULT_MAX_PAGES)))
+
+# Seconds a client is asked to wait before resubmitting when the job queue is full
+JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "30"))
+
+# Certificates of one batch that may be in progress at the same time
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", "16"))
+
+# Instruments of one multi-instrument certificate researched and analyzed at the same time
+INSTRUMENT_MAX_IN_FLIGHT = int(os.getenv("INSTRUMENT_MAX_IN_FLIGHT", "4"))
+
+class SpecPrewarmItem(BaseModel):
+    """An instrument whose specifications should be loaded into the spec store"""
+    manufacturer: str
+    model: str
+    equipment_type: str = ""
+    specifications: Optional[dict] = None
+    source: Optional[str] = None
+    ttl_days: Optional[float] = None
+
+class ReanalyzeRequest(BaseModel):
+    """New inputs for re-analyzing a stored run"""
+    custom_instructions: Optional[str] = None
+    force: List[str] = []
+
 @app.get("/")
 async def root():
     """Root endpoint to verify the API is running"""
     return {"message": "Calibration Analyzer API is running"}
 
+async def read_upload(upload, max_bytes):
+    """Read an upload from its spooled buffer, rejecting anything larger than max_bytes"""
+    data = await upload.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise HTTPException(status_code=413,
+                            detail=f"{upload.filename} exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+    return data
+
+async def in_thread(func, *args):
+    """Run a blocking call (e.g. a SQLite store) on a worker thread so the event loop keeps serving"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+async def extract_certificate_data(pdf_bytes):
+    """Stage 1: extract structured certificate data from the PDF bytes"""
+    # Parse the PDF locally first; the LLM is only needed when that parse is incomplete
+    payload = pdf_bytes
+    try:
+        preextraction = await stage_executor.run("preextraction", preextract_pdf, pdf_bytes, PREEXTRACT_MAX_PAGES)
+        if PREEXTRACT_SKIP_LLM and is_complete(preextraction):
+            logger.info("Local pre-extraction is complete, skipping LLM extraction")
+            return to_certificate_data(preextraction)
+        payload = await stage_executor.run("preextraction", reduce_pdf, pdf_bytes, preextraction)
+    except Exception as e:
+        logger.warning(f"Local pre-extraction failed, sending the full PDF to the extractor: {str(e)}")
+        preextraction = None
+        payload = pdf_bytes
+    
+    # The extractor reads from a path, so only now does the PDF touch the disk
+    timings = current_timings.get() or RequestTimings()
+    with timings.phase("temp_file"):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+            temp_file.write(payload)
+            temp_file_path = temp_file.name
+    
+    try:
+        certificate_data = await stage_executor.run("extraction", process_pdf_with_openai, temp_file_path, llm=True)
+    finally:
+        # Clean up the temporary file
+        try:
+            os.unlink(temp_file_path)
+        except OSError:
+            pass
+    
+    if not certificate_data or isinstance(certificate_data, list) and "error" in certificate_data[0]:
+        logger.error(f"Error extracting certificate data: {certificate_data}")
+        raise HTTPException(status_code=422, detail="Failed to extract data from certificate")
+    # The extractor does not report usage; estimate it from the page text sent and the data returned
+    sent_pages = preextraction["relevant_pages"] if preextraction and payload is not pdf_bytes else None
+    page_text = "".join(
+        text for index, text in enumerate(preextraction["pages"]) if sent_pages is None or index in sent_pages
+    ) if preextraction else ""
+    record_llm_usage("extraction", estimate_tokens(page_text), estimate_tokens(compact_json(certificate_data)))
+    return certificate_data
+
+def get_instrument_info(certificate_data):
+    """Return (manufacturer, model, equipment_type) of the first certificate"""
+    cert = certificate_data[0] if isinstance(certificate_data, list) and len(certificate_data) > 0 else certificate_data
+    manufacturer = cert.get("Manufacturer", "Unknown Manufacturer")
+    model = cert.get("Model", "Unknown Model")
+    equipment_type = cert.get("EquipmentType", "Unknown Type")
+    return manufacturer, model, equipment_type
+
+async def find_specifications(certificate_data, manufacturer, model, equipment_type, prompt_sizes=None):
+    """
+    Stage 2: research specifications, reusing stored specs for known models
+
+    Stored specifications may come from an earlier certificate that tested other parameters;
+    when they do not cover every parameter of this one, research runs again and the new
+    groups are merged into the stored entry.
+    """
+    if not is_cacheable(manufacturer, model):
+        return await research_and_store_specifications(
+            certificate_data, manufacturer, model, equipment_type, prompt_sizes
+        )
+    stored = await in_thread(spec_store.get, manufacturer, model, equipment_type)
+    uncovered = uncovered_parameters(certificate_data, specification_group_words(stored)) if stored else None
+    record_cache("spec_store", bool(stored) and not uncovered)
+    if stored and not uncovered:
+        logger.info(f"Using stored specifications for {manufacturer} {model}")
+        return stored
+    if stored:
+        logger.info(f"Stored specifications for {manufacturer} {model} do not cover {', '.join(uncovered)}, "
+                    f"researching again")
+    # Concurrent certificates of the same instrument and tested parameters wait for one research call
+    key = "|".join([make_spec_key(manufacturer, model, equipment_type),
+                    ",".join(sorted(tested_parameters(certificate_data)))])
+    specifications, _ = await research_flight.do(key, lambda: research_and_store_specifications(
+        certificate_data, manufacturer, model, equipment_type, prompt_sizes, stored
+    ))
+    return specifications
+
+async def research_and_store_specifications(certificate_data, manufacturer, model, equipment_type, prompt_sizes=None,
+                                            stored=None):
+    """
+    Research specifications from the registered sources and keep complete results in the spec store
+
+    stored, the spec store entry for the instrument if any, keeps the groups that this
+    research did not return.
+    """
+    # Research only needs to know which parameters were tested, not every test point
+    research_input = prompt_renderer.fit_research_input(certificate_data)
+    cert = research_input[0] if isinstance(research_input, list) and research_input else research_input
+    research_size = prompt_renderer.measure(
+        "specification_research/gemini_research",
+        manufacturer=manufacturer, model=model, equipment_type=equipment_type,
+        description=str(cert.get("Description", "")), operating_range=str(cert.get("OperatingRange", "")),
+        certificate_data=research_input
+    )
+    if prompt_sizes is not None:
+        prompt_sizes["research"] = research_size
+    
+    logger.info("Researching specifications...")
+    specifications = await spec_researcher.research(research_input)
+    if not specifications:
+        logger.error("Failed to get specifications")
+        raise HTTPException(status_code=422, detail="Failed to retrieve specifications for the equipment")
+    attempts = sum(len(source["attempts"]) for source in specifications["research"]["sources"] if not source["local"])
+    if attempts:
+        record_llm_usage("research", research_size["estimated_tokens"] * attempts,
+                         estimate_tokens(compact_json(specifications)))
+    elif prompt_sizes is not None:
+        # Answered from a local source, so no research prompt was sent
+        prompt_sizes.pop("research", None)
+    # Degraded results are missing a source, so they are not kept for the next certificate of this model
+    if is_cacheable(manufacturer, model) and not specifications["research"]["degraded"]:
+        if stored:
+            specifications = merge_specifications(stored, specifications)
+        await in_thread(spec_store.put, manufacturer, model, equipment_type, specifications)
+    return specifications
+
+def combine_analysis_results(results):
+    """Combine the analysis results of several certificate chunks into one result"""
+    if len(results) == 1:
+        return results[0]
+    verdicts = [str(result.get("verdict", "")).upper() for result in results]
+    if "FAIL" in verdicts:
+        verdict = "FAIL"
+    elif all(verdict == "PASS" for verdict in verdicts):
+        verdict = "PASS"
+    else:
+        verdict = "CANNOT_VERIFY"
+    confidences = [str(result.get("confidence", "")).upper() for result in results]
+    confidence = next((level for level in ("LOW", "MEDIUM", "HIGH") if level in confidences), "LOW")
+    return {
+        "verdict": verdict,
+        "confidence": confidence,
+        "analysis": "\n\n".join(str(result.get("analysis", "")) for result in results if result.get("analysis")),
+        "calculations": [calc for result in results for calc in result.get("calculations") or []],
+        "discrepancies": [disc for result in results for disc in result.get("discrepancies") or []],
+        "spec_source": next((result["spec_source"] for result in results if result.get("spec_source")), ""),
+        "summary": " ".join(str(result.get("summary", "")) for result in results if result.get("summary")),
+    }
+
+async def run_llm_analysis(certificate_data, specifications, custom_instructions=None, prompt_sizes=None):
+    """Run perform_analysis on compact, budget-sized prompts, one call per chunk of test points"""
+    specifications = trim_specifications(specifications, certificate_data)
+    chunks = prompt_renderer.chunk_analysis_input(certificate_data, specifications)
+    sizes = [
+        prompt_renderer.measure("final_analysis/analysis_prompt", certificate_data=chunk,
+                                specifications=specifications)
+        for chunk in chunks
+    ]
+    # perform_analysis appends the custom instructions to every prompt
+    extra = custom_instructions or ""
+    analysis_size = {
+        "chunks": len(chunks),
+        "chars": sum(size["chars"] for size in sizes) + len(extra) * len(chunks),
+        "estimated_tokens": sum(size["estimated_tokens"] for size in sizes) + estimate_tokens(extra) * len(chunks),
+    }
+    if prompt_sizes is not None:
+        prompt_sizes["analysis"] = analysis_size
+    batch_analyzer = current_batch_analyzer.get()
+    if batch_analyzer is not None:
+        # Offline re-verification sends the prompts as provider batch jobs instead
+        results = await asyncio.gather(*(
+            batch_analyzer.analyze(chunk, specifications, custom_instructions) for chunk in chunks
+        ))
+    else:
+        results = await asyncio.gather(*(
+            stage_executor.run("analysis", perform_analysis, chunk, specifications, custom_instructions, llm=True)
+            for chunk in chunks
+        ))
+    record_llm_usage("analysis", analysis_size["estimated_tokens"],
+                     sum(estimate_tokens(compact_json(result)) for result in results))
+    return combine_analysis_results(list(results))
+
+async def analyze_with_tolerance_engine(certificate_data, specifications, custom_instructions=None, prompt_sizes=None):
+    """
+    Stage 3: decide as many test points as possible locally and ask the LLM only about the rest
+    
+    Custom instructions can change how tolerances must be judged, so they always go to the LLM.
+    """
+    local = None
+    if LOCAL_TOLERANCE_ENGINE and not custom_instructions:
+        timings = current_timings.get() or RequestTimings()
+        try:
+            with timings.phase("local_engine"):
+                local = evaluate_certificate(certificate_data, specifications)
+        except Exception as e:
+            logger.warning(f"Tolerance engine failed, falling back to LLM analysis: {str(e)}")
+    
+    if not local or not local["decided"]:
+        return await run_llm_analysis(certificate_data, specifications, custom_instructions, prompt_sizes)
+    
+    if not local["undecided"]:
+        logger.info(f"All {local['decided']} test points decided locally, skipping LLM analysis")
+        return build_local_result(local["calculations"], specifications)
+    
+    logger.info(f"{local['decided']} test points decided locally, sending {local['undecided']} to the LLM")
+    llm_result = await run_llm_analysis(
+        local["remaining_certificate_data"], specifications, custom_instructions, prompt_sizes
+    )
+    return merge_results(local["calculations"], llm_result, local["undecided"])
+
+async def run_pipeline(pdf_bytes, filename, custom_instructions=None, bypass_cache=False, on_progress=None,
+                       spec_lookup=None):
+    """
+    Run extraction, specification research and analysis for one certificate
+    
+    on_progress, if given, is called as on_progress(stage, status, artifact) when a stage
+    starts and finishes, so callers can report partial results. spec_lookup replaces
+    find_specifications, e.g. to share research between certificates of a batch.
+    
+    The returned result carries a "timings" block with the per-stage breakdown of this
+    request; the copy stored in the result cache does not.
+    
+    Returns:
+        Tuple of (analysis result, cache status "HIT"/"MISS"/"COALESCED"/"BYPASS")
+    """
+    timings = current_timings.get()
+    token = None
+    if timings is None:
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+    try:
+        analysis_result, cache_status = await _run_pipeline_stages(
+            pdf_bytes, filename, custom_instructions, bypass_cache, on_progress, spec_lookup
+        )
+    finally:
+        if token is not None:
+            current_timings.reset(token)
+    return dict(analysis_result, timings=timings.to_dict()), cache_status
+
+async def _run_pipeline_stages(pdf_bytes, filename, custom_instructions, bypass_cache, on_progress, spec_lookup):
+    def notify(stage, status, artifact=None):
+        if on_progress:
+            on_progress(stage, status, artifact)
+    
+    # Return a stored result if this exact certificate was already analyzed
+    cache_key = make_cache_key(pdf_bytes, custom_instructions, PROMPTS_VERSION)
+    if not bypass_cache:
+        cached_result = await in_thread(result_cache.get, cache_key)
+        record_cache("result", cached_result is not None)
+        if cached_result is not None:
+            logger.info(f"Result cache hit for {filename}")
+            notify("cache", "hit")
+            return cached_result, "HIT"
+        
+        # Identical requests already in progress (e.g. a double submit) share that run's result
+        started = time.perf_counter()
+        analysis_result, coalesced = await pipeline_flight.do(cache_key, lambda: _run_uncached_stages(
+            pdf_bytes, filename, custom_instructions, cache_key, notify, spec_lookup
+        ))
+        if coalesced:
+            logger.info(f"Shared the in-flight analysis of an identical request for {filename}")
+            record_stage("coalesced", time.perf_counter() - started)
+            notify("coalesced", "completed")
+            return analysis_result, "COALESCED"
+        return analysis_result, "MISS"
+    
+    analysis_result = await _run_uncached_stages(pdf_bytes, filename, custom_instructions, cache_key, notify, spec_lookup)
+    return analysis_result, "BYPASS"
+
+async def _run_uncached_stages(pdf_bytes, filename, custom_instructions, cache_key, notify, spec_lookup):
+    # Step 1: Extract data from certificate
+    logger.info("Extracting data from certificate...")
+    notify("extraction", "started")
+    certificate_data = await extract_certificate_data(pdf_bytes)
+    notify("extraction", "completed", certificate_data)
+    
+    # Step 2 and 3: Research specifications and analyze
+    analysis_result, specifications = await analyze_certificate_data(
+        certificate_data, custom_instructions, notify, spec_lookup
+    )
+    notify("analysis", "completed", analysis_result)
+    
+    # Log the analysis result verdict
+    if "verdict" in analysis_result:
+        logger.info(f"Analysis verdict: {analysis_result['verdict']}")
+    
+    analysis_result["run_id"] = await record_run(
+        pdf_bytes, filename, custom_instructions, certificate_data, specifications, analysis_result
+    )
+    await in_thread(result_cache.put, cache_key, analysis_result)
+    return analysis_result
+
+async def analyze_certificate_data(certificate_data, custom_instructions=None, notify=None, spec_lookup=None):
+    """
+    Stages 2 and 3 for extracted certificate data, per instrument when the PDF holds several
+
+    Returns (analysis result, researched specifications); for several instruments the
+    specifications are keyed by instrument label.
+    """
+    units = split_instruments(certificate_data)
+    if len(units) > 1:
+        logger.info(f"Certificate holds {len(units)} instruments, analyzing them in parallel")
+        return await analyze_instruments(units, custom_instructions, notify, spec_lookup)
+    return await analyze_instrument(certificate_data, custom_instructions, notify, spec_lookup)
+
+async def record_run(pdf_bytes, filename, custom_instructions, certificate_data, specifications, analysis_result,
+                     parent_id=None):
+    """Persist the stage artifacts of a finished analysis and return the run id"""
+    try:
+        return await in_thread(
+            run_store.put, pdf_bytes, filename, custom_instructions, certificate_data, specifications,
+            "instruments" in analysis_result, prompt_renderer.versions(),
+            {key: value for key, value in analysis_result.items() if key not in ("run_id", "timings")},
+            parent_id
+        )
+    except Exception as e:
+        # The run store is an optimization for re-analysis; never fail an analysis over it
+        logger.error(f"Could not record run for {filename}: {str(e)}")
+        return None
+
+def stored_spec_lookup(run):
+    """Specification lookup that returns a stored run's specifications instead of researching again"""
+    specifications = run["specifications"]
+    
+    async def lookup(certificate_data, manufacturer, model, equipment_type):
+        if not run["multi_instrument"]:
+            return specifications
+        unit = certificate_data if isinstance(certificate_data, list) else [certificate_data]
+        stored = specifications.get(instrument_label(unit)) if isinstance(specifications, dict) else None
+        if stored:
+            return stored
+        return await find_specifications(certificate_data, manufacturer, model, equipment_type)
+    return lookup
+
+async def reanalyze(run, custom_instructions, rerun, force=()):
+    """Re-execute only the stages in rerun for a stored run, reusing the other stages' artifacts"""
+    reused = [stage for stage in ("extraction", "research", "analysis") if stage not in rerun]
+    if not rerun:
+        logger.info(f"Nothing changed for run {run['run_id']}, returning the stored result")
+        return dict(run["result"], run_id=run["run_id"],
+                    reanalysis={"parent_id": run["run_id"], "rerun": [], "reused": reused})
+    
+    logger.info(f"Re-analyzing run {run['run_id']}: re-running {', '.join(rerun)}")
+    certificate_data = run["certificate_data"]
+    if "extraction" in rerun:
+        certificate_data = await extract_certificate_data(run["pdf"])
+    if "research" not in rerun:
+        spec_lookup = stored_spec_lookup(run)
+    elif "research" in force or (stage_prompt_versions(run["prompt_versions"], "research")
+                                 != stage_prompt_versions(prompt_renderer.versions(), "research")):
+        # The spec store entry may be the very research being redone, so research afresh and replace it
+        spec_lookup = research_and_store_specifications
+    else:
+        spec_lookup = None
+    analysis_result, specifications = await analyze_certificate_data(
+        certificate_data, custom_instructions, spec_lookup=spec_lookup
+    )
+    
+    analysis_result["run_id"] = await record_run(run["pdf"], run["filename"], custom_instructions, certificate_data,
+                                                 specifications, analysis_result, parent_id=run["run_id"])
+    await in_thread(result_cache.put, make_cache_key(run["pdf"], custom_instructions, PROMPTS_VERSION), analysis_result)
+    return dict(analysis_result, reanalysis={"parent_id": run["run_id"], "rerun": rerun, "reused": reused})
+
+async def analyze_instrument(certificate_data, custom_instructions=None, notify=None, spec_lookup=None):
+    """Research specifications for one instrument and analyze its test points; returns (result, specifications)"""
+    notify = notify or (lambda stage, status, artifact=None: None)
+    notify("research", "started")
+    manufacturer, model, equipment_type = get_instrument_info(certificate_data)
+    prompt_sizes = {}
+    if spec_lookup:
+        specifications = await spec_lookup(certificate_data, manufacturer, model, equipment_type)
+    else:
+        specifications = await find_specifications(certificate_data, manufacturer, model, equipment_type, prompt_sizes)
+    notify("research", "completed", specifications)
+    
+    # Perform analysis with custom instructions if provided
+    logger.info("Performing analysis...")
+    notify("analysis", "started")
+    analysis_result = await analyze_with_tolerance_engine(
+        certificate_data, specifications, custom_instructions, prompt_sizes
+    )
+    analysis_result["prompt_sizes"] = prompt_sizes
+    
+    # Record which specification sources were used (and which were missing in degraded mode)
+    research = specifications.get("research") if isinstance(specifications, dict) else None
+    if research:
+        analysis_result["research"] = research
+        if research["summary"] not in str(analysis_result.get("spec_source", "")):
+            analysis_result["spec_source"] = ". ".join(
+                part for part in (research["summary"], analysis_result.get("spec_source")) if part
+            )
+    
+    # Ensure we include raw specifications for reference
+    if "specifications" not in analysis_result:
+        analysis_result["specifications"] = specifications
+    return analysis_result, specifications
+
+async def analyze_instruments(units, custom_instructions=None, notify=None, spec_lookup=None):
+    """
+    Research and analyze each instrument of a multi-instrument certificate in parallel
+    
+    Instruments of the same model share one specification lookup. The combined result
+    carries an aggregate verdict plus each instrument's own verdict and result.
+    """
+    notify = notify or (lambda stage, status, artifact=None: None)
+    shared_research = spec_lookup if isinstance(spec_lookup, SharedResearch) else SharedResearch(
+        spec_lookup or find_specifications
+    )
+    notify("research", "started")
+    notify("analysis", "started")
+    researched = {}
+    
+    async def analyze_unit(unit):
+        unit_result, researched[instrument_label(unit)] = await analyze_instrument(
+            unit, custom_instructions, spec_lookup=shared_research
+        )
+        return unit_result
+    
+    outcomes = await fan_out(units, analyze_unit, max_in_flight=INSTRUMENT_MAX_IN_FLIGHT)
+    if all(error is not None for _, error in outcomes):
+        raise outcomes[0][1]
+    for unit, (_, error) in zip(units, outcomes):
+        if error is not None:
+            logger.error(f"Analysis of {instrument_label(unit)} failed: {getattr(error, 'detail', None) or str(error)}")
+    
+    analysis_result = aggregate_instrument_results(units, outcomes)
+    analysis_result["specifications"] = researched = {
+        instrument_label(unit): researched[instrument_label(unit)] for unit in units if instrument_label(unit) in researched
+    }
+    analysis_result["research"] = {
+        "specification_lookups": shared_research.lookups,
+        "shared_lookups": shared_research.shared,
+    }
+    notify("research", "completed", analysis_result["specifications"])
+    return analysis_result, researched
+
+# Background jobs share the same pipeline as /analyze
+async def run_job(pdf_bytes, filename, custom_instructions, bypass_cache, on_progress):
+    analysis_result, _ = await run_pipeline(pdf_bytes, filename, custom_instructions, bypass_cache, on_progress)
+    return analysis_result
+
+job_manager = JobManager.from_env(run_job)
+
 @app.post("/analyze")
 async def analyze_certificate(
+    response: Response,
     certificate_file: UploadFile = File(...),
-    custom_instructions: Optional[str] = Form(None)
+    custom_instructions: Optional[str] = Form(None),
+    bypass_cache: bool = Form(False)
 ):
     """
     Analyze a calibration certificate PDF
     
     - **certificate_file**: The PDF certificate to analyze
     - **custom_instructions**: Optional custom instructions to append to the prompt
+    - **bypass_cache**: Skip the result cache lookup and run the full analysis (the fresh result is still cached)
     
     Returns:
         JSON with analysis results including verdict, confidence, and detailed analysis
@@ -65,61 +630,282 @@ async def analyze_certificate(
     if custom_instructions:
         logger.info(f"Custom instructions provided: {custom_instructions}")
     
+    timings = RequestTimings()
+    current_timings.set(timings)
+    with timings.phase("upload"):
+        pdf_bytes = await read_upload(certificate_file, MAX_UPLOAD_BYTES)
+    
     try:
-        # Create a temporary file to store the uploaded PDF
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            # Copy the uploaded file to the temporary file
-            shutil.copyfileobj(certificate_file.file, temp_file)
-            temp_file_path = temp_file.name
-        
-        # Step 1: Extract data from certificate
-        logger.info("Extracting data from certificate...")
-        certificate_data = process_pdf_with_openai(temp_file_path)
-        if not certificate_data or isinstance(certificate_data, list) and "error" in certificate_data[0]:
-            logger.error(f"Error extracting certificate data: {certificate_data}")
-            raise HTTPException(status_code=422, detail="Failed to extract data from certificate")
-        
-        # Step 2: Research specifications
-        logger.info("Researching specifications...")
-        specifications = research_specifications(certificate_data)
-        if not specifications:
-            logger.error("Failed to get specifications")
-            raise HTTPException(status_code=422, detail="Failed to retrieve specifications for the equipment")
-        
-        # Extract metadata for response
-        cert = certificate_data[0] if isinstance(certificate_data, list) and len(certificate_data) > 0 else certificate_data
-        manufacturer = cert.get("Manufacturer", "Unknown Manufacturer")
-        model = cert.get("Model", "Unknown Model")
-        equipment_type = cert.get("EquipmentType", "Unknown Type")
-        
-        # Step 3: Perform analysis with custom instructions if provided
-        logger.info("Performing analysis...")
-        analysis_result = perform_analysis(certificate_data, specifications, custom_instructions)
-        
-        # Ensure we include raw specifications for reference
-        if "specifications" not in analysis_result:
-            analysis_result["specifications"] = specifications
-            
-        # Clean up the temporary file
-        os.unlink(temp_file_path)
-        
-        # Log the analysis result verdict
-        if "verdict" in analysis_result:
-            logger.info(f"Analysis verdict: {analysis_result['verdict']}")
-        
+        analysis_result, cache_status = await run_pipeline(
+            pdf_bytes, certificate_file.filename, custom_instructions, bypass_cache
+        )
+        response.headers["X-Cache"] = cache_status
+        response.headers["Server-Timing"] = timings.server_timing()
         return analysis_result
         
+    except StageTimeoutError as e:
+        logger.error(f"Error processing request: {str(e)}")
+        raise HTTPException(status_code=504, detail=f"Error processing certificate: {str(e)}")
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
-        # Make sure to clean up temporary files in case of error
-        try:
-            if 'temp_file_path' in locals():
-                os.unlink(temp_file_path)
-        except:
-            pass
-        
         raise HTTPException(status_code=500, detail=f"Error processing certificate: {str(e)}")
 
+@app.post("/runs/{run_id}/reanalyze")
+async def reanalyze_run(run_id: str, request: ReanalyzeRequest, response: Response):
+    """
+    Re-analyze a stored run, re-executing only the stages whose inputs changed
+    
+    - **custom_instructions**: New custom instructions; when only these differ, only the analysis stage runs
+    - **force**: Stages to re-run regardless ("extraction", "research", "analysis")
+    
+    Returns:
+        The new analysis result with a new run_id and a "reanalysis" block listing re-run and reused stages
+    """
+    run = await in_thread(run_store.get, run_id, True)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    unknown = set(request.force) - {"extraction", "research", "analysis"}
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown stages: {', '.join(sorted(unknown))}")
+    
+    timings = RequestTimings()
+    current_timings.set(timings)
+    rerun = plan_reanalysis(run, request.custom_instructions, prompt_renderer.versions(), request.force)
+    try:
+        analysis_result = await reanalyze(run, request.custom_instructions, rerun, request.force)
+        response.headers["Server-Timing"] = timings.server_timing()
+        return dict(analysis_result, timings=timings.to_dict())
+    except StageTimeoutError as e:
+        logger.error(f"Error re-analyzing run {run_id}: {str(e)}")
+        raise HTTPException(status_code=504, detail=f"Error re-analyzing certificate: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error re-analyzing run {run_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error re-analyzing certificate: {str(e)}")
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    """Return a stored run's artifacts: certificate data, specifications, prompt versions and result"""
+    run = await in_thread(run_store.get, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    return run
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    certificate_file: UploadFile = File(...),
+    custom_instructions: Optional[str] = Form(None),
+    bypass_cache: bool = Form(False)
+):
+    """
+    Queue a calibration certificate for analysis and return immediately
+    
+    Poll `GET /jobs/{job_id}` for status and partial artifacts, or follow
+    `GET /jobs/{job_id}/events` for a Server-Sent Events stream of stage transitions.
+    """
+    logger.info(f"Received job file: {certificate_file.filename}")
+    pdf_bytes = await read_upload(certificate_file, MAX_UPLOAD_BYTES)
+    try:
+        job = await job_manager.submit(pdf_bytes, certificate_file.filename, custom_instructions, bypass_cache)
+    except JobQueueFullError as e:
+        logger.warning(f"Rejected job for {certificate_file.filename}: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(JOB_RETRY_AFTER)})
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    }
+
+@app.post("/batch")
+async def analyze_batch(
+    certificate_files: List[UploadFile] = File(...),
+    custom_instructions: Optional[str] = Form(None),
+    bypass_cache: bool = Form(False)
+):
+    """
+    Analyze many calibration certificates in one request
+    
+    - **certificate_files**: PDF certificates and/or ZIP archives of PDFs
+    - **custom_instructions**: Optional custom instructions applied to every certificate
+    - **bypass_cache**: Skip the result cache lookup for every certificate
+    
+    Returns:
+        NDJSON stream with one line per certificate as it completes, followed by a
+        summary line with aggregate PASS/FAIL/CANNOT_VERIFY counts
+    """
+    # Read everything before streaming starts; the uploads are closed once the endpoint returns
+    uploads = [(upload.filename, await read_upload(upload, MAX_BATCH_UPLOAD_BYTES)) for upload in certificate_files]
+    try:
+        items = expand_uploads(uploads, MAX_UPLOAD_BYTES)
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=422, detail=f"Invalid ZIP archive: {str(e)}")
+    if not items:
+        raise HTTPException(status_code=422, detail="No PDF certificates found in the upload")
+    logger.info(f"Received batch of {len(items)} certificates")
+    
+    return StreamingResponse(
+        stream_batch(items, run_pipeline, find_specifications, custom_instructions, bypass_cache,
+                     max_in_flight=BATCH_MAX_IN_FLIGHT),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, include_events: bool = False):
+    """Return job status, timings and whichever artifacts (certificate data, specifications, result) are ready"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict(include_events=include_events)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-Sent Events stream of a job's stage transitions with timings"""
+    # Keep the job itself: it may be pruned from the manager while the stream is open
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    async def event_stream():
+        async for event in job_manager.events(job):
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        yield f"event: done\ndata: {json.dumps(job.to_dict(include_artifacts=False))}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.on_event("startup")
+async def start_job_workers():
+    await job_manager.start()
+
+@app.on_event("startup")
+async def index_manual_library():
+    # Runs in the background so a large library does not delay startup
+    if MANUAL_LIBRARY_INDEX_ON_STARTUP and os.path.isdir(manual_library.library_dir):
+        asyncio.get_running_loop().run_in_executor(None, manual_library.index)
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_manager.stop()
+
+@app.on_event("shutdown")
+async def shutdown_stage_executor():
+    stage_executor.shutdown()
+
+@app.get("/stages")
+async def stage_stats():
+    """Return per-stage concurrency limits, timeouts and current load"""
+    return {
+        "stages": stage_executor.stats(),
+        "jobs": job_manager.stats(),
+        "research": spec_researcher.stats(),
+        "coalescing": {"pipeline": pipeline_flight.stats(), "research": research_flight.stats()},
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: stage latencies and queue waits, LLM requests, tokens and cost, cache hit rates"""
+    for stage, values in stage_executor.stats().items():
+        STAGE_ACTIVE.set(values["active"], stage=stage)
+        STAGE_WAITING.set(values["waiting"], stage=stage)
+    counts = job_manager.stats()["jobs"]
+    for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_COMPLETED, STATUS_FAILED):
+        JOBS.set(counts.get(status, 0), status=status)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/prompts")
+async def prompt_info():
+    """Return the loaded prompt templates, their versions, placeholders and token budgets"""
+    return prompt_renderer.describe()
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Return result cache hit/miss counters and size"""
+    return result_cache.stats()
+
+@app.delete("/cache")
+def clear_cache():
+    """Remove every cached analysis result"""
+    result_cache.clear()
+    return {"message": "Result cache cleared"}
+
+@app.get("/admin/specs")
+def list_specs(
+    manufacturer: Optional[str] = None,
+    model: Optional[str] = None,
+    include_expired: bool = True,
+    include_specifications: bool = False
+):
+    """List stored specifications, optionally filtered by manufacturer and model"""
+    return {
+        "stats": spec_store.stats(),
+        "entries": spec_store.list(manufacturer, model, include_expired, include_specifications)
+    }
+
+@app.post("/admin/specs/prewarm")
+def prewarm_specs(items: List[SpecPrewarmItem]):
+    """
+    Load specifications into the spec store ahead of time
+    
+    Items that carry their own specifications (e.g. from a manual extraction) are stored as-is;
+    the others are researched now so the next certificate for that model skips research.
+    """
+    results = []
+    for item in items:
+        ttl_seconds = item.ttl_days * 24 * 3600 if item.ttl_days is not None else None
+        specifications = item.specifications
+        if specifications is None:
+            logger.info(f"Pre-warming specifications for {item.manufacturer} {item.model}")
+            try:
+                specifications = research_specifications([{
+                    "Manufacturer": item.manufacturer,
+                    "Model": item.model,
+                    "EquipmentType": item.equipment_type
+                }])
+            except Exception as e:
+                logger.error(f"Error pre-warming {item.manufacturer} {item.model}: {str(e)}")
+                specifications = None
+        if not specifications:
+            results.append({"manufacturer": item.manufacturer, "model": item.model, "error": "No specifications found"})
+            continue
+        entry = spec_store.put(item.manufacturer, item.model, item.equipment_type, specifications,
+                               source=item.source, ttl_seconds=ttl_seconds)
+        entry.pop("specifications", None)
+        results.append(entry)
+    return {"results": results}
+
+@app.delete("/admin/specs/{entry_id}")
+def delete_spec(entry_id: int):
+    """Invalidate a single stored specification entry"""
+    if not spec_store.invalidate(entry_id=entry_id):
+        raise HTTPException(status_code=404, detail=f"Specification entry {entry_id} not found")
+    return {"removed": 1}
+
+@app.delete("/admin/specs")
+def invalidate_specs(manufacturer: Optional[str] = None, model: Optional[str] = None):
+    """Invalidate every stored entry matching manufacturer/model (all entries when no filter is given)"""
+    return {"removed": spec_store.invalidate(manufacturer=manufacturer, model=model)}
+
+@app.get("/admin/manuals")
+def list_manuals():
+    """List indexed manuals with their page and spec page counts"""
+    return {"stats": manual_library.stats(), "documents": manual_library.list()}
+
+@app.post("/admin/manuals/reindex")
+def reindex_manuals(force: bool = False):
+    """Index new and changed manuals in the library directory (every file with force=true)"""
+    if not os.path.isdir(manual_library.library_dir):
+        raise HTTPException(status_code=404, detail=f"Manual library directory {manual_library.library_dir} not found")
+    return manual_library.index(force=force)
+
+@app.get("/admin/manuals/search")
+def search_manuals(manufacturer: str, model: str, parameters: Optional[str] = None):
+    """Show the manual specifications stage 2 would use for an instrument and comma-separated parameters"""
+    tokens = {word for word in re.findall(r"[a-z0-9]+", (parameters or "").lower())}
+    result = manual_library.lookup(manufacturer, model, tokens)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No manual specifications found for {manufacturer} {model}")
+    return result
+
 if __name__ == "__main__":
     # Run the FastAPI server with uvicorn
     uvicorn.run("api_server:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
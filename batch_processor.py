@@ -0,0 +1,158 @@
+import io
+import json
+import time
+import asyncio
+import logging
+import zipfile
+
+from spec_store import is_cacheable, make_spec_key
+from prompt_renderer import uncovered_parameters, specification_group_words
+
+logger = logging.getLogger(__name__)
+
+VERDICTS = ("PASS", "FAIL", "CANNOT_VERIFY")
+
+
+def expand_uploads(uploads, max_member_bytes=None):
+    """
+    Turn uploaded (filename, bytes) pairs into batch items.
+
+    ZIP archives are expanded into their PDF members. Members are only decompressed
+    when their certificate is picked up, so a large archive is not inflated in memory
+    all at once. Members whose uncompressed size exceeds max_member_bytes are rejected
+    without decompressing them. Returns a list of (filename, loader) pairs where loader()
+    returns the PDF bytes.
+    """
+    items = []
+    for filename, data in uploads:
+        if (filename or "").lower().endswith(".zip") or zipfile.is_zipfile(io.BytesIO(data)):
+            archive = zipfile.ZipFile(io.BytesIO(data))
+            members = 0
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or not name.lower().endswith(".pdf") or name.startswith("__MACOSX/"):
+                    continue
+                if max_member_bytes is not None and member.file_size > max_member_bytes:
+                    logger.warning(f"Rejecting {filename}/{name}: {member.file_size} bytes uncompressed")
+                    loader = lambda size=member.file_size: _reject_member(size, max_member_bytes)
+                else:
+                    # ZipFile never inflates a member beyond its declared size, so the check above bounds memory
+                    loader = lambda archive=archive, name=name: archive.read(name)
+                items.append((f"{filename}/{name}", loader))
+                members += 1
+            logger.info(f"Expanded {filename} into {members} certificates")
+        else:
+            items.append((filename, lambda data=data: data))
+    return items
+
+
+def _reject_member(size, max_bytes):
+    raise ValueError(f"Archive member is {size // (1024 * 1024)} MB uncompressed, "
+                     f"above the {max_bytes // (1024 * 1024)} MB upload limit")
+
+
+class SharedResearch:
+    """
+    Specification lookup shared by every certificate in a batch.
+
+    Certificates with the same manufacturer, model and equipment type await a single
+    lookup instead of each running their own research_specifications call.
+    """
+
+    def __init__(self, find_specifications):
+        self.find_specifications = find_specifications
+        self.lookups = 0
+        self.shared = 0
+        self._tasks = {}
+
+    async def __call__(self, certificate_data, manufacturer, model, equipment_type):
+        if not is_cacheable(manufacturer, model):
+            self.lookups += 1
+            return await self.find_specifications(certificate_data, manufacturer, model, equipment_type)
+
+        key = make_spec_key(manufacturer, model, equipment_type)
+        task = self._tasks.get(key)
+        if task is None or task.done() and (task.cancelled() or task.exception() is not None):
+            self.lookups += 1
+            task = asyncio.ensure_future(
+                self.find_specifications(certificate_data, manufacturer, model, equipment_type)
+            )
+            self._tasks[key] = task
+        else:
+            self.shared += 1
+            logger.info(f"Sharing specification research for {manufacturer} {model}")
+        # Shield so one certificate giving up does not cancel the lookup for the others
+        specifications = await asyncio.shield(task)
+        if uncovered_parameters(certificate_data, specification_group_words(specifications)):
+            # The shared lookup was for a certificate that tested other parameters
+            self.lookups += 1
+            return await self.find_specifications(certificate_data, manufacturer, model, equipment_type)
+        return specifications
+
+
+async def stream_batch(items, run_pipeline, find_specifications, custom_instructions=None,
+                       bypass_cache=False, max_in_flight=16):
+    """
+    Run every batch item through the pipeline and yield NDJSON lines as certificates complete.
+
+    Up to max_in_flight certificates are in progress at once; the per-stage limits of the
+    stage executor then let extraction of later certificates overlap with research and
+    analysis of earlier ones. The final line carries aggregate verdict counts.
+    """
+    started = time.perf_counter()
+    shared_research = SharedResearch(find_specifications)
+    in_flight = asyncio.Semaphore(max_in_flight)
+    results = asyncio.Queue()
+    counts = {verdict: 0 for verdict in VERDICTS}
+    counts["ERROR"] = 0
+
+    async def process(index, filename, loader):
+        async with in_flight:
+            item_started = time.perf_counter()
+            try:
+                analysis_result, cache_status = await run_pipeline(
+                    loader(), filename, custom_instructions, bypass_cache, spec_lookup=shared_research
+                )
+                line = {
+                    "type": "result",
+                    "index": index,
+                    "filename": filename,
+                    "verdict": analysis_result.get("verdict"),
+                    "cache": cache_status,
+                    "elapsed": round(time.perf_counter() - item_started, 3),
+                    "result": analysis_result,
+                }
+            except Exception as e:
+                logger.error(f"Batch item {filename} failed: {str(e)}")
+                line = {
+                    "type": "error",
+                    "index": index,
+                    "filename": filename,
+                    "error": getattr(e, "detail", None) or str(e),
+                    "elapsed": round(time.perf_counter() - item_started, 3),
+                }
+            await results.put(line)
+
+    tasks = [asyncio.create_task(process(i, filename, loader)) for i, (filename, loader) in enumerate(items)]
+    try:
+        for _ in range(len(tasks)):
+            line = await results.get()
+            if line["type"] == "error":
+                counts["ERROR"] += 1
+            else:
+                verdict = str(line.get("verdict") or "").upper()
+                counts[verdict if verdict in counts else "CANNOT_VERIFY"] += 1
+            yield json.dumps(line) + "\n"
+    finally:
+        # Client disconnected or the batch finished: do not leave work running
+        for task in tasks:
+            task.cancel()
+
+    yield json.dumps({
+        "type": "summary",
+        "total": len(items),
+        "counts": counts,
+        "specification_lookups": shared_research.lookups,
+        "shared_lookups": shared_research.shared,
+        "elapsed": round(time.perf_counter() - started, 3),
+    }) + "\n"
@@ -0,0 +1,203 @@
+"""
+Load driver for the analysis API.
+
+Replays N concurrent clients posting certificates to /analyze and reports latency
+percentiles (p50/p95/p99), throughput, error and cache-hit counts, and a per-stage
+breakdown taken from the "timings" block of each result.
+
+Run it against an API server that talks to benchmarks/mock_llm_server.py to size a
+deployment or to compare caching and concurrency settings without API costs:
+
+    python benchmarks/mock_llm_server.py --latency 1.5 --jitter 0.5 &
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=mock python api_server.py &
+    python benchmarks/load_driver.py --clients 16 --requests 200 --generate 40 --bypass-cache
+"""
+import os
+import sys
+import json
+import time
+import glob
+import math
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_certificates import make_certificate
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def load_certificates(directory=None, generate=0, seed=0):
+    """Return a list of (name, pdf bytes) from a directory and/or freshly generated certificates"""
+    certificates = []
+    if directory:
+        for path in sorted(glob.glob(os.path.join(directory, "*.pdf"))):
+            with open(path, "rb") as f:
+                certificates.append((os.path.basename(path), f.read()))
+    for index in range(generate):
+        points = 5 + (index * 7) % 60
+        certificates.append((f"synthetic_{index:04d}.pdf", make_certificate(points, index % 3, seed=seed + index)))
+    return certificates
+
+
+class LoadResult:
+    """Collects per-request outcomes from all client threads"""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.cache = {}
+        self.stages = {}
+        self.llm_requests = 0
+        self.cost = 0.0
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def add(self, latency, status, cache_status=None, timings=None, error=None):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if error:
+                self.errors.append(error)
+                return
+            self.latencies.append(latency)
+            if cache_status:
+                self.cache[cache_status] = self.cache.get(cache_status, 0) + 1
+            if timings:
+                self.llm_requests += timings.get("llm_requests", 0)
+                self.cost += timings.get("estimated_cost_usd", 0.0)
+                for stage, values in timings.get("stages", {}).items():
+                    stage_values = self.stages.setdefault(stage, {"seconds": [], "queue_wait": []})
+                    stage_values["seconds"].append(values["seconds"])
+                    stage_values["queue_wait"].append(values["queue_wait"])
+
+    def summary(self, elapsed):
+        completed = len(self.latencies)
+        return {
+            "requests": sum(self.statuses.values()),
+            "completed": completed,
+            "errors": len(self.errors),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_rps": round(completed / elapsed, 3) if elapsed else 0.0,
+            "latency": {
+                "p50": round(percentile(self.latencies, 0.50), 3),
+                "p95": round(percentile(self.latencies, 0.95), 3),
+                "p99": round(percentile(self.latencies, 0.99), 3),
+                "max": round(max(self.latencies), 3) if self.latencies else 0.0,
+            },
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            "cache": self.cache,
+            "stages": {
+                stage: {
+                    "mean": round(sum(values["seconds"]) / len(values["seconds"]), 4),
+                    "p95": round(percentile(values["seconds"], 0.95), 4),
+                    "queue_wait_p95": round(percentile(values["queue_wait"], 0.95), 4),
+                    "count": len(values["seconds"]),
+                }
+                for stage, values in self.stages.items()
+            },
+            "llm_requests": self.llm_requests,
+            "estimated_cost_usd": round(self.cost, 4),
+        }
+
+
+def run_load(api_url, certificates, clients, total_requests=None, duration=None, bypass_cache=False,
+             custom_instructions=None, timeout=600):
+    """Run clients threads that post certificates round-robin until total_requests or duration is reached"""
+    result = LoadResult()
+    counter = {"next": 0}
+    counter_lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_certificate():
+        with counter_lock:
+            index = counter["next"]
+            if total_requests is not None and index >= total_requests:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            counter["next"] += 1
+        return certificates[index % len(certificates)]
+
+    def client():
+        session = requests.Session()
+        data = {"bypass_cache": str(bool(bypass_cache)).lower()}
+        if custom_instructions:
+            data["custom_instructions"] = custom_instructions
+        while True:
+            certificate = next_certificate()
+            if certificate is None:
+                return
+            name, pdf_bytes = certificate
+            started = time.perf_counter()
+            try:
+                response = session.post(f"{api_url}/analyze", data=data, timeout=timeout,
+                                        files={"certificate_file": (name, pdf_bytes, "application/pdf")})
+            except requests.RequestException as e:
+                result.add(time.perf_counter() - started, "connection_error", error=str(e))
+                continue
+            latency = time.perf_counter() - started
+            if response.status_code != 200:
+                result.add(latency, response.status_code, error=response.text[:200])
+                continue
+            result.add(latency, 200, response.headers.get("X-Cache"), response.json().get("timings"))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for future in [pool.submit(client) for _ in range(clients)]:
+            future.result()
+    return result.summary(time.perf_counter() - started)
+
+
+def print_summary(summary):
+    latency = summary["latency"]
+    print(f"{summary['completed']}/{summary['requests']} requests completed in {summary['elapsed_seconds']}s "
+          f"({summary['throughput_rps']} req/s), {summary['errors']} errors")
+    print(f"latency p50 {latency['p50']}s  p95 {latency['p95']}s  p99 {latency['p99']}s  max {latency['max']}s")
+    print(f"statuses {summary['statuses']}  cache {summary['cache']}")
+    print(f"LLM requests {summary['llm_requests']}, estimated cost ${summary['estimated_cost_usd']}")
+    print(f"{'stage':<14} {'count':>6} {'mean':>9} {'p95':>9} {'queue p95':>10}")
+    for stage, values in summary["stages"].items():
+        print(f"{stage:<14} {values['count']:>6} {values['mean']:>8.3f}s {values['p95']:>8.3f}s "
+              f"{values['queue_wait_p95']:>9.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay concurrent clients against /analyze")
+    parser.add_argument("--api-url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=8, help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=None, help="Total requests to send (default 10 per client)")
+    parser.add_argument("--duration", type=float, default=None, help="Send requests for this many seconds instead")
+    parser.add_argument("--certificates", default=None, help="Directory of certificate PDFs to replay")
+    parser.add_argument("--generate", type=int, default=0, help="Number of synthetic certificates to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bypass-cache", action="store_true", help="Skip the result cache on every request")
+    parser.add_argument("--custom-instructions", default=None)
+    parser.add_argument("--output", default=None, help="Also write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    certificates = load_certificates(args.certificates, args.generate or (0 if args.certificates else 20), args.seed)
+    if not certificates:
+        parser.error("No certificates found; pass --certificates DIR or --generate N")
+    total_requests = args.requests if args.requests is not None or args.duration else args.clients * 10
+
+    print(f"{args.clients} clients, {len(certificates)} certificates, target {args.api_url}")
+    summary = run_load(args.api_url, certificates, args.clients, total_requests, args.duration,
+                       args.bypass_cache, args.custom_instructions)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Local stand-in for the OpenAI and Gemini HTTP APIs, for offline load tests.
+
+Serves the endpoints the pipeline modules call (OpenAI chat completions and Gemini
+generateContent) with canned JSON answers shaped like real extraction, research and
+analysis responses. Latency, jitter and error rate are configurable so the API
+server can be sized and compared without spending API money.
+
+Usage:
+    python benchmarks/mock_llm_server.py --port 8100 --latency 2.0 --jitter 0.5 --error-rate 0.02
+
+Then start the API server against it:
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=mock python api_server.py
+
+The Gemini endpoint is served at /v1beta/models/{model}:generateContent. The OpenAI
+Batch API (/v1/files and /v1/batches) is served too, for `python reverify.py --batch`;
+a batch completes after --batch-latency seconds.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+
+import uvicorn
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_renderer import estimate_tokens
+
+
+class MockSettings:
+    """Simulated service behaviour, adjustable at runtime through POST /mock/config"""
+
+    def __init__(self, latency=1.0, jitter=0.25, error_rate=0.0, seconds_per_1k_output=0.0, seed=None,
+                 batch_latency=5.0):
+        self.latency = latency
+        self.batch_latency = batch_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seconds_per_1k_output = seconds_per_1k_output
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def delay(self, output_tokens):
+        latency = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, latency) + output_tokens / 1000.0 * self.seconds_per_1k_output
+
+    def should_fail(self):
+        return self.random.random() < self.error_rate
+
+    def record(self, input_tokens, output_tokens, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += 1 if error else 0
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    def to_dict(self):
+        return {
+            "latency": self.latency,
+            "jitter": self.jitter,
+            "error_rate": self.error_rate,
+            "seconds_per_1k_output": self.seconds_per_1k_output,
+            "batch_latency": self.batch_latency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+def mock_certificate(points=10):
+    """Certificate data in the shape process_pdf_with_openai returns"""
+    return [{
+        "Manufacturer": "Fluke",
+        "Model": "87V",
+        "EquipmentType": "Digital Multimeter",
+        "SerialNumber": "12345678",
+        "TestResults": [{
+            "Parameter": "DC Voltage",
+            "Range": "10 V",
+            "Resolution": "0.001 V",
+            "Measurements": [
+                {"Nominal": f"{(i + 1) * 0.5:g} V", "Reading": f"{(i + 1) * 0.5:.3f} V", "Tolerance": "±(0.05% + 2)"}
+                for i in range(points)
+            ],
+        }],
+    }]
+
+
+def mock_specifications():
+    return {
+        "manufacturer": "Fluke",
+        "model": "87V",
+        "spec_source": "Mock research: Fluke 87V user manual, accuracy specifications",
+        "specifications": {
+            "DC Voltage": {"accuracy": "±(0.05% + 2 digits)", "ranges": ["600 mV", "6 V", "60 V", "600 V", "1000 V"]},
+            "AC Voltage": {"accuracy": "±(0.7% + 4 digits)"},
+            "Resistance": {"accuracy": "±(0.2% + 2 digits)"},
+        },
+    }
+
+
+def mock_analysis(points=3):
+    calculations = [
+        {
+            "parameter": "DC Voltage",
+            "nominal": f"{(i + 1) * 0.5:g} V",
+            "spec_tolerance": "±(0.05% + 2 digits)",
+            "applied_tolerance": "±(0.05% + 2)",
+            "equivalent": True,
+            "explanation": "Applied tolerance matches the manufacturer accuracy specification",
+        }
+        for i in range(points)
+    ]
+    return {
+        "verdict": "PASS",
+        "confidence": "HIGH",
+        "analysis": "All applied tolerances match the manufacturer specifications.",
+        "calculations": calculations,
+        "discrepancies": [],
+        "spec_source": "Mock analysis",
+        "summary": "Mock analysis: every test point uses the specified tolerance.",
+    }
+
+
+def mock_content(prompt):
+    """Pick a canned answer by recognising which pipeline stage sent the prompt"""
+    lowered = prompt.lower()
+    if "verdict" in lowered and "calculations" in lowered:
+        return json.dumps(mock_analysis())
+    if "specification" in lowered and ("research" in lowered or "manufacturer" in lowered):
+        return json.dumps(mock_specifications())
+    return json.dumps(mock_certificate())
+
+
+def _message_text(content):
+    """Flatten OpenAI message content, which is either a string or a list of typed parts"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def _gemini_text(body):
+    return "\n".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+        if isinstance(part, dict)
+    )
+
+
+def chat_completion(model, content, input_tokens, output_tokens):
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": input_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def create_app(settings):
+    app = FastAPI(title="Mock LLM API")
+    files = {}
+    batches = {}
+
+    async def simulate(input_tokens, output_tokens):
+        """Sleep for the simulated latency; returns an error response when this request should fail"""
+        await asyncio.sleep(settings.delay(output_tokens))
+        if settings.should_fail():
+            settings.record(input_tokens, 0, error=True)
+            status = settings.random.choice((429, 500, 503))
+            return JSONResponse(status_code=status, content={
+                "error": {"message": "Simulated failure", "type": "mock_error", "code": status}
+            })
+        settings.record(input_tokens, output_tokens)
+        return None
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "\n".join(_message_text(message.get("content")) for message in body.get("messages", []))
+        content = mock_content(prompt)
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        error = await simulate(input_tokens, output_tokens)
+        if error is not None:
+            return error
+        return chat_completion(body.get("model", "mock"), content, input_tokens, output_tokens)
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request):
+        body = await request.json()
+        prompt = _gemini_text(body)
+        content = mock_content(prompt)
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        error = await simulate(input_tokens, output_tokens)
+        if error is not None:
+            return error
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": content}]},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": input_tokens,
+                "candidatesTokenCount": output_tokens,
+                "totalTokenCount": input_tokens + output_tokens,
+            },
+        }
+
+    def store_file(content, purpose):
+        file_id = f"file-mock-{uuid.uuid4().hex[:12]}"
+        files[file_id] = {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                          "purpose": purpose, "content": content}
+        return file_id
+
+    async def process_batch(batch, lines):
+        """Answer every request of a batch after the batch latency, like a provider working off-peak"""
+        batch["status"] = "in_progress"
+        await asyncio.sleep(settings.batch_latency)
+        outputs, errors = [], []
+        for line in lines:
+            body = line.get("body", {})
+            prompt = "\n".join(_message_text(message.get("content")) for message in body.get("messages", []))
+            content = mock_content(prompt)
+            input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(content)
+            record = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": line.get("custom_id")}
+            if settings.should_fail():
+                settings.record(input_tokens, 0, error=True)
+                errors.append(dict(record, response={"status_code": 500, "body": {
+                    "error": {"message": "Simulated failure", "type": "mock_error"}
+                }}, error=None))
+                continue
+            settings.record(input_tokens, output_tokens)
+            outputs.append(dict(record, response={
+                "status_code": 200,
+                "request_id": record["id"],
+                "body": chat_completion(body.get("model", "mock"), content, input_tokens, output_tokens),
+            }, error=None))
+        for key, records in (("output_file_id", outputs), ("error_file_id", errors)):
+            if records:
+                batch[key] = store_file("\n".join(json.dumps(record) for record in records).encode("utf-8"),
+                                        "batch_output")
+        batch.update(status="completed", completed_at=int(time.time()),
+                     request_counts={"total": len(lines), "completed": len(outputs), "failed": len(errors)})
+
+    @app.post("/v1/files")
+    async def upload_file(file: UploadFile = File(...), purpose: str = Form(...)):
+        file_id = store_file(await file.read(), purpose)
+        return {key: value for key, value in files[file_id].items() if key != "content"}
+
+    @app.get("/v1/files/{file_id}/content")
+    async def file_content(file_id: str):
+        if file_id not in files:
+            raise HTTPException(status_code=404, detail="No such file")
+        return PlainTextResponse(files[file_id]["content"].decode("utf-8"))
+
+    @app.post("/v1/batches")
+    async def create_batch(request: Request):
+        body = await request.json()
+        input_file = files.get(body.get("input_file_id"))
+        if input_file is None:
+            raise HTTPException(status_code=404, detail="No such input file")
+        lines = [json.loads(line) for line in input_file["content"].decode("utf-8").splitlines() if line.strip()]
+        batch_id = f"batch_mock_{uuid.uuid4().hex[:12]}"
+        batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body.get("endpoint"),
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "validating",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+        }
+        settings.batches += 1
+        asyncio.ensure_future(process_batch(batches[batch_id], lines))
+        return batches[batch_id]
+
+    @app.get("/v1/batches/{batch_id}")
+    async def get_batch(batch_id: str):
+        if batch_id not in batches:
+            raise HTTPException(status_code=404, detail="No such batch")
+        return batches[batch_id]
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return settings.to_dict()
+
+    @app.post("/mock/config")
+    async def mock_config(request: Request):
+        """Change latency, jitter, error_rate, seconds_per_1k_output or batch_latency without restarting"""
+        for key, value in (await request.json()).items():
+            if key in ("latency", "jitter", "error_rate", "seconds_per_1k_output", "batch_latency"):
+                setattr(settings, key, float(value))
+        return settings.to_dict()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI/Gemini server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Uniform +/- jitter added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/5xx")
+    parser.add_argument("--seconds-per-1k-output", type=float, default=0.0,
+                        help="Extra latency per 1000 generated tokens")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible jitter and errors")
+    parser.add_argument("--batch-latency", type=float, default=5.0, help="Seconds until a batch job completes")
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.jitter, args.error_rate, args.seconds_per_1k_output, args.seed,
+                            args.batch_latency)
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
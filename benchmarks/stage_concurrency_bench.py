@@ -0,0 +1,84 @@
+"""
+Benchmark showing that pipeline stages overlap instead of serializing.
+
+Each simulated request runs three blocking stages (time.sleep stand-ins for the
+extraction, research and analysis LLM calls). The "blocking" mode calls them
+directly inside the coroutine, as analyze_certificate used to; the "executor"
+mode runs them through StageExecutor. A heartbeat coroutine measures how long
+the event loop is starved, which is what makes GET / stop answering.
+
+Usage:
+    python benchmarks/stage_concurrency_bench.py --requests 20 --stage-seconds 0.5
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stage_executor import StageExecutor
+
+
+def blocking_stage(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+async def heartbeat(stop, interval=0.01):
+    """Return the worst delay between scheduled and actual wake-ups of the event loop"""
+    worst = 0.0
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - expected)
+    return worst
+
+
+async def run_blocking(stage_seconds):
+    for _ in range(3):
+        blocking_stage(stage_seconds)
+
+
+async def run_executor(executor, stage_seconds):
+    for stage in ("extraction", "research", "analysis"):
+        await executor.run(stage, blocking_stage, stage_seconds)
+
+
+async def measure(mode, requests, stage_seconds, concurrency):
+    executor = StageExecutor(concurrency={stage: concurrency for stage in ("extraction", "research", "analysis")})
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(stop))
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    if mode == "blocking":
+        await asyncio.gather(*(run_blocking(stage_seconds) for _ in range(requests)))
+    else:
+        await asyncio.gather(*(run_executor(executor, stage_seconds) for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    worst_lag = await monitor
+    executor.shutdown()
+    return elapsed, worst_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare blocking and executor-based stage execution")
+    parser.add_argument("--requests", type=int, default=20, help="Number of concurrent simulated requests")
+    parser.add_argument("--stage-seconds", type=float, default=0.5, help="Simulated duration of each stage")
+    parser.add_argument("--concurrency", type=int, default=8, help="Per-stage concurrency limit")
+    args = parser.parse_args()
+
+    serial = args.requests * 3 * args.stage_seconds
+    print(f"{args.requests} requests x 3 stages x {args.stage_seconds}s (serial total {serial:.1f}s)")
+    print(f"{'mode':<10} {'wall time':>10} {'speedup':>8} {'max loop lag':>13}")
+    for mode in ("blocking", "executor"):
+        elapsed, worst_lag = asyncio.run(measure(mode, args.requests, args.stage_seconds, args.concurrency))
+        print(f"{mode:<10} {elapsed:>9.2f}s {serial / elapsed:>7.1f}x {worst_lag:>12.3f}s")
+
+
+if __name__ == "__main__":
+    main()
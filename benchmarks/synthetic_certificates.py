@@ -0,0 +1,176 @@
+"""
+Synthetic calibration certificate PDFs for benchmarks.
+
+Builds certificates with PyMuPDF: a header block (manufacturer, model, serial number,
+...), ruled test point tables with nominal, reading and tolerance columns, and
+optional filler pages without calibration content. Page and test point counts vary
+per certificate, and the same seed always yields the same set of files. Scanned
+certificates (image-only pages) have no text layer, so they always go through the
+LLM extractor.
+
+Usage:
+    python benchmarks/synthetic_certificates.py --count 50 --out benchmarks/certificates --seed 1
+"""
+import os
+import random
+import argparse
+
+import fitz
+
+INSTRUMENTS = (
+    ("Fluke", "87V", "Digital Multimeter"),
+    ("Fluke", "179", "Digital Multimeter"),
+    ("Keysight", "34461A", "Digital Multimeter"),
+    ("Tektronix", "TBS1052B", "Oscilloscope"),
+    ("Fluke", "754", "Documenting Process Calibrator"),
+    ("Keithley", "2000", "Digital Multimeter"),
+)
+
+# (parameter, unit, range values, tolerance expression)
+PARAMETERS = (
+    ("DC Voltage", "V", (0.1, 1, 5, 10, 50, 100), "±(0.05% + 2)"),
+    ("AC Voltage", "V", (0.5, 1, 10, 100), "±(0.7% + 4)"),
+    ("Resistance", "Ohm", (10, 100, 1000, 10000), "±(0.2% + 2)"),
+    ("DC Current", "mA", (1, 10, 100), "±(0.2% + 4)"),
+    ("Frequency", "Hz", (10, 100, 1000, 10000), "±(0.005% + 1)"),
+)
+
+PAGE_WIDTH, PAGE_HEIGHT = fitz.paper_size("a4")
+MARGIN = 50
+ROW_HEIGHT = 16
+COLUMNS = ("Function", "Nominal", "Reading", "Tolerance")
+COLUMN_WIDTHS = (130, 110, 110, 130)
+
+FILLER_TEXT = (
+    "This page intentionally describes the laboratory's quality system. The laboratory operates "
+    "in accordance with its documented procedures and environmental conditions were monitored "
+    "throughout the work. Results relate only to the item described on the first page."
+)
+
+
+def _test_points(rng, count):
+    points = []
+    for index in range(count):
+        parameter, unit, values, tolerance = PARAMETERS[index % len(PARAMETERS)]
+        nominal = rng.choice(values)
+        error = nominal * rng.uniform(-0.0004, 0.0004)
+        points.append((parameter, f"{nominal:g} {unit}", f"{nominal + error:.6g} {unit}", tolerance))
+    return points
+
+
+def _draw_table(page, top, rows):
+    """Draw a ruled table so PyMuPDF's table finder picks it up; returns the y below it"""
+    x_positions = [MARGIN]
+    for width in COLUMN_WIDTHS:
+        x_positions.append(x_positions[-1] + width)
+    all_rows = [COLUMNS] + list(rows)
+    bottom = top + len(all_rows) * ROW_HEIGHT
+    for row_index in range(len(all_rows) + 1):
+        y = top + row_index * ROW_HEIGHT
+        page.draw_line((x_positions[0], y), (x_positions[-1], y), width=0.5)
+    for x in x_positions:
+        page.draw_line((x, top), (x, bottom), width=0.5)
+    for row_index, row in enumerate(all_rows):
+        y = top + (row_index + 1) * ROW_HEIGHT - 4
+        for column, text in enumerate(row):
+            page.insert_text((x_positions[column] + 3, y), str(text), fontsize=8,
+                             fontname="helv" if row_index else "hebo")
+    return bottom
+
+
+def _rasterize(doc, dpi=100):
+    """Return a copy of doc with every page replaced by an image of itself"""
+    scanned = fitz.open()
+    for page in doc:
+        pixmap = page.get_pixmap(dpi=dpi)
+        target = scanned.new_page(width=page.rect.width, height=page.rect.height)
+        target.insert_image(target.rect, pixmap=pixmap)
+    return scanned
+
+
+def make_certificate(points=20, filler_pages=0, seed=None, instrument=None, scanned=False):
+    """
+    Return the bytes of a synthetic certificate PDF.
+
+    Test points are spread over as many pages as needed; filler_pages adds pages
+    without calibration content (which pre-extraction drops before the LLM call).
+    """
+    rng = random.Random(seed)
+    manufacturer, model, equipment_type = instrument or rng.choice(INSTRUMENTS)
+    doc = fitz.open()
+
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    header = [
+        "CERTIFICATE OF CALIBRATION",
+        f"Certificate No: CC-{rng.randint(10000, 99999)}",
+        f"Manufacturer: {manufacturer}",
+        f"Model: {model}",
+        f"Serial Number: {rng.randint(10000000, 99999999)}",
+        f"Equipment Type: {equipment_type}",
+        f"Calibration Date: 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    ]
+    y = MARGIN + 10
+    for line in header:
+        page.insert_text((MARGIN, y), line, fontsize=14 if y == MARGIN + 10 else 10)
+        y += 20
+
+    remaining = _test_points(rng, points)
+    top = y + 10
+    while remaining:
+        fits = max(1, int((PAGE_HEIGHT - MARGIN - top) / ROW_HEIGHT) - 1)
+        rows, remaining = remaining[:fits], remaining[fits:]
+        _draw_table(page, top, rows)
+        if remaining:
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            page.insert_text((MARGIN, MARGIN), "Test results (continued)", fontsize=10)
+            top = MARGIN + 10
+
+    for index in range(filler_pages):
+        filler = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        filler.insert_textbox(fitz.Rect(MARGIN, MARGIN, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN),
+                              f"Annex {index + 1}\n\n{FILLER_TEXT}", fontsize=10)
+
+    if scanned:
+        text_doc, doc = doc, _rasterize(doc)
+        text_doc.close()
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def generate(count, out_dir, min_points=5, max_points=60, max_filler_pages=3, scanned_ratio=0.0, seed=0):
+    """Write count certificates with varying sizes to out_dir and return their paths"""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for index in range(count):
+        points = rng.randint(min_points, max_points)
+        filler_pages = rng.randint(0, max_filler_pages)
+        scanned = rng.random() < scanned_ratio
+        suffix = "_scanned" if scanned else ""
+        path = os.path.join(out_dir, f"certificate_{index:04d}_{points}pts{suffix}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_certificate(points, filler_pages, seed=rng.random(), scanned=scanned))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic calibration certificate PDFs")
+    parser.add_argument("--count", type=int, default=20, help="Number of certificates to write")
+    parser.add_argument("--out", default="benchmarks/certificates", help="Output directory")
+    parser.add_argument("--min-points", type=int, default=5)
+    parser.add_argument("--max-points", type=int, default=60)
+    parser.add_argument("--max-filler-pages", type=int, default=3)
+    parser.add_argument("--scanned-ratio", type=float, default=0.0,
+                        help="Fraction of certificates rendered as image-only scans")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate(args.count, args.out, args.min_points, args.max_points, args.max_filler_pages,
+                     args.scanned_ratio, args.seed)
+    print(f"Wrote {len(paths)} certificates to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
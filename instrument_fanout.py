@@ -0,0 +1,146 @@
+"""
+Fan-out of multi-instrument certificates.
+
+A single PDF can hold the certificates of several instruments. The extracted list is
+split into one unit per instrument (manufacturer, model and serial number), the units
+are researched and analyzed in parallel under a concurrency cap, and the per-instrument
+results are combined into one result with an aggregate verdict.
+"""
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+from spec_store import normalize_field
+from prompt_renderer import compact_json
+
+logger = logging.getLogger(__name__)
+
+SERIAL_KEYS = ("SerialNumber", "Serial Number", "Serial", "SN")
+
+
+def _serial_number(cert):
+    return next((cert[key] for key in SERIAL_KEYS if cert.get(key)), "")
+
+
+def instrument_key(cert):
+    return "|".join(normalize_field(value) for value in (
+        cert.get("Manufacturer"), cert.get("Model"), _serial_number(cert)
+    ))
+
+
+def instrument_label(unit):
+    cert = unit[0]
+    label = f"{cert.get('Manufacturer', 'Unknown Manufacturer')} {cert.get('Model', 'Unknown Model')}"
+    serial = _serial_number(cert)
+    return f"{label} (S/N {serial})" if serial else label
+
+
+def split_instruments(certificate_data):
+    """
+    Split extracted certificate data into one unit per instrument.
+
+    Each unit is a list of certificate dicts in the shape process_pdf_with_openai returns;
+    entries for the same manufacturer, model and serial number (e.g. a certificate spread
+    over several extracted sections) stay together.
+    """
+    if not isinstance(certificate_data, list):
+        return [certificate_data]
+    units = OrderedDict()
+    for cert in certificate_data:
+        if isinstance(cert, dict):
+            units.setdefault(instrument_key(cert), []).append(cert)
+    return list(units.values()) or [certificate_data]
+
+
+async def fan_out(units, analyze_unit, max_in_flight=4):
+    """
+    Run analyze_unit(unit) for every unit, at most max_in_flight at a time.
+
+    Units with identical content are analyzed once. Returns one (result, error) pair per
+    unit, in input order; a failing instrument does not fail the others.
+    """
+    semaphore = asyncio.Semaphore(max_in_flight)
+    shared = {}
+
+    async def run(unit):
+        async with semaphore:
+            return await analyze_unit(unit)
+
+    tasks = []
+    for unit in units:
+        digest = hashlib.sha256(compact_json(unit).encode("utf-8")).hexdigest()
+        if digest not in shared:
+            shared[digest] = asyncio.ensure_future(run(unit))
+        else:
+            logger.info(f"Reusing the analysis of an identical unit for {instrument_label(unit)}")
+        tasks.append(shared[digest])
+
+    try:
+        await asyncio.wait(set(tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    outcomes = []
+    for task in tasks:
+        if task.exception() is not None:
+            outcomes.append((None, task.exception()))
+        else:
+            outcomes.append((task.result(), None))
+    return outcomes
+
+
+def aggregate_instrument_results(units, outcomes):
+    """Combine per-instrument results into one result with per-instrument verdicts and an aggregate"""
+    instruments = []
+    counts = {"PASS": 0, "FAIL": 0, "CANNOT_VERIFY": 0, "ERROR": 0}
+    calculations, discrepancies, analyses, sources = [], [], [], []
+    for index, (unit, (result, error)) in enumerate(zip(units, outcomes)):
+        cert = unit[0]
+        label = instrument_label(unit)
+        entry = {
+            "index": index,
+            "instrument": label,
+            "manufacturer": cert.get("Manufacturer", "Unknown Manufacturer"),
+            "model": cert.get("Model", "Unknown Model"),
+            "serial_number": _serial_number(cert),
+        }
+        if error is not None:
+            counts["ERROR"] += 1
+            entry.update(verdict="ERROR", error=getattr(error, "detail", None) or str(error))
+            instruments.append(entry)
+            continue
+
+        verdict = str(result.get("verdict", "")).upper()
+        counts[verdict if verdict in counts else "CANNOT_VERIFY"] += 1
+        entry.update(verdict=result.get("verdict"), confidence=result.get("confidence"),
+                     summary=result.get("summary"), spec_source=result.get("spec_source"), result=result)
+        instruments.append(entry)
+        calculations.extend(dict(calc, instrument=label) for calc in result.get("calculations") or [])
+        discrepancies.extend(dict(disc, instrument=label) for disc in result.get("discrepancies") or [])
+        if result.get("analysis"):
+            analyses.append(f"{label}: {result['analysis']}")
+        if result.get("spec_source"):
+            sources.append(f"{label}: {result['spec_source']}")
+
+    if counts["FAIL"]:
+        verdict = "FAIL"
+    elif counts["PASS"] == len(units):
+        verdict = "PASS"
+    else:
+        verdict = "CANNOT_VERIFY"
+    confidences = [str(entry.get("confidence", "")).upper() for entry in instruments if "confidence" in entry]
+    confidence = next((level for level in ("LOW", "MEDIUM", "HIGH") if level in confidences), "LOW")
+    per_instrument = "; ".join(f"{entry['instrument']}: {entry['verdict']}" for entry in instruments)
+    return {
+        "verdict": verdict,
+        "confidence": confidence,
+        "analysis": "\n\n".join(analyses),
+        "calculations": calculations,
+        "discrepancies": discrepancies,
+        "spec_source": "\n".join(sources),
+        "summary": f"{len(units)} instruments analyzed ({per_instrument}).",
+        "instruments": instruments,
+        "instrument_counts": counts,
+    }
@@ -0,0 +1,204 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+
+from metrics import JOB_QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED)
+
+# Pipeline artifacts exposed on GET /jobs/{id} as soon as the stage producing them finishes
+ARTIFACT_STAGES = {"extraction": "certificate_data", "research": "specifications", "analysis": "result"}
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while max_queued_jobs jobs are already waiting"""
+
+    def __init__(self, max_queued_jobs):
+        super().__init__(f"Job queue is full ({max_queued_jobs} jobs waiting)")
+        self.max_queued_jobs = max_queued_jobs
+
+
+class Job:
+    """A certificate analysis submitted through the job API"""
+
+    def __init__(self, pdf_bytes, filename, custom_instructions=None, bypass_cache=False):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.custom_instructions = custom_instructions
+        self.bypass_cache = bypass_cache
+        self.pdf_bytes = pdf_bytes
+        self.status = STATUS_QUEUED
+        self.stage = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.artifacts = {}
+        self.error = None
+        self.events = []
+        self._stage_started = {}
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self):
+        return self.status in FINISHED_STATUSES
+
+    def record(self, event_type, **data):
+        """Append an event to the job history and wake up any event stream subscribers"""
+        event = {"event": event_type, "job_id": self.id, "timestamp": time.time()}
+        event.update(data)
+        self.events.append(event)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return event
+
+    def on_progress(self, stage, status, artifact=None):
+        """Progress callback handed to the pipeline runner"""
+        now = time.perf_counter()
+        if status == "started":
+            self.stage = stage
+            self._stage_started[stage] = now
+            self.record("stage", stage=stage, status=status)
+            return
+
+        elapsed = now - self._stage_started.pop(stage, now)
+        if artifact is not None and stage in ARTIFACT_STAGES:
+            self.artifacts[ARTIFACT_STAGES[stage]] = artifact
+        self.record("stage", stage=stage, status=status, elapsed=round(elapsed, 3))
+
+    def to_dict(self, include_artifacts=True, include_events=False):
+        job = {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_wait": round(self.started_at - self.created_at, 3) if self.started_at else None,
+            "duration": round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+            "error": self.error,
+        }
+        if include_artifacts:
+            job["artifacts"] = self.artifacts
+        if include_events:
+            job["events"] = self.events
+        return job
+
+
+class JobManager:
+    """
+    In-process job queue with a fixed pool of worker tasks.
+
+    runner is an async callable (pdf_bytes, filename, custom_instructions, bypass_cache, on_progress)
+    that returns the analysis result. At most max_queued_jobs jobs wait for a worker; finished
+    jobs are kept in memory up to max_finished_jobs.
+    """
+
+    def __init__(self, runner, workers=4, max_finished_jobs=1000, max_queued_jobs=100):
+        self.runner = runner
+        self.workers = workers
+        self.max_finished_jobs = max_finished_jobs
+        self.max_queued_jobs = max_queued_jobs
+        self.jobs = OrderedDict()
+        self._queue = None
+        self._tasks = []
+
+    @classmethod
+    def from_env(cls, runner):
+        """Create a manager configured from JOB_* environment variables"""
+        return cls(
+            runner,
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_finished_jobs=int(os.getenv("JOB_MAX_FINISHED", "1000")),
+            max_queued_jobs=int(os.getenv("JOB_MAX_QUEUED", "100")),
+        )
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued_jobs)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, pdf_bytes, filename, custom_instructions=None, bypass_cache=False):
+        """Queue a certificate for analysis and return its job immediately; raises JobQueueFullError"""
+        if self._queue.full():
+            raise JobQueueFullError(self.max_queued_jobs)
+        job = Job(pdf_bytes, filename, custom_instructions, bypass_cache)
+        self.jobs[job.id] = job
+        job.record("status", status=STATUS_QUEUED, queue_position=self._queue.qsize() + 1)
+        self._queue.put_nowait(job)
+        self._prune()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "queued": self._queue.qsize() if self._queue else 0,
+                "max_queued": self.max_queued_jobs, "jobs": counts}
+
+    async def events(self, job):
+        """Yield the job's past events, then new ones as they happen, until the job finishes"""
+        index = 0
+        while True:
+            changed = job._changed
+            while index < len(job.events):
+                yield job.events[index]
+                index += 1
+            if job.done:
+                return
+            await changed.wait()
+
+    async def _worker(self, number):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job):
+        job.status = STATUS_RUNNING
+        job.started_at = time.time()
+        JOB_QUEUE_WAIT.observe(job.started_at - job.created_at)
+        job.record("status", status=STATUS_RUNNING, queue_wait=round(job.started_at - job.created_at, 3))
+        try:
+            result = await self.runner(
+                job.pdf_bytes, job.filename, job.custom_instructions, job.bypass_cache, job.on_progress
+            )
+            job.artifacts["result"] = result
+            job.status = STATUS_COMPLETED
+            logger.info(f"Job {job.id} completed with verdict {result.get('verdict', 'N/A')}")
+        except Exception as e:
+            job.error = getattr(e, "detail", None) or str(e)
+            job.status = STATUS_FAILED
+            logger.error(f"Job {job.id} failed: {job.error}")
+        finally:
+            job.pdf_bytes = None
+            job.finished_at = time.time()
+            job.stage = None
+            job.record("status", status=job.status, duration=round(job.finished_at - job.started_at, 3),
+                       error=job.error)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
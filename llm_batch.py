@@ -0,0 +1,207 @@
+"""
+Provider batch submission for the analysis stage.
+
+Analysis prompts from many certificates are collected and sent together as one OpenAI
+Batch API job: a JSONL file of chat completion requests is uploaded to /v1/files, a
+/v1/batches job is created for it, and the output file is downloaded once the job has
+completed. Batch jobs are billed at a lower rate and run within a completion window
+rather than immediately, which suits overnight re-verification of archives but not
+interactive requests.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import logging
+from contextvars import ContextVar
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_TEMPLATE = "final_analysis/analysis_prompt"
+
+# Batch analyzer used by run_llm_analysis in place of perform_analysis, when set
+current_batch_analyzer = ContextVar("current_batch_analyzer", default=None)
+
+
+def parse_json_content(content):
+    """Parse a model answer as JSON, tolerating Markdown code fences and text around the object"""
+    text = content.strip()
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return json.loads(text[start:end + 1])
+
+
+class BatchClient:
+    """Minimal client for the OpenAI files and batches endpoints"""
+
+    def __init__(self, base_url, api_key, model, completion_window="24h", poll_interval=30.0, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    @classmethod
+    def from_env(cls):
+        """Create a client configured from OPENAI_BASE_URL, OPENAI_API_KEY and LLM_BATCH_* variables"""
+        return cls(
+            base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+            api_key=os.getenv("OPENAI_API_KEY", ""),
+            model=os.getenv("LLM_BATCH_MODEL", "o3-mini"),
+            completion_window=os.getenv("LLM_BATCH_COMPLETION_WINDOW", "24h"),
+            poll_interval=float(os.getenv("LLM_BATCH_POLL_SECONDS", "30")),
+        )
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def _read_file(self, file_id):
+        lines = self._request("GET", f"/files/{file_id}/content").text.splitlines()
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def run(self, prompts):
+        """
+        Submit {custom_id: prompt} as one batch job and block until it finishes.
+
+        Returns {custom_id: {"content": text}} for answered requests and
+        {custom_id: {"error": message}} for failed ones.
+        """
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": self.model, "messages": [{"role": "user", "content": prompt}]},
+            })
+            for custom_id, prompt in prompts.items()
+        ]
+        upload = self._request(
+            "POST", "/files", data={"purpose": "batch"},
+            files={"file": (f"batch_{uuid.uuid4().hex[:8]}.jsonl", "\n".join(lines).encode("utf-8"))},
+        ).json()
+        batch = self._request("POST", "/batches", json={
+            "input_file_id": upload["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": self.completion_window,
+        }).json()
+        logger.info(f"Submitted batch {batch['id']} with {len(prompts)} requests")
+
+        started = time.perf_counter()
+        while batch["status"] not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(self.poll_interval)
+            batch = self._request("GET", f"/batches/{batch['id']}").json()
+        logger.info(f"Batch {batch['id']} {batch['status']} after {time.perf_counter() - started:.0f}s "
+                    f"({batch.get('request_counts')})")
+
+        outputs = {}
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            for record in self._read_file(file_id) if file_id else []:
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    error = record.get("error") or body.get("error") or {}
+                    outputs[record["custom_id"]] = {"error": error.get("message") or str(error)}
+                else:
+                    outputs[record["custom_id"]] = {"content": body["choices"][0]["message"]["content"]}
+        for custom_id in prompts:
+            outputs.setdefault(custom_id, {"error": f"No output in batch {batch['id']} ({batch['status']})"})
+        return outputs
+
+
+class BatchAnalyzer:
+    """
+    Collects analysis prompts from concurrent certificates into provider batch jobs.
+
+    A batch is submitted when max_requests prompts are waiting or max_wait seconds after
+    the first one arrived, whichever comes first. Each caller awaits the parsed answer
+    for its own prompt.
+    """
+
+    def __init__(self, client, renderer, max_requests=500, max_wait=60.0):
+        self.client = client
+        self.renderer = renderer
+        self.max_requests = max_requests
+        self.max_wait = max_wait
+        self.counters = {"batches": 0, "requests": 0, "failed": 0}
+        self._pending = []
+        self._timer = None
+        self._jobs = set()
+
+    @classmethod
+    def from_env(cls, renderer):
+        """Create an analyzer configured from LLM_BATCH_MAX_REQUESTS and LLM_BATCH_MAX_WAIT"""
+        return cls(
+            BatchClient.from_env(),
+            renderer,
+            max_requests=int(os.getenv("LLM_BATCH_MAX_REQUESTS", "500")),
+            max_wait=float(os.getenv("LLM_BATCH_MAX_WAIT", "60")),
+        )
+
+    async def analyze(self, certificate_data, specifications, custom_instructions=None):
+        """Batched equivalent of perform_analysis for one chunk of certificate data"""
+        prompt = self.renderer.render(
+            ANALYSIS_TEMPLATE, certificate_data=certificate_data, specifications=specifications
+        )
+        if custom_instructions:
+            prompt += f"\n\nADDITIONAL INSTRUCTIONS:\n{custom_instructions}"
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((uuid.uuid4().hex, prompt, future))
+        if len(self._pending) >= self.max_requests:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    def flush(self):
+        """Submit the waiting prompts now"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._pending = self._pending, []
+        if items:
+            job = asyncio.ensure_future(self._submit(items))
+            self._jobs.add(job)
+            job.add_done_callback(self._jobs.discard)
+
+    async def _submit(self, items):
+        self.counters["batches"] += 1
+        self.counters["requests"] += len(items)
+        try:
+            outputs = await asyncio.get_running_loop().run_in_executor(
+                None, self.client.run, {custom_id: prompt for custom_id, prompt, _ in items}
+            )
+        except Exception as e:
+            logger.error(f"Batch submission of {len(items)} requests failed: {str(e)}")
+            outputs = {custom_id: {"error": str(e)} for custom_id, _, _ in items}
+
+        for custom_id, _, future in items:
+            if future.done():
+                continue
+            output = outputs[custom_id]
+            try:
+                if "error" in output:
+                    raise RuntimeError(f"Batch request failed: {output['error']}")
+                future.set_result(parse_json_content(output["content"]))
+            except Exception as e:
+                self.counters["failed"] += 1
+                future.set_exception(e)
+
+    def stats(self):
+        return dict(self.counters, pending=len(self._pending), in_flight=len(self._jobs))
@@ -0,0 +1,426 @@
+"""
+Local library of manufacturer manuals and datasheets for manual-extraction specifications.
+
+Manual PDFs under a library directory are indexed with PyMuPDF into SQLite: one row
+per document (manufacturer, model, content hash) and one full-text (FTS5) row per page,
+with the spec tables of specification pages pre-rendered as small pipe tables. Index
+builds are incremental: unchanged files are skipped on size and mtime, and files whose
+content hash changed are re-indexed.
+
+A lookup finds the few spec pages of a manufacturer/model that match the parameters on
+the certificate and returns them as compact manual specifications, in milliseconds and
+without an LLM round-trip. Page text is only read from the PDF, lazily, for matched
+pages that have no pre-rendered tables.
+
+Layout: <library>/<Manufacturer>/<Model>.pdf, or <library>/<Manufacturer>_<Model>.pdf.
+
+Usage:
+    python manual_library.py index [--dir manuals]
+    python manual_library.py search Fluke 87V "dc voltage" resistance
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+
+import fitz
+
+from pdf_preextract import FITZ_LOCK
+from prompt_renderer import tested_parameter_tokens
+
+logger = logging.getLogger(__name__)
+
+# Words in manual file names that are not part of the model
+FILENAME_NOISE = {
+    "manual", "manuals", "datasheet", "data", "sheet", "user", "users", "guide", "specs", "spec",
+    "specifications", "service", "operators", "operator", "calibration", "reference", "en", "eng",
+}
+
+# A page counts as a specification page when it mentions these and carries numeric tolerances
+SPEC_KEYWORDS = ("specification", "accuracy", "tolerance", "uncertainty", "± (", "±(", "% of reading", "resolution")
+TOLERANCE_PATTERN = re.compile(r"(±|\+/-)\s*\(?\s*\d|\d\s*%\s*(of|\+|rdg|reading)", re.IGNORECASE)
+
+
+def _normalize(value):
+    return re.sub(r"[^a-z0-9]", "", str(value or "").lower())
+
+
+def _words(value):
+    return re.findall(r"[a-z0-9]+", str(value or "").lower())
+
+
+def _contains_words(words, part):
+    """True when part is a non-empty run of consecutive words of words"""
+    return bool(part) and any(words[i:i + len(part)] == part for i in range(len(words) - len(part) + 1))
+
+
+def _file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_manual_path(library_dir, path):
+    """Work out (manufacturer, model) from the manual's location in the library"""
+    relative = os.path.relpath(path, library_dir)
+    parts = relative.replace("\\", "/").split("/")
+    stem = os.path.splitext(parts[-1])[0]
+    words = [word for word in re.split(r"[_\s]+", stem) if word]
+    if len(parts) >= 2:
+        manufacturer = parts[0]
+    else:
+        manufacturer, words = (words[0], words[1:]) if len(words) > 1 else ("", words)
+    model = " ".join(word for word in words if word.lower() not in FILENAME_NOISE) or stem
+    return manufacturer, model
+
+
+def _spec_score(text):
+    lowered = text.lower()
+    keywords = sum(1 for keyword in SPEC_KEYWORDS if keyword in lowered)
+    tolerances = len(TOLERANCE_PATTERN.findall(text))
+    return keywords + min(tolerances, 10) if tolerances else 0
+
+
+def _section_title(text):
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if 3 <= len(line) <= 80 and re.search(r"[A-Za-z]{3}", line):
+            return line
+    return ""
+
+
+def _pipe_table(rows):
+    lines = []
+    for row in rows:
+        cells = [" ".join(str(cell or "").split()) for cell in row]
+        if any(cells):
+            lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+class ManualLibrary:
+    """Incrementally indexed full-text store of manufacturer manuals"""
+
+    def __init__(self, db_path, library_dir, max_pages=3, max_chars=6000):
+        self.db_path = str(db_path)
+        self.library_dir = str(library_dir)
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT UNIQUE NOT NULL,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                manufacturer TEXT NOT NULL,
+                model TEXT NOT NULL,
+                manufacturer_key TEXT NOT NULL,
+                model_key TEXT NOT NULL,
+                page_count INTEGER NOT NULL,
+                indexed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS documents_instrument ON documents (manufacturer_key, model_key);
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+                page_number INTEGER NOT NULL,
+                section TEXT NOT NULL,
+                spec_score INTEGER NOT NULL,
+                tables TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_document ON pages (document_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5 (section, body, tokenize = 'porter unicode61');
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Create a library configured from MANUAL_LIBRARY_* environment variables"""
+        return cls(
+            db_path=os.getenv("MANUAL_LIBRARY_DB", os.path.join("cache", "manuals.sqlite3")),
+            library_dir=os.getenv("MANUAL_LIBRARY_DIR", "manuals"),
+            max_pages=int(os.getenv("MANUAL_LIBRARY_MAX_PAGES", "3")),
+            max_chars=int(os.getenv("MANUAL_LIBRARY_MAX_CHARS", "6000")),
+        )
+
+    def index(self, force=False):
+        """
+        Bring the index up to date with the library directory.
+
+        New and changed files (by content hash) are indexed, files that disappeared are
+        removed. Returns counts of added, updated, unchanged and removed documents.
+        """
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        found = set()
+        for root, _, files in os.walk(self.library_dir):
+            for name in sorted(files):
+                if not name.lower().endswith(".pdf"):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                found.add(path)
+                try:
+                    counts[self._index_file(path, force)] += 1
+                except Exception as e:
+                    logger.error(f"Failed to index manual {path}: {str(e)}")
+                    counts["failed"] += 1
+
+        with self._lock:
+            stale = [row["id"] for row in self._conn.execute("SELECT id, path FROM documents")
+                     if row["path"] not in found]
+            for document_id in stale:
+                self._delete_document(document_id)
+            self._conn.commit()
+        counts["removed"] = len(stale)
+        logger.info(f"Manual library index: {counts}")
+        return counts
+
+    def _index_file(self, path, force):
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, content_hash, size, mtime FROM documents WHERE path = ?", (path,)
+            ).fetchone()
+        if row and not force and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime:
+            return "unchanged"
+        content_hash = _file_hash(path)
+        if row and not force and row["content_hash"] == content_hash:
+            with self._lock:
+                self._conn.execute("UPDATE documents SET mtime = ? WHERE id = ?", (stat.st_mtime, row["id"]))
+                self._conn.commit()
+            return "unchanged"
+
+        manufacturer, model = parse_manual_path(self.library_dir, path)
+        pages = []
+        # Opened from the path so PyMuPDF loads pages on demand instead of reading the whole file.
+        # The lock is taken per page so certificate extraction is not held up by a long manual.
+        with FITZ_LOCK:
+            doc = fitz.open(path)
+            page_count = len(doc)
+        try:
+            for page_number in range(page_count):
+                with FITZ_LOCK:
+                    page = doc.load_page(page_number)
+                    text = page.get_text("text")
+                    score = _spec_score(text)
+                    tables = []
+                    if score:
+                        try:
+                            tables = [_pipe_table(table.extract()) for table in page.find_tables().tables]
+                        except Exception as e:
+                            logger.warning(f"Table detection failed on {path} page {page_number + 1}: {str(e)}")
+                    # Freed while the lock is held, as it releases MuPDF objects
+                    page = None
+                pages.append((page_number, _section_title(text), score, "\n\n".join(t for t in tables if t), text))
+        finally:
+            with FITZ_LOCK:
+                doc.close()
+
+        with self._lock:
+            if row:
+                self._delete_document(row["id"])
+            cursor = self._conn.execute(
+                """
+                INSERT INTO documents (path, content_hash, size, mtime, manufacturer, model,
+                                       manufacturer_key, model_key, page_count, indexed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (path, content_hash, stat.st_size, stat.st_mtime, manufacturer, model,
+                 _normalize(manufacturer), _normalize(model), page_count, time.time()),
+            )
+            document_id = cursor.lastrowid
+            for page_number, section, score, tables, text in pages:
+                page_id = self._conn.execute(
+                    "INSERT INTO pages (document_id, page_number, section, spec_score, tables) VALUES (?, ?, ?, ?, ?)",
+                    (document_id, page_number, section, score, tables),
+                ).lastrowid
+                self._conn.execute("INSERT INTO page_text (rowid, section, body) VALUES (?, ?, ?)",
+                                   (page_id, section, text))
+            self._conn.commit()
+        logger.info(f"Indexed {manufacturer} {model}: {page_count} pages, "
+                    f"{sum(1 for page in pages if page[2])} spec pages ({os.path.basename(path)})")
+        return "updated" if row else "added"
+
+    def _delete_document(self, document_id):
+        # Caller holds the lock
+        self._conn.execute(
+            "DELETE FROM page_text WHERE rowid IN (SELECT id FROM pages WHERE document_id = ?)", (document_id,)
+        )
+        self._conn.execute("DELETE FROM pages WHERE document_id = ?", (document_id,))
+        self._conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+
+    def _documents_for(self, manufacturer, model):
+        """
+        Manuals of the instrument: an exact (normalized) model match, or the manual's model
+        appearing as whole words in the certificate's model when the manufacturers also match.
+        """
+        manufacturer_key, model_key = _normalize(manufacturer), _normalize(model)
+        if len(model_key) < 2:
+            return []
+        manufacturer_words, model_words = _words(manufacturer), _words(model)
+        rows = self._conn.execute("SELECT * FROM documents").fetchall()
+        matches = []
+        for row in rows:
+            same_manufacturer = bool(manufacturer_key and row["manufacturer_key"]) and (
+                _contains_words(manufacturer_words, _words(row["manufacturer"]))
+                or _contains_words(_words(row["manufacturer"]), manufacturer_words)
+            )
+            if manufacturer_key and row["manufacturer_key"] and not same_manufacturer:
+                continue
+            if model_key == row["model_key"] or (
+                same_manufacturer and _contains_words(model_words, _words(row["model"]))
+            ):
+                matches.append(row)
+        return matches
+
+    def find_pages(self, manufacturer, model, parameters=()):
+        """Return the best-matching spec pages of the instrument's manuals, most relevant first"""
+        with self._lock:
+            documents = self._documents_for(manufacturer, model)
+            if not documents:
+                return []
+            terms = sorted({term for term in parameters if re.fullmatch(r"[a-z0-9]+", term)} |
+                           {"accuracy", "specifications"})
+            query = " OR ".join(f'"{term}"' for term in terms)
+            placeholders = ",".join("?" for _ in documents)
+            rows = self._conn.execute(
+                f"""
+                SELECT d.path, d.manufacturer, d.model, p.page_number, p.section, p.spec_score, p.tables
+                FROM page_text
+                JOIN pages p ON p.id = page_text.rowid
+                JOIN documents d ON d.id = p.document_id
+                WHERE page_text MATCH ? AND p.document_id IN ({placeholders}) AND p.spec_score > 0
+                ORDER BY bm25(page_text) - p.spec_score * 0.1
+                LIMIT ?
+                """,
+                [query] + [row["id"] for row in documents] + [self.max_pages],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def lookup(self, manufacturer, model, parameters=()):
+        """
+        Return manual specifications for the instrument limited to the relevant spec pages,
+        or None when the library has no manual (or no matching spec pages) for it.
+        """
+        pages = self.find_pages(manufacturer, model, parameters)
+        if not pages:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        specifications = {}
+        budget = self.max_chars
+        for page in pages:
+            content = page["tables"] or _read_page_text(page["path"], page["page_number"])
+            content = content[:max(0, budget)]
+            if not content:
+                break
+            budget -= len(content)
+            key = f"{page['section'] or 'Specifications'} (page {page['page_number'] + 1})"
+            specifications[key] = content
+
+        name = os.path.basename(pages[0]["path"])
+        page_numbers = ", ".join(str(page["page_number"] + 1) for page in pages)
+        return {
+            "manufacturer": pages[0]["manufacturer"],
+            "model": pages[0]["model"],
+            "spec_source": f"Manual extraction from {name}, pages {page_numbers}",
+            "specifications": specifications,
+            "manual_pages": [
+                {"document": os.path.basename(page["path"]), "page": page["page_number"] + 1, "section": page["section"]}
+                for page in pages
+            ],
+        }
+
+    def research(self, certificate_data):
+        """Spec source adapter: look up the certificate's instrument and tested parameters"""
+        cert = certificate_data[0] if isinstance(certificate_data, list) and certificate_data else certificate_data
+        if not isinstance(cert, dict):
+            return None
+        return self.lookup(cert.get("Manufacturer"), cert.get("Model"), tested_parameter_tokens(certificate_data))
+
+    def list(self):
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT d.id, d.path, d.manufacturer, d.model, d.page_count, d.content_hash, d.indexed_at,
+                       (SELECT COUNT(*) FROM pages p WHERE p.document_id = d.id AND p.spec_score > 0) AS spec_pages
+                FROM documents d ORDER BY d.manufacturer, d.model
+                """
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            pages = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {"library_dir": self.library_dir, "documents": documents, "pages": pages,
+                "hits": self.hits, "misses": self.misses}
+
+
+def _read_page_text(path, page_number):
+    """Read a single page's text; PyMuPDF only parses the requested page"""
+    try:
+        with FITZ_LOCK:
+            with fitz.open(path) as doc:
+                text = doc.load_page(page_number).get_text("text")
+    except Exception as e:
+        logger.warning(f"Could not read page {page_number + 1} of {path}: {str(e)}")
+        return ""
+    return "\n".join(" ".join(line.split()) for line in text.splitlines() if line.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and search the local manual library")
+    parser.add_argument("--dir", default=None, help="Library directory (default MANUAL_LIBRARY_DIR or manuals)")
+    parser.add_argument("--db", default=None, help="Index database (default MANUAL_LIBRARY_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_parser = commands.add_parser("index", help="Index new and changed manuals")
+    index_parser.add_argument("--force", action="store_true", help="Re-index every file")
+    commands.add_parser("list", help="List indexed manuals")
+    search_parser = commands.add_parser("search", help="Show the spec pages returned for an instrument")
+    search_parser.add_argument("manufacturer")
+    search_parser.add_argument("model")
+    search_parser.add_argument("parameters", nargs="*", help="Tested parameters, e.g. 'dc voltage'")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.dir:
+        os.environ["MANUAL_LIBRARY_DIR"] = args.dir
+    if args.db:
+        os.environ["MANUAL_LIBRARY_DB"] = args.db
+    library = ManualLibrary.from_env()
+
+    if args.command == "index":
+        print(json.dumps(library.index(force=args.force), indent=2))
+    elif args.command == "list":
+        print(json.dumps(library.list(), indent=2))
+    else:
+        parameters = {word for phrase in args.parameters for word in re.findall(r"[a-z0-9]+", phrase.lower())}
+        started = time.perf_counter()
+        result = library.lookup(args.manufacturer, args.model, parameters)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        print(f"Lookup took {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Per-stage performance instrumentation.
+
+A small Prometheus-compatible registry (counters, gauges and histograms rendered in
+the text exposition format for GET /metrics) plus RequestTimings, the per-request
+breakdown returned as the "timings" block of every analysis result. The timings of
+the request being processed are tracked through a context variable, so pipeline code
+only has to call record_* and does not need to thread the object through every call.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# Rough per-1K-token prices used for the estimated cost counters
+INPUT_COST_PER_1K = float(os.getenv("LLM_INPUT_COST_PER_1K", "0.0025"))
+OUTPUT_COST_PER_1K = float(os.getenv("LLM_OUTPUT_COST_PER_1K", "0.01"))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [c + (1 if value <= bound else 0) for c, bound in zip(counts, self.buckets)]
+            self._values[key] = (counts, total + value, count + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.label_names, key, [("le", f"{bound:g}")])
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+STAGE_DURATION = Histogram(
+    "toleranceverifier_stage_duration_seconds", "Wall time of pipeline stages", ["stage"])
+STAGE_QUEUE_WAIT = Histogram(
+    "toleranceverifier_stage_queue_wait_seconds", "Time spent waiting for a free stage slot", ["stage"])
+LLM_REQUESTS = Counter(
+    "toleranceverifier_llm_requests_total", "LLM requests issued per stage", ["stage"])
+LLM_TOKENS = Counter(
+    "toleranceverifier_llm_tokens_total", "Estimated LLM tokens per stage", ["stage", "direction"])
+LLM_COST = Counter(
+    "toleranceverifier_llm_cost_usd_total", "Estimated LLM cost in USD per stage", ["stage"])
+CACHE_LOOKUPS = Counter(
+    "toleranceverifier_cache_lookups_total", "Cache lookups by cache and outcome", ["cache", "result"])
+SINGLEFLIGHT_CALLS = Counter(
+    "toleranceverifier_singleflight_calls_total", "Calls that ran or joined an identical in-flight call",
+    ["flight", "result"])
+REQUEST_DURATION = Histogram(
+    "toleranceverifier_request_duration_seconds", "HTTP request duration per route", ["method", "route", "status"])
+JOB_QUEUE_WAIT = Histogram(
+    "toleranceverifier_job_queue_wait_seconds", "Time jobs wait in the queue before a worker picks them up")
+STAGE_ACTIVE = Gauge(
+    "toleranceverifier_stage_active", "Stage executions currently running", ["stage"])
+STAGE_WAITING = Gauge(
+    "toleranceverifier_stage_waiting", "Stage executions waiting for a free slot", ["stage"])
+JOBS = Gauge(
+    "toleranceverifier_jobs", "Jobs currently held by the job manager", ["status"])
+
+
+def render_metrics():
+    """Render every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    """Per-request breakdown of where the time (and the LLM budget) went"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.cache = {}
+
+    def _stage(self, stage):
+        return self.stages.setdefault(stage, {
+            "seconds": 0.0, "queue_wait": 0.0, "calls": 0,
+            "llm_requests": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0,
+        })
+
+    @contextmanager
+    def phase(self, stage):
+        """Time a block of work that does not go through the stage executor"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record_stage(stage, time.perf_counter() - started)
+
+    def to_dict(self):
+        stages = {
+            stage: dict(values, seconds=round(values["seconds"], 4), queue_wait=round(values["queue_wait"], 4),
+                        cost_usd=round(values["cost_usd"], 6))
+            for stage, values in self.stages.items()
+        }
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": stages,
+            "cache": self.cache,
+            "llm_requests": sum(values["llm_requests"] for values in self.stages.values()),
+            "estimated_cost_usd": round(sum(values["cost_usd"] for values in self.stages.values()), 6),
+        }
+
+    def server_timing(self):
+        """Format the stage durations as a Server-Timing header value"""
+        parts = [f"{stage};dur={values['seconds'] * 1000:.1f}" for stage, values in self.stages.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+current_timings = ContextVar("current_timings", default=None)
+
+
+def record_stage(stage, seconds, queue_wait=0.0, llm=False):
+    STAGE_DURATION.observe(seconds, stage=stage)
+    STAGE_QUEUE_WAIT.observe(queue_wait, stage=stage)
+    if llm:
+        LLM_REQUESTS.inc(stage=stage)
+    timings = current_timings.get()
+    if timings is not None:
+        values = timings._stage(stage)
+        values["seconds"] += seconds
+        values["queue_wait"] += queue_wait
+        values["calls"] += 1
+        if llm:
+            values["llm_requests"] += 1
+
+
+def record_llm_usage(stage, input_tokens=0, output_tokens=0):
+    """Record (estimated) token usage and cost of LLM requests made by a stage"""
+    cost = input_tokens / 1000.0 * INPUT_COST_PER_1K + output_tokens / 1000.0 * OUTPUT_COST_PER_1K
+    LLM_TOKENS.inc(input_tokens, stage=stage, direction="input")
+    LLM_TOKENS.inc(output_tokens, stage=stage, direction="output")
+    LLM_COST.inc(cost, stage=stage)
+    timings = current_timings.get()
+    if timings is not None:
+        values = timings._stage(stage)
+        values["input_tokens"] += input_tokens
+        values["output_tokens"] += output_tokens
+        values["cost_usd"] += cost
+
+
+def record_cache(cache, hit):
+    result = "hit" if hit else "miss"
+    CACHE_LOOKUPS.inc(cache=cache, result=result)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.cache[cache] = result
@@ -0,0 +1,229 @@
+"""
+Local PDF pre-extraction with PyMuPDF.
+
+Pulls the text layer, tables and certificate header (manufacturer, model, serial
+number, ...) out of the uploaded PDF bytes without touching the disk. When the
+local parse already yields the instrument and its test points, the LLM extraction
+step can be skipped; otherwise only the pages that carry calibration content are
+handed to the LLM extractor.
+"""
+import re
+import logging
+import threading
+
+import fitz
+
+from tolerance_engine import (
+    normalize_key, NOMINAL_KEYS, APPLIED_TOLERANCE_KEYS, LOWER_LIMIT_KEYS, UPPER_LIMIT_KEYS, LIMITS_KEYS, PARAMETER_KEYS,
+)
+
+logger = logging.getLogger(__name__)
+
+# PyMuPDF is not thread-safe, so documents are only ever opened by one worker thread at a time
+FITZ_LOCK = threading.Lock()
+
+HEADER_PATTERNS = {
+    "Manufacturer": r"(?:manufacturer|make|mfr\.?)",
+    "Model": r"(?:model(?:\s*(?:no\.?|number|#))?)",
+    "SerialNumber": r"(?:serial(?:\s*(?:no\.?|number|#))?|s/n)",
+    "EquipmentType": r"(?:equipment\s*type|instrument\s*type|equipment|instrument)",
+    "Description": r"(?:description)",
+    "CertificateNumber": r"(?:certificate\s*(?:no\.?|number|#))",
+    "CalibrationDate": r"(?:calibration\s*date|date\s*of\s*calibration)",
+}
+
+# Header fields that identify one instrument
+INSTRUMENT_FIELDS = ("Manufacturer", "Model", "SerialNumber")
+
+# Pages mentioning any of these are kept when the PDF is reduced for the LLM extractor
+CONTENT_KEYWORDS = (
+    "nominal", "tolerance", "max. error", "max error", "limit", "reading", "measured", "as found", "as left",
+    "manufacturer", "model", "serial", "calibration", "uncertainty",
+)
+
+# Pages mentioning any of these are expected to carry a test point table
+TEST_POINT_KEYWORDS = (
+    "nominal", "tolerance", "max. error", "max error", "limit", "as found", "as left", "measured", "setpoint",
+)
+
+# Pages past this are not parsed locally; they are left to the LLM extractor
+DEFAULT_MAX_PAGES = 20
+
+
+def _header_fields(text):
+    """Return {field: [distinct values in order of appearance]} for the header fields found in text"""
+    fields = {}
+    for line in text.splitlines():
+        for field, pattern in HEADER_PATTERNS.items():
+            match = re.match(rf"^\s*{pattern}\s*[:\-]\s*(.+?)\s*$", line, flags=re.IGNORECASE)
+            if match and match.group(1).strip():
+                values = fields.setdefault(field, [])
+                value = match.group(1).strip()
+                if " ".join(value.split()).lower() not in (" ".join(v.split()).lower() for v in values):
+                    values.append(value)
+    return fields
+
+
+def _table_test_points(rows):
+    """Turn a table (list of rows, first row is the header) into test point dicts"""
+    if len(rows) < 2:
+        return None, []
+    header = [str(cell or "").strip() for cell in rows[0]]
+    keys = [normalize_key(cell) for cell in header]
+    has_nominal = any(key in NOMINAL_KEYS for key in keys)
+    has_tolerance = any(key in APPLIED_TOLERANCE_KEYS or key in LIMITS_KEYS for key in keys) or (
+        any(key in LOWER_LIMIT_KEYS for key in keys) and any(key in UPPER_LIMIT_KEYS for key in keys)
+    )
+    if not has_nominal or not has_tolerance:
+        return None, []
+
+    points = []
+    for row in rows[1:]:
+        point = {name: str(cell).strip() for name, cell in zip(header, row) if name and cell not in (None, "")}
+        if any(normalize_key(name) in NOMINAL_KEYS for name in point):
+            points.append(point)
+    parameter = next((name for name, key in zip(header, keys) if key in PARAMETER_KEYS), None)
+    return parameter, points
+
+
+def _parse_page(page):
+    """Return the page text and the test point groups found in its tables"""
+    text = page.get_text("text")
+    # A test point table needs a nominal column, so skip table detection on pages that never name one
+    squeezed = re.sub(r"[^a-z0-9]", "", text.lower())
+    if not any(key in squeezed for key in NOMINAL_KEYS):
+        return text, []
+    try:
+        tables = page.find_tables().tables
+    except Exception as e:
+        logger.warning(f"Table detection failed on page {page.number + 1}: {str(e)}")
+        return text, []
+    groups = []
+    for table in tables:
+        parameter_column, points = _table_test_points(table.extract())
+        if points:
+            groups.append({"page": page.number, "parameter_column": parameter_column, "points": points})
+    return text, groups
+
+
+def preextract_pdf(pdf_bytes, max_pages=DEFAULT_MAX_PAGES):
+    """
+    Parse the first max_pages pages of the PDF bytes locally.
+
+    Returns a dict with page_count, has_text_layer, header fields, test point groups,
+    relevant_pages (indexes of pages with calibration content), test_point_pages (indexes
+    of pages that look like they hold test points), truncated and the per-page text.
+    Pages past max_pages are counted as relevant so they still reach the LLM extractor.
+    """
+    pages = []
+    groups = []
+    relevant_pages = []
+    test_point_pages = []
+    with FITZ_LOCK:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        page_count = len(doc)
+        parsed = min(page_count, max_pages) if max_pages else page_count
+        for number in range(parsed):
+            # Take the lock per page so other documents are not held up behind a long one
+            with FITZ_LOCK:
+                text, page_groups = _parse_page(doc[number])
+            pages.append(text)
+            groups.extend(page_groups)
+            lowered = text.lower()
+            if any(keyword in lowered for keyword in CONTENT_KEYWORDS):
+                relevant_pages.append(number)
+            if any(keyword in lowered for keyword in TEST_POINT_KEYWORDS):
+                test_point_pages.append(number)
+    finally:
+        with FITZ_LOCK:
+            doc.close()
+    if parsed < page_count:
+        logger.info(f"Parsed the first {parsed} of {page_count} pages locally")
+        relevant_pages.extend(range(parsed, page_count))
+
+    full_text = "\n".join(pages)
+    header_values = _header_fields(full_text)
+    return {
+        "page_count": page_count,
+        "has_text_layer": bool(full_text.strip()),
+        "header": {field: values[0] for field, values in header_values.items()},
+        # Several manufacturers, models or serial numbers mean several instruments in one PDF
+        "instrument_headers": max(
+            (len(header_values.get(field, [])) for field in INSTRUMENT_FIELDS), default=0
+        ),
+        "groups": groups,
+        "relevant_pages": relevant_pages,
+        "test_point_pages": test_point_pages,
+        "truncated": parsed < page_count,
+        "pages": pages,
+    }
+
+
+def is_complete(preextraction):
+    """
+    True when the local parse found the instrument and every page that looks like it holds
+    test points yielded a recognized test point table, so no results are left behind.
+    """
+    header = preextraction["header"]
+    if not (header.get("Manufacturer") and header.get("Model") and preextraction["groups"]):
+        return False
+    if preextraction["truncated"]:
+        return False
+    if preextraction["instrument_headers"] > 1:
+        logger.info("Found the headers of several instruments, leaving extraction to the LLM")
+        return False
+    table_pages = {group["page"] for group in preextraction["groups"]}
+    missing = [page for page in preextraction["test_point_pages"] if page not in table_pages]
+    if missing:
+        logger.info(f"No test point table recognized on page(s) {', '.join(str(page + 1) for page in missing)}")
+        return False
+    return True
+
+
+def to_certificate_data(preextraction):
+    """Build certificate data in the same shape as process_pdf_with_openai returns"""
+    header = preextraction["header"]
+    certificate = {
+        "Manufacturer": header.get("Manufacturer", "Unknown Manufacturer"),
+        "Model": header.get("Model", "Unknown Model"),
+        "EquipmentType": header.get("EquipmentType") or header.get("Description") or "Unknown Type",
+    }
+    for field in ("SerialNumber", "Description", "CertificateNumber", "CalibrationDate"):
+        if field in header:
+            certificate[field] = header[field]
+
+    test_results = []
+    for group in preextraction["groups"]:
+        column = group["parameter_column"]
+        if column:
+            # Split the table by the value in its parameter/function column
+            by_parameter = {}
+            for point in group["points"]:
+                by_parameter.setdefault(point.get(column, "Measurements"), []).append(point)
+            for parameter, points in by_parameter.items():
+                test_results.append({"Parameter": parameter, "Page": group["page"] + 1, "Measurements": points})
+        else:
+            test_results.append({"Page": group["page"] + 1, "Measurements": group["points"]})
+    certificate["TestResults"] = test_results
+    certificate["ExtractionMethod"] = "local"
+    return [certificate]
+
+
+def reduce_pdf(pdf_bytes, preextraction):
+    """
+    Return a smaller PDF with only the pages that carry calibration content.
+
+    Scanned PDFs without a text layer cannot be judged locally and are returned unchanged,
+    as are documents where every page looks relevant.
+    """
+    relevant = preextraction["relevant_pages"]
+    if not preextraction["has_text_layer"] or not relevant or len(relevant) == preextraction["page_count"]:
+        return pdf_bytes
+    with FITZ_LOCK:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            doc.select(relevant)
+            reduced = doc.tobytes(garbage=3, deflate=True)
+    logger.info(f"Reduced PDF from {preextraction['page_count']} to {len(relevant)} pages "
+                f"({len(pdf_bytes)} -> {len(reduced)} bytes)")
+    return reduced if len(reduced) < len(pdf_bytes) else pdf_bytes
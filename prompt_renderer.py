@@ -0,0 +1,346 @@
+"""
+Prompt template loading, compact serialization and token budgeting.
+
+Templates under prompts/ are loaded and split into static text and {{placeholder}}
+segments once at startup. Certificate and specification data is serialized as compact
+JSON (no whitespace, no empty values) and trimmed to fit a per-stage token budget, so
+prompts for large certificates stay bounded in size, latency and cost.
+"""
+import os
+import re
+import json
+import math
+import hashlib
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(os.path.dirname(os.path.abspath(__file__))) / "prompts"
+PLACEHOLDER = re.compile(r"\{\{\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\}\}")
+
+# Placeholders each known template must contain; other templates are loaded without checks
+EXPECTED_PLACEHOLDERS = {
+    "final_analysis/analysis_prompt": {"certificate_data", "specifications"},
+    "specification_research/gemini_research": {
+        "manufacturer", "model", "equipment_type", "description", "operating_range", "certificate_data",
+    },
+    "unified_analysis/spec_combination": {
+        "manufacturer", "model", "equipment_type", "certificate_data", "manual_specs", "ai_specs",
+    },
+}
+
+# Keys added by this server for bookkeeping that the models do not need to see
+INTERNAL_KEYS = {"ExtractionMethod", "Page"}
+
+# Rough characters-per-token ratio for English text and JSON
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def _prune(data):
+    if isinstance(data, dict):
+        pruned = {}
+        for key, value in data.items():
+            if key in INTERNAL_KEYS:
+                continue
+            value = _prune(value)
+            if value in (None, "", [], {}):
+                continue
+            pruned[key] = value
+        return pruned
+    if isinstance(data, list):
+        return [item for item in (_prune(item) for item in data) if item not in (None, "", [], {})]
+    if isinstance(data, str):
+        return " ".join(data.split())
+    return data
+
+
+def compact(data):
+    """Drop empty values, internal keys and redundant whitespace while keeping the data's shape"""
+    return _prune(data)
+
+
+def compact_json(data):
+    """Serialize data as compact JSON for inlining into a prompt"""
+    if isinstance(data, str):
+        return " ".join(data.split()) if "\n" not in data else data.strip()
+    return json.dumps(_prune(data), separators=(",", ":"), ensure_ascii=False)
+
+
+class Template:
+    """A prompt template split into static text and placeholder segments"""
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+        self.segments = []
+        position = 0
+        for match in PLACEHOLDER.finditer(text):
+            self.segments.append((False, text[position:match.start()]))
+            self.segments.append((True, match.group(1)))
+            position = match.end()
+        self.segments.append((False, text[position:]))
+        self.placeholders = {value for is_placeholder, value in self.segments if is_placeholder}
+        first = PLACEHOLDER.search(text)
+        self.static_prefix_chars = first.start() if first else len(text)
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+    def render(self, **values):
+        missing = self.placeholders - set(values)
+        if missing:
+            raise KeyError(f"Template {self.name} is missing values for: {', '.join(sorted(missing))}")
+        parts = []
+        for is_placeholder, value in self.segments:
+            if not is_placeholder:
+                parts.append(value)
+                continue
+            parts.append(values[value] if isinstance(values[value], str) else compact_json(values[value]))
+        return "".join(parts)
+
+    def static_chars(self):
+        return sum(len(value) for is_placeholder, value in self.segments if not is_placeholder)
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "placeholders": sorted(self.placeholders),
+            "static_chars": self.static_chars(),
+            "static_prefix_chars": self.static_prefix_chars,
+        }
+
+
+class PromptRenderer:
+    """Loads, validates and renders the prompt templates under prompts/"""
+
+    def __init__(self, prompts_dir=PROMPTS_DIR, budgets=None):
+        self.prompts_dir = Path(prompts_dir)
+        self.budgets = budgets or {}
+        self.templates = {}
+        self.load()
+
+    @classmethod
+    def from_env(cls):
+        """Create a renderer with per-stage budgets from PROMPT_TOKEN_BUDGET_* environment variables"""
+        return cls(budgets={
+            "research": int(os.getenv("PROMPT_TOKEN_BUDGET_RESEARCH", "16000")),
+            "analysis": int(os.getenv("PROMPT_TOKEN_BUDGET_ANALYSIS", "24000")),
+        })
+
+    def load(self):
+        """Load every template and check that the known ones carry exactly their expected placeholders"""
+        templates = {}
+        for path in sorted(self.prompts_dir.rglob("*.txt")):
+            name = path.relative_to(self.prompts_dir).with_suffix("").as_posix()
+            template = Template(name, path.read_text(encoding="utf-8"))
+            expected = EXPECTED_PLACEHOLDERS.get(name)
+            if expected is not None and template.placeholders != expected:
+                raise ValueError(
+                    f"Template {name} placeholders {sorted(template.placeholders)} do not match {sorted(expected)}"
+                )
+            if template.static_prefix_chars < template.static_chars() // 2:
+                logger.warning(f"Template {name} has dynamic content early; prompt-prefix caching will be limited")
+            templates[name] = template
+        self.templates = templates
+        logger.info(f"Loaded {len(templates)} prompt templates")
+
+    def render(self, name, **values):
+        return self.templates[name].render(**values)
+
+    def versions(self):
+        return {name: template.version for name, template in self.templates.items()}
+
+    def describe(self):
+        return {
+            "templates": [template.describe() for template in self.templates.values()],
+            "budgets": self.budgets,
+        }
+
+    def measure(self, name, **values):
+        """Render a template and return its size, for reporting per-request prompt sizes"""
+        text = self.render(name, **values)
+        return {"chars": len(text), "estimated_tokens": estimate_tokens(text)}
+
+    def fit_research_input(self, certificate_data):
+        """
+        Reduce certificate data for specification research to fit the research budget.
+
+        Research only needs to know which parameters and ranges were tested, so long
+        lists of test points are thinned to evenly spaced samples (first and last kept).
+        """
+        data = compact(certificate_data)
+        budget = self.budgets.get("research")
+        template = self.templates.get("specification_research/gemini_research")
+        if not budget or template is None:
+            return data
+        overhead = estimate_tokens(template.text)
+        max_points = None
+        while estimate_tokens(compact_json(data)) + overhead > budget:
+            longest = _longest_point_list(data)
+            if longest <= 2 or max_points == 2:
+                break
+            max_points = max(2, min(longest - 1, longest // 2))
+            data = _sample_point_lists(compact(certificate_data), max_points)
+        return data
+
+    def chunk_analysis_input(self, certificate_data, specifications):
+        """
+        Split certificate data so each analysis prompt fits the analysis budget.
+
+        Returns a list of certificate data chunks with the same shape as the input; each
+        chunk carries every header field and a slice of every test point list.
+        """
+        data = compact(certificate_data)
+        budget = self.budgets.get("analysis")
+        template = self.templates.get("final_analysis/analysis_prompt")
+        if not budget or template is None:
+            return [data]
+        fixed = estimate_tokens(template.render(certificate_data="", specifications=specifications))
+        available = budget - fixed
+        needed = estimate_tokens(compact_json(data))
+        if needed <= available or available <= 0 or _longest_point_list(data) <= 1:
+            if available <= 0:
+                logger.warning("Specifications alone exceed the analysis token budget")
+            return [data]
+        chunks = min(_longest_point_list(data), int(math.ceil(needed / available)))
+        logger.info(f"Splitting analysis into {chunks} chunks to fit the {budget} token budget")
+        return [_slice_point_lists(data, index, chunks) for index in range(chunks)]
+
+
+def _is_point_list(value):
+    return isinstance(value, list) and len(value) > 0 and all(isinstance(item, dict) for item in value)
+
+
+def _longest_point_list(data):
+    longest = 0
+    if isinstance(data, dict):
+        for value in data.values():
+            if _is_point_list(value) and not any(_is_point_list(v) for item in value for v in item.values()):
+                longest = max(longest, len(value))
+            longest = max(longest, _longest_point_list(value))
+    elif isinstance(data, list):
+        for item in data:
+            longest = max(longest, _longest_point_list(item))
+    return longest
+
+
+def _map_point_lists(data, transform):
+    """Apply transform to every innermost list of test point dicts"""
+    if isinstance(data, dict):
+        result = {}
+        for key, value in data.items():
+            if _is_point_list(value) and not any(_is_point_list(v) for item in value for v in item.values()):
+                result[key] = transform(value)
+            else:
+                result[key] = _map_point_lists(value, transform)
+        return result
+    if isinstance(data, list):
+        return [_map_point_lists(item, transform) for item in data]
+    return data
+
+
+def _sample_point_lists(data, max_points):
+    def sample(points):
+        if len(points) <= max_points:
+            return points
+        step = (len(points) - 1) / (max_points - 1)
+        return [points[round(i * step)] for i in range(max_points)]
+    return _map_point_lists(data, sample)
+
+
+def _slice_point_lists(data, index, chunks):
+    # Spread the remainder over the first chunks, so no chunk of the longest list is empty
+    def take(points):
+        size, extra = divmod(len(points), chunks)
+        start = index * size + min(index, extra)
+        return points[start:start + size + (1 if index < extra else 0)]
+    return _prune(_map_point_lists(data, take))
+
+
+def trim_specifications(specifications, certificate_data):
+    """
+    Keep only the specification groups for parameters that were actually tested.
+
+    Works on the "specifications" mapping returned by research. Unless every tested
+    parameter has all its words in the name of a kept group (e.g. "Resistance" tested
+    against an "Ohms" group), the specifications are returned unchanged rather than risk
+    dropping the right ones.
+    """
+    if not isinstance(specifications, dict) or not isinstance(specifications.get("specifications"), dict):
+        return specifications
+    tested = tested_parameter_tokens(certificate_data)
+    if not tested:
+        return specifications
+    groups = specifications["specifications"]
+    kept = {
+        name: value for name, value in groups.items()
+        if set(re.findall(r"[a-z]+", name.lower())) & tested
+    }
+    if not kept or len(kept) == len(groups):
+        return specifications
+    uncovered = uncovered_parameters(certificate_data, [set(re.findall(r"[a-z]+", name.lower())) for name in kept])
+    if uncovered:
+        logger.info(f"Not trimming specifications: no group named for {', '.join(uncovered)}")
+        return specifications
+    trimmed = dict(specifications)
+    trimmed["specifications"] = kept
+    logger.info(f"Trimmed specifications to {len(kept)} of {len(groups)} parameter groups")
+    return trimmed
+
+
+IGNORED_PARAMETER_WORDS = {
+    "of", "the", "and", "test", "tests", "results", "measurement", "measurements", "data", "points", "range", "value",
+}
+
+
+def tested_parameters(certificate_data):
+    """Names of the tested parameters: parameter/function fields and the keys of test point lists"""
+    names = set()
+
+    def walk(node, key=None):
+        if isinstance(node, dict):
+            for name, value in node.items():
+                if re.sub(r"[^a-z]", "", name.lower()) in ("parameter", "function", "measurement", "quantity"):
+                    if isinstance(value, str):
+                        names.add(value.lower())
+                walk(value, name)
+        elif isinstance(node, list):
+            # Only lists of test points name a parameter, not lists of sections holding them
+            if _is_point_list(node) and key and not any(_is_point_list(v) for item in node for v in item.values()):
+                names.add(key.lower())
+            for item in node:
+                walk(item)
+
+    walk(certificate_data)
+    return {name for name in names if parameter_words(name)}
+
+
+def parameter_words(name):
+    return set(re.findall(r"[a-z]+", str(name).lower())) - IGNORED_PARAMETER_WORDS
+
+
+def tested_parameter_tokens(certificate_data):
+    return {word for name in tested_parameters(certificate_data) for word in parameter_words(name)}
+
+
+def uncovered_parameters(certificate_data, covered):
+    """
+    Tested parameters that no entry of covered (sets of words, e.g. spec group names)
+    contains all the words of.
+    """
+    return sorted(
+        name for name in tested_parameters(certificate_data)
+        if not any(parameter_words(name) <= words for words in covered)
+    )
+
+
+def specification_group_words(specifications):
+    """The words of each parameter group (name and content) of researched specifications"""
+    groups = specifications.get("specifications") if isinstance(specifications, dict) else None
+    if not isinstance(groups, dict):
+        groups = {"": specifications}
+    return [set(re.findall(r"[a-z]+", f"{name} {value}".lower())) for name, value in groups.items()]
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(os.path.dirname(os.path.abspath(__file__))) / "prompts"
+
+
+def hash_prompts(prompts_dir=PROMPTS_DIR):
+    """Hash every prompt template so that editing a prompt invalidates cached results"""
+    prompts_dir = Path(prompts_dir)
+    digest = hashlib.sha256()
+    for path in sorted(prompts_dir.rglob("*.txt")):
+        digest.update(path.relative_to(prompts_dir).as_posix().encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(path.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def normalize_instructions(custom_instructions: Optional[str]) -> str:
+    """Collapse whitespace so cosmetic edits to the instructions still hit the cache"""
+    if not custom_instructions:
+        return ""
+    return " ".join(custom_instructions.split())
+
+
+def make_cache_key(pdf_bytes: bytes, custom_instructions: Optional[str], prompts_version: str) -> str:
+    """Build the content-addressed key for a whole analysis result"""
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(pdf_bytes).digest())
+    digest.update(normalize_instructions(custom_instructions).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompts_version.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent cache of complete /analyze results.
+
+    Entries live in a small SQLite database and are evicted when they are older
+    than max_age_seconds, or least-recently-used first once the cache grows past
+    max_entries or max_bytes.
+    """
+
+    def __init__(self, db_path, max_entries=1000, max_bytes=256 * 1024 * 1024, max_age_seconds=30 * 24 * 3600):
+        self.db_path = str(db_path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Create a cache configured from RESULT_CACHE_* environment variables"""
+        return cls(
+            db_path=os.getenv("RESULT_CACHE_DB", os.path.join("cache", "results.sqlite3")),
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            max_age_seconds=int(float(os.getenv("RESULT_CACHE_MAX_AGE_HOURS", "720")) * 3600),
+        )
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached result for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result: dict):
+        """Store a result and evict old entries if the cache is over its bounds"""
+        payload = json.dumps(result)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, payload, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        cursor = self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.max_age_seconds,))
+        self.evictions += cursor.rowcount
+
+        count, total_size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+
+        # Drop least recently used entries until both bounds are satisfied again
+        rows = self._conn.execute("SELECT key, size FROM results ORDER BY last_access ASC").fetchall()
+        stale = []
+        for key, size in rows:
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total_size -= size
+        self._conn.executemany("DELETE FROM results WHERE key = ?", stale)
+        self.evictions += len(stale)
+        logger.info(f"Result cache evicted {len(stale)} entries")
+
+    def clear(self):
+        """Remove every cached result"""
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            count, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "size_bytes": total_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age_seconds,
+        }
@@ -0,0 +1,209 @@
+"""
+Offline bulk re-verification of archived certificates.
+
+Runs every certificate of a directory or JSONL manifest through the same extraction,
+research and analysis pipeline as the API server, without starting the server or the
+desktop client. One JSONL line is appended per certificate as soon as it finishes. The
+output file is also the checkpoint: a restarted run skips every certificate that already
+has a line, so an interrupted overnight run resumes where it stopped.
+
+Usage:
+    python reverify.py archive/ --output reverify_results.jsonl --workers 16
+    python reverify.py manifest.jsonl --output reverify_results.jsonl --batch
+
+Manifest lines are JSON objects with a "path" (relative paths are resolved against the
+manifest's directory) and optional "id" and "custom_instructions".
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+from llm_batch import BatchAnalyzer, current_batch_analyzer
+
+logger = logging.getLogger(__name__)
+
+
+def iter_certificates(source, custom_instructions=None):
+    """Yield (id, path, custom_instructions) for every certificate of a directory or JSONL manifest"""
+    if os.path.isdir(source):
+        for directory, subdirectories, filenames in os.walk(source):
+            subdirectories.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(".pdf"):
+                    path = os.path.join(directory, filename)
+                    yield os.path.relpath(path, source).replace(os.sep, "/"), path, custom_instructions
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            path = entry.get("path")
+            if not path:
+                logger.warning(f"{source}:{number} has no path, skipping it")
+                continue
+            yield (
+                str(entry.get("id") or path),
+                path if os.path.isabs(path) else os.path.join(base, path),
+                entry.get("custom_instructions", custom_instructions),
+            )
+
+
+def load_checkpoint(output_path, retry_failed=False):
+    """
+    Return the ids that already have a line in output_path.
+
+    A last line cut short by a crash is removed. With retry_failed, certificates whose
+    latest line is an error are not counted as done.
+    """
+    latest = {}
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as f:
+        lines = f.readlines()
+        valid = 0
+        for number, line in enumerate(lines, 1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if record is None or not line.endswith(b"\n"):
+                if number == len(lines):
+                    logger.warning(f"Dropping the partly written last line of {output_path}")
+                    f.truncate(valid)
+                    break
+                logger.warning(f"{output_path}:{number} is not valid JSON, ignoring it")
+            else:
+                latest[record["id"]] = record["type"]
+            valid += len(line)
+    return {cert_id for cert_id, kind in latest.items() if kind == "result" or not retry_failed}
+
+
+async def reverify(items, output_path, workers=8, bypass_cache=False, retry_failed=False, batch_analyzer=None):
+    """Run the certificates through the pipeline, up to workers at a time, appending one line each"""
+    # Imported here so the CLI can print --help without loading the stores and templates
+    import api_server
+    from batch_processor import SharedResearch, VERDICTS
+
+    if batch_analyzer is not None:
+        current_batch_analyzer.set(batch_analyzer)
+    if api_server.MANUAL_LIBRARY_INDEX_ON_STARTUP and os.path.isdir(api_server.manual_library.library_dir):
+        await asyncio.get_running_loop().run_in_executor(None, api_server.manual_library.index)
+
+    done = load_checkpoint(output_path, retry_failed)
+    shared_research = SharedResearch(api_server.find_specifications)
+    counts = {verdict: 0 for verdict in VERDICTS}
+    counts.update(ERROR=0, SKIPPED=0)
+    started = time.perf_counter()
+    output = open(output_path, "a", encoding="utf-8")
+
+    def write(record):
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+        os.fsync(output.fileno())
+
+    async def process(cert_id, path, custom_instructions):
+        item_started = time.perf_counter()
+        try:
+            with open(path, "rb") as f:
+                pdf_bytes = f.read()
+            analysis_result, cache_status = await api_server.run_pipeline(
+                pdf_bytes, os.path.basename(path), custom_instructions, bypass_cache, spec_lookup=shared_research
+            )
+            verdict = str(analysis_result.get("verdict") or "").upper()
+            counts[verdict if verdict in counts else "CANNOT_VERIFY"] += 1
+            write({
+                "type": "result",
+                "id": cert_id,
+                "path": path,
+                "verdict": analysis_result.get("verdict"),
+                "cache": cache_status,
+                "run_id": analysis_result.get("run_id"),
+                "elapsed": round(time.perf_counter() - item_started, 3),
+                "result": analysis_result,
+            })
+        except Exception as e:
+            logger.error(f"Re-verification of {cert_id} failed: {getattr(e, 'detail', None) or str(e)}")
+            counts["ERROR"] += 1
+            write({
+                "type": "error",
+                "id": cert_id,
+                "path": path,
+                "error": getattr(e, "detail", None) or str(e),
+                "elapsed": round(time.perf_counter() - item_started, 3),
+            })
+        finished = sum(counts.values()) - counts["SKIPPED"]
+        if finished % 100 == 0:
+            logger.info(f"{finished} certificates re-verified in {time.perf_counter() - started:.0f}s: {counts}")
+
+    pending = set()
+    try:
+        for cert_id, path, custom_instructions in items:
+            if cert_id in done:
+                counts["SKIPPED"] += 1
+                continue
+            done.add(cert_id)
+            if len(pending) >= workers:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.add(asyncio.ensure_future(process(cert_id, path, custom_instructions)))
+        if pending:
+            await asyncio.wait(pending)
+    finally:
+        for task in pending:
+            task.cancel()
+        output.close()
+        api_server.stage_executor.shutdown()
+
+    summary = {
+        "counts": counts,
+        "specification_lookups": shared_research.lookups,
+        "shared_lookups": shared_research.shared,
+        "elapsed": round(time.perf_counter() - started, 3),
+    }
+    if batch_analyzer is not None:
+        summary["batches"] = batch_analyzer.stats()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-verify archived certificates offline")
+    parser.add_argument("source", help="Directory of certificate PDFs or JSONL manifest of {\"path\": ...} lines")
+    parser.add_argument("--output", default="reverify_results.jsonl",
+                        help="JSONL results file; also the checkpoint an interrupted run resumes from")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Certificates in progress at once (default 8, or the batch size with --batch)")
+    parser.add_argument("--custom-instructions", default=None,
+                        help="Instructions for certificates whose manifest line has none")
+    parser.add_argument("--bypass-cache", action="store_true", help="Ignore stored results and re-run every stage")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run certificates whose last line is an error")
+    parser.add_argument("--batch", action="store_true",
+                        help="Send analysis prompts as provider batch jobs (cheaper, completes within the batch window)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Prompts per batch job (LLM_BATCH_MAX_REQUESTS)")
+    parser.add_argument("--batch-wait", type=float, default=None,
+                        help="Seconds to collect prompts before submitting a partial batch (LLM_BATCH_MAX_WAIT)")
+    args = parser.parse_args()
+
+    batch_analyzer = None
+    if args.batch:
+        from prompt_renderer import PromptRenderer
+        batch_analyzer = BatchAnalyzer.from_env(PromptRenderer.from_env())
+        if args.batch_size:
+            batch_analyzer.max_requests = args.batch_size
+        if args.batch_wait is not None:
+            batch_analyzer.max_wait = args.batch_wait
+    workers = args.workers or (batch_analyzer.max_requests if batch_analyzer else 8)
+
+    summary = asyncio.run(reverify(
+        iter_certificates(args.source, args.custom_instructions), args.output, workers,
+        args.bypass_cache, args.retry_failed, batch_analyzer
+    ))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from result_cache import normalize_instructions
+
+logger = logging.getLogger(__name__)
+
+# Prompt templates each stage depends on, by path prefix under prompts/
+STAGE_PROMPTS = {
+    "research": ("specification_research/", "unified_analysis/"),
+    "analysis": ("final_analysis/",),
+}
+
+
+def stage_prompt_versions(prompt_versions, stage):
+    """Select the template versions a stage depends on"""
+    prefixes = STAGE_PROMPTS[stage]
+    return {name: version for name, version in (prompt_versions or {}).items() if name.startswith(prefixes)}
+
+
+def plan_reanalysis(run, custom_instructions, prompt_versions, force=()):
+    """
+    Work out which stages of a stored run must be re-executed.
+
+    Extraction only re-runs when forced. Research re-runs when forced, after a new extraction
+    or when its prompt templates changed. Analysis re-runs when any earlier stage re-ran or
+    its instructions or prompt templates changed. Returns the list of stages to re-run.
+    """
+    rerun = []
+    if "extraction" in force:
+        rerun.append("extraction")
+    if "research" in force or rerun or (
+        stage_prompt_versions(run["prompt_versions"], "research") != stage_prompt_versions(prompt_versions, "research")
+    ):
+        rerun.append("research")
+    if "analysis" in force or rerun or (
+        normalize_instructions(run["custom_instructions"]) != normalize_instructions(custom_instructions)
+        or stage_prompt_versions(run["prompt_versions"], "analysis") != stage_prompt_versions(prompt_versions, "analysis")
+    ):
+        rerun.append("analysis")
+    return rerun
+
+
+class RunStore:
+    """
+    Persistent store of per-run stage artifacts.
+
+    Every analysis is recorded under a run id with its PDF, extracted certificate data,
+    specifications, prompt versions and result, so a re-analysis can reuse the stages
+    whose inputs did not change. PDFs are stored once per SHA-256, so re-analyses of a
+    certificate share its PDF. Runs older than max_age_seconds, or beyond max_runs
+    (oldest first), are removed, and with them PDFs no run refers to.
+    """
+
+    def __init__(self, db_path, max_runs=500, max_age_seconds=30 * 24 * 3600):
+        self.db_path = str(db_path)
+        self.max_runs = max_runs
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                id TEXT PRIMARY KEY,
+                parent_id TEXT,
+                filename TEXT NOT NULL,
+                pdf_sha256 TEXT NOT NULL,
+                custom_instructions TEXT,
+                certificate_data TEXT NOT NULL,
+                specifications TEXT NOT NULL,
+                multi_instrument INTEGER NOT NULL,
+                prompt_versions TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs (created_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS pdfs (sha256 TEXT PRIMARY KEY, pdf BLOB NOT NULL)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Create a store configured from RUN_STORE_* environment variables"""
+        return cls(
+            db_path=os.getenv("RUN_STORE_DB", os.path.join("cache", "runs.sqlite3")),
+            max_runs=int(os.getenv("RUN_STORE_MAX_RUNS", "500")),
+            max_age_seconds=int(float(os.getenv("RUN_STORE_MAX_AGE_DAYS", "30")) * 24 * 3600),
+        )
+
+    def put(self, pdf_bytes, filename, custom_instructions, certificate_data, specifications, multi_instrument,
+            prompt_versions, result, parent_id=None) -> str:
+        """Record a run and return its id"""
+        run_id = uuid.uuid4().hex[:16]
+        pdf_sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO pdfs (sha256, pdf) VALUES (?, ?)", (pdf_sha256, pdf_bytes))
+            self._conn.execute(
+                """
+                INSERT INTO runs (id, parent_id, filename, pdf_sha256, custom_instructions, certificate_data,
+                                  specifications, multi_instrument, prompt_versions, result, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (run_id, parent_id, filename or "", pdf_sha256, custom_instructions, json.dumps(certificate_data), json.dumps(specifications),
+                 int(bool(multi_instrument)), json.dumps(prompt_versions), json.dumps(result), now),
+            )
+            self._evict(now)
+            self._conn.commit()
+        return run_id
+
+    def get(self, run_id, include_pdf=False):
+        """Return a stored run with its decoded artifacts, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+            pdf = self._conn.execute(
+                "SELECT pdf FROM pdfs WHERE sha256 = ?", (row["pdf_sha256"],)
+            ).fetchone() if row is not None and include_pdf else None
+        if row is None or row["created_at"] < time.time() - self.max_age_seconds:
+            return None
+        run = {
+            "run_id": row["id"],
+            "parent_id": row["parent_id"],
+            "filename": row["filename"],
+            "pdf_sha256": row["pdf_sha256"],
+            "custom_instructions": row["custom_instructions"],
+            "certificate_data": json.loads(row["certificate_data"]),
+            "specifications": json.loads(row["specifications"]),
+            "multi_instrument": bool(row["multi_instrument"]),
+            "prompt_versions": json.loads(row["prompt_versions"]),
+            "result": json.loads(row["result"]),
+            "created_at": row["created_at"],
+        }
+        if include_pdf:
+            run["pdf"] = pdf["pdf"] if pdf else None
+        return run
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM runs WHERE created_at < ?", (now - self.max_age_seconds,))
+        self._conn.execute(
+            "DELETE FROM runs WHERE id NOT IN (SELECT id FROM runs ORDER BY created_at DESC LIMIT ?)",
+            (self.max_runs,),
+        )
+        self._conn.execute("DELETE FROM pdfs WHERE sha256 NOT IN (SELECT pdf_sha256 FROM runs)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(certificate_data) + LENGTH(specifications) "
+                "+ LENGTH(result)), 0) FROM runs"
+            ).fetchone()
+            pdfs, pdf_size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(pdf)), 0) FROM pdfs").fetchone()
+        return {"runs": count, "pdfs": pdfs, "size_bytes": size + pdf_size, "max_runs": self.max_runs,
+                "max_age_seconds": self.max_age_seconds}
@@ -0,0 +1,70 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+
+When a call with the same key is already running, later callers attach to it and
+receive its result (or its exception) instead of starting a second, identical
+computation. Keys are forgotten as soon as the call finishes, so this only merges
+concurrent work; finished results are kept by the result cache and spec store.
+A call is cancelled once every caller waiting for it has been cancelled.
+"""
+import asyncio
+import logging
+
+from metrics import SINGLEFLIGHT_CALLS
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one computation"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._tasks = {}
+        self._waiters = {}
+
+    async def do(self, key, func):
+        """
+        Await func() or, when a call with the same key is in flight, that call's result.
+
+        Returns (result, coalesced), where coalesced is True for callers that joined an
+        existing call. The call runs as its own task, shielded from the callers, so one
+        caller giving up does not cancel it for the others; it is cancelled when the last
+        caller gives up.
+        """
+        task = self._tasks.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.coalesced += 1
+            SINGLEFLIGHT_CALLS.inc(flight=self.name, result="coalesced")
+            logger.info(f"{self.name}: joining in-flight call for {key}")
+        else:
+            self.calls += 1
+            SINGLEFLIGHT_CALLS.inc(flight=self.name, result="executed")
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), coalesced
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    logger.info(f"{self.name}: every caller left, cancelling call for {key}")
+                    # Later callers must start afresh rather than join the call being cancelled
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Nobody may be left awaiting a failed call; retrieve the exception so it is not logged as lost
+        if task.done() and not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._tasks)}
@@ -0,0 +1,259 @@
+"""
+Concurrent, hedged specification research across several sources.
+
+Each source (e.g. AI research, manual extraction) is looked up concurrently and has
+its own deadline. A source backed by more than one provider starts a hedged request
+on the next provider when the current one is slow or fails, and uses whichever answers
+first. When a deadline passes, research goes ahead in degraded mode with the sources
+that did return, and records which sources were used, so stage-2 latency is bounded
+by the deadline rather than by the slowest vendor.
+
+Local sources (e.g. the manual library) are looked up alongside the remote ones; when
+their specifications cover every tested parameter, the remote lookups are dropped
+without waiting for them.
+"""
+import os
+import time
+import asyncio
+import logging
+
+from prompt_renderer import uncovered_parameters, specification_group_words
+
+logger = logging.getLogger(__name__)
+
+KIND_MANUAL = "manual"
+KIND_AI = "ai"
+
+# How each kind of source is described in spec_source (matches the wording in spec_combination.txt)
+KIND_LABELS = {KIND_MANUAL: "Manual extraction", KIND_AI: "AI research"}
+
+
+class SpecSource:
+    """A specification source backed by one or more providers, tried in order"""
+
+    def __init__(self, name, kind, providers, deadline=None, hedge_after=None, local=False):
+        self.name = name
+        self.kind = kind
+        # List of (provider name, func); func(certificate_data) returns specifications or None
+        self.providers = list(providers)
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        # Local sources answer without an LLM call; when they cover everything the remote ones are dropped
+        self.local = local
+
+
+class SpecResearcher:
+    """Runs every registered source concurrently and combines whatever returns within the deadlines"""
+
+    def __init__(self, executor, deadline=120.0, hedge_after=30.0):
+        self.executor = executor
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.sources = []
+        self.counters = {"lookups": 0, "local_only": 0, "degraded": 0, "hedged": 0, "failed": 0}
+        self.source_counters = {}
+
+    @classmethod
+    def from_env(cls, executor):
+        """Create a researcher configured from SPEC_RESEARCH_DEADLINE and SPEC_HEDGE_AFTER"""
+        return cls(
+            executor,
+            deadline=float(os.getenv("SPEC_RESEARCH_DEADLINE", "120")),
+            hedge_after=float(os.getenv("SPEC_HEDGE_AFTER", "30")),
+        )
+
+    def register(self, source):
+        """Add a source; its deadline can be overridden with SPEC_DEADLINE_<NAME>"""
+        override = os.getenv(f"SPEC_DEADLINE_{source.name.upper()}")
+        if override:
+            source.deadline = float(override)
+        self.sources = [existing for existing in self.sources if existing.name != source.name] + [source]
+        self.source_counters.setdefault(source.name, {"ok": 0, "timeout": 0, "failed": 0, "no_result": 0})
+        logger.info(f"Registered specification source {source.name} "
+                    f"({', '.join(name for name, _ in source.providers)})")
+
+    async def _run_source(self, source, certificate_data):
+        """Query the source's providers, hedging to the next one when the current one is slow or fails"""
+        started = time.perf_counter()
+        hedge_after = source.hedge_after if source.hedge_after is not None else self.hedge_after
+        remaining = list(source.providers)
+        pending = {}
+        attempts = []
+
+        def launch():
+            provider, func = remaining.pop(0)
+            task = asyncio.ensure_future(
+                self.executor.run("research", func, certificate_data, llm=not source.local)
+            )
+            pending[task] = provider
+            attempts.append(provider)
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=hedge_after if remaining else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.info(f"{source.name}: {', '.join(pending.values())} slow after {hedge_after:.0f}s, "
+                                f"hedging with {remaining[0][0]}")
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        specifications = task.result()
+                    except Exception as e:
+                        logger.warning(f"{source.name}: provider {provider} failed: {str(e)}")
+                        specifications = None
+                    if specifications:
+                        return {
+                            "source": source.name,
+                            "kind": source.kind,
+                            "local": source.local,
+                            "provider": provider,
+                            "attempts": attempts,
+                            "seconds": round(time.perf_counter() - started, 3),
+                            "specifications": specifications,
+                        }
+                if not pending and remaining:
+                    # Every provider tried so far failed; fail over without waiting for the hedge delay
+                    launch()
+            return None
+        finally:
+            # Worker threads cannot be interrupted; cancelling drops their result, and they keep their
+            # stage slot until they finish
+            for task in pending:
+                task.cancel()
+
+    async def research(self, certificate_data):
+        """
+        Look up the local and remote sources concurrently and combine the results that arrive
+        in time. When the local specifications cover every tested parameter, the remote
+        lookups are dropped.
+
+        Returns the combined specifications with "spec_source" naming the sources used and a
+        "research" block (sources, missing sources, degraded flag), or None if no source answered.
+        """
+        if not self.sources:
+            raise RuntimeError("No specification sources registered")
+        self.counters["lookups"] += 1
+
+        local = [source for source in self.sources if source.local]
+        remote = [source for source in self.sources if not source.local]
+        local_lookup = asyncio.ensure_future(self._lookup(local, certificate_data))
+        remote_lookup = asyncio.ensure_future(self._lookup(remote, certificate_data)) if remote else None
+        try:
+            results, missing = await local_lookup
+            # A local source without an entry for this instrument is normal, not a degraded lookup
+            missing = {name: reason for name, reason in missing.items() if reason != "no result"}
+            uncovered = uncovered_parameters(
+                certificate_data,
+                [words for result in results for words in specification_group_words(result["specifications"])],
+            )
+            if results and remote_lookup and not uncovered:
+                self.counters["local_only"] += 1
+                logger.info(f"Using {', '.join(result['source'] for result in results)}, dropping remote research")
+            elif remote_lookup:
+                if results:
+                    logger.info(f"{', '.join(result['source'] for result in results)} do not cover "
+                                f"{', '.join(uncovered)}, waiting for remote research")
+                remote_results, remote_missing = await remote_lookup
+                results += remote_results
+                missing.update(remote_missing)
+        finally:
+            for lookup in (local_lookup, remote_lookup):
+                if lookup is not None:
+                    lookup.cancel()
+
+        if any(len(result["attempts"]) > 1 for result in results):
+            self.counters["hedged"] += 1
+        if not results:
+            self.counters["failed"] += 1
+            logger.error(f"No specification source answered in time: {missing}")
+            return None
+        if missing:
+            self.counters["degraded"] += 1
+            logger.warning(f"Continuing with {', '.join(result['source'] for result in results)}; "
+                           f"missing: {', '.join(f'{name} ({reason})' for name, reason in missing.items())}")
+        return combine_specifications(results, missing)
+
+    async def _lookup(self, sources, certificate_data):
+        """Query sources concurrently under their deadlines; returns (results, {missing source: reason})"""
+        tasks = {
+            source.name: asyncio.ensure_future(asyncio.wait_for(
+                self._run_source(source, certificate_data),
+                source.deadline if source.deadline is not None else self.deadline,
+            ))
+            for source in sources
+        }
+        if tasks:
+            try:
+                await asyncio.wait(tasks.values())
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+
+        results = []
+        missing = {}
+        for source in sources:
+            task = tasks[source.name]
+            if isinstance(task.exception(), asyncio.TimeoutError):
+                missing[source.name] = "timeout"
+            elif task.exception() is not None:
+                logger.error(f"Specification source {source.name} failed: {str(task.exception())}")
+                missing[source.name] = "failed"
+            elif task.result() is None:
+                missing[source.name] = "no result"
+            else:
+                results.append(task.result())
+            outcome = missing.get(source.name, "ok").replace(" ", "_")
+            self.source_counters[source.name][outcome] += 1
+        return results, missing
+
+    def stats(self):
+        return dict(self.counters, sources=self.source_counters)
+
+
+def combine_specifications(results, missing=None):
+    """
+    Merge the specifications of several sources, preferring manual extraction over AI research.
+
+    Parameter groups found in a manual are kept as-is; AI research fills in the groups
+    the manual does not cover.
+    """
+    ordered = sorted(results, key=lambda result: 0 if result["kind"] == KIND_MANUAL else 1)
+    combined = {}
+    groups = {}
+    for result in reversed(ordered):
+        specifications = result["specifications"]
+        if not isinstance(specifications, dict):
+            specifications = {"specifications": specifications}
+        combined.update(specifications)
+        if isinstance(specifications.get("specifications"), dict):
+            groups.update(specifications["specifications"])
+    if groups:
+        combined["specifications"] = groups
+
+    used = [
+        f"{KIND_LABELS.get(result['kind'], result['kind'])} ({result['source']} via {result['provider']})"
+        for result in ordered
+    ]
+    details = [
+        str(result["specifications"].get("spec_source"))
+        for result in ordered
+        if isinstance(result["specifications"], dict) and result["specifications"].get("spec_source")
+    ]
+    summary = "Sources used: " + ", ".join(used)
+    if missing:
+        summary += f". Unavailable: {', '.join(f'{name} ({reason})' for name, reason in missing.items())}"
+    combined["spec_source"] = ". ".join([summary] + (["; ".join(details)] if details else []))
+    combined["research"] = {
+        "summary": summary,
+        "sources": [
+            {key: result[key] for key in ("source", "kind", "local", "provider", "attempts", "seconds")} for result in ordered
+        ],
+        "missing": dict(missing or {}),
+        "degraded": bool(missing),
+    }
+    return combined
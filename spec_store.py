@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Source labels follow the priority order in prompts/unified_analysis/spec_combination.txt
+SOURCE_MANUAL = "manual_extraction"
+SOURCE_AI = "ai_research"
+SOURCE_COMBINED = "manual_extraction+ai_research"
+SOURCE_UNKNOWN = "unknown"
+
+UNKNOWN_VALUES = {"", "unknown", "unknown manufacturer", "unknown model", "unknown type", "n/a", "none"}
+
+
+def normalize_field(value) -> str:
+    """Normalize a manufacturer/model/type string for use in a lookup key"""
+    if value is None:
+        return ""
+    return " ".join(str(value).split()).lower()
+
+
+def make_spec_key(manufacturer, model, equipment_type) -> str:
+    return "|".join(normalize_field(v) for v in (manufacturer, model, equipment_type))
+
+
+def is_cacheable(manufacturer, model) -> bool:
+    """Only instruments with a known manufacturer and model are worth storing"""
+    return normalize_field(manufacturer) not in UNKNOWN_VALUES and normalize_field(model) not in UNKNOWN_VALUES
+
+
+def detect_source(specifications) -> str:
+    """Work out whether specifications came from manual extraction, AI research or both"""
+    if isinstance(specifications, dict):
+        text = " ".join(
+            str(specifications.get(field, "")) for field in ("spec_source", "source_analysis", "source")
+        )
+    else:
+        text = str(specifications)
+    text = text.lower()
+
+    manual = "manual" in text or "datasheet" in text
+    ai = "ai research" in text
+    if manual and ai:
+        return SOURCE_COMBINED
+    if manual:
+        return SOURCE_MANUAL
+    if ai or "research" in text:
+        return SOURCE_AI
+    return SOURCE_UNKNOWN
+
+
+def merge_specifications(stored, researched):
+    """
+    Add newly researched parameter groups to stored specifications.
+
+    Groups in both keep the new version. Specifications without a "specifications"
+    mapping of groups cannot be merged, so the new research replaces them.
+    """
+    stored_groups = stored.get("specifications") if isinstance(stored, dict) else None
+    new_groups = researched.get("specifications") if isinstance(researched, dict) else None
+    if not isinstance(stored_groups, dict) or not isinstance(new_groups, dict):
+        return researched
+    merged = dict(researched)
+    merged["specifications"] = {**stored_groups, **new_groups}
+    sources = [str(specs.get("spec_source")) for specs in (researched, stored) if specs.get("spec_source")]
+    if sources:
+        merged["spec_source"] = "; ".join(dict.fromkeys(sources))
+    return merged
+
+
+class SpecStore:
+    """
+    Persistent store of researched specifications keyed on manufacturer, model and equipment type.
+
+    Entries expire after their TTL so that specifications are periodically re-researched.
+    """
+
+    def __init__(self, db_path, default_ttl_seconds=90 * 24 * 3600):
+        self.db_path = str(db_path)
+        self.default_ttl_seconds = default_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # Filters normalize stored values exactly as make_spec_key does
+        self._conn.create_function("normalize_field", 1, normalize_field, deterministic=True)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS specifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                spec_key TEXT UNIQUE NOT NULL,
+                manufacturer TEXT NOT NULL,
+                model TEXT NOT NULL,
+                equipment_type TEXT NOT NULL,
+                source TEXT NOT NULL,
+                specifications TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Create a store configured from SPEC_STORE_* environment variables"""
+        return cls(
+            db_path=os.getenv("SPEC_STORE_DB", os.path.join("cache", "specifications.sqlite3")),
+            default_ttl_seconds=int(float(os.getenv("SPEC_STORE_TTL_DAYS", "90")) * 24 * 3600),
+        )
+
+    def get(self, manufacturer, model, equipment_type):
+        """Return stored specifications for an instrument, or None if missing or expired"""
+        key = make_spec_key(manufacturer, model, equipment_type)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, specifications, expires_at FROM specifications WHERE spec_key = ?", (key,)
+            ).fetchone()
+            if row is None or row["expires_at"] < time.time():
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE specifications SET hit_count = hit_count + 1 WHERE id = ?", (row["id"],))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row["specifications"])
+
+    def put(self, manufacturer, model, equipment_type, specifications, source=None, ttl_seconds=None):
+        """Insert or replace the specifications for an instrument and return the stored entry"""
+        key = make_spec_key(manufacturer, model, equipment_type)
+        source = source or detect_source(specifications)
+        ttl_seconds = self.default_ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO specifications
+                    (spec_key, manufacturer, model, equipment_type, source, specifications, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(spec_key) DO UPDATE SET
+                    manufacturer = excluded.manufacturer,
+                    model = excluded.model,
+                    equipment_type = excluded.equipment_type,
+                    source = excluded.source,
+                    specifications = excluded.specifications,
+                    created_at = excluded.created_at,
+                    expires_at = excluded.expires_at,
+                    hit_count = 0
+                """,
+                (key, manufacturer or "", model or "", equipment_type or "", source,
+                 json.dumps(specifications), now, now + ttl_seconds),
+            )
+            self._conn.commit()
+            row = self._conn.execute("SELECT * FROM specifications WHERE spec_key = ?", (key,)).fetchone()
+        logger.info(f"Stored specifications for {manufacturer} {model} (source: {source})")
+        return self._row_to_entry(row)
+
+    def list(self, manufacturer=None, model=None, include_expired=True, include_specifications=False):
+        """List stored entries, optionally filtered by manufacturer and/or model"""
+        query, params = self._filter_clause(manufacturer, model)
+        if not include_expired:
+            query += " AND expires_at >= ?"
+            params.append(time.time())
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM specifications WHERE {query} ORDER BY manufacturer, model", params
+            ).fetchall()
+        return [self._row_to_entry(row, include_specifications) for row in rows]
+
+    def invalidate(self, entry_id=None, manufacturer=None, model=None):
+        """Delete one entry by id, or every entry matching manufacturer/model; returns the number removed"""
+        with self._lock:
+            if entry_id is not None:
+                cursor = self._conn.execute("DELETE FROM specifications WHERE id = ?", (entry_id,))
+            else:
+                query, params = self._filter_clause(manufacturer, model)
+                cursor = self._conn.execute(f"DELETE FROM specifications WHERE {query}", params)
+            self._conn.commit()
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM specifications").fetchone()[0]
+            expired = self._conn.execute(
+                "SELECT COUNT(*) FROM specifications WHERE expires_at < ?", (time.time(),)
+            ).fetchone()[0]
+        return {"entries": total, "expired": expired, "hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _filter_clause(manufacturer, model):
+        clauses, params = ["1 = 1"], []
+        if manufacturer:
+            clauses.append("normalize_field(manufacturer) = ?")
+            params.append(normalize_field(manufacturer))
+        if model:
+            clauses.append("normalize_field(model) = ?")
+            params.append(normalize_field(model))
+        return " AND ".join(clauses), params
+
+    @staticmethod
+    def _row_to_entry(row, include_specifications=True) -> dict:
+        entry = {
+            "id": row["id"],
+            "manufacturer": row["manufacturer"],
+            "model": row["model"],
+            "equipment_type": row["equipment_type"],
+            "source": row["source"],
+            "created_at": row["created_at"],
+            "expires_at": row["expires_at"],
+            "expired": row["expires_at"] < time.time(),
+            "hit_count": row["hit_count"],
+        }
+        if include_specifications:
+            entry["specifications"] = json.loads(row["specifications"])
+        return entry
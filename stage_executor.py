@@ -0,0 +1,126 @@
+import os
+import time
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("preextraction", "extraction", "research", "analysis")
+
+DEFAULT_CONCURRENCY = {"preextraction": 4, "extraction": 8, "research": 8, "analysis": 8}
+DEFAULT_TIMEOUTS = {"preextraction": 60.0, "extraction": 180.0, "research": 300.0, "analysis": 300.0}
+
+
+class StageTimeoutError(Exception):
+    """Raised when a pipeline stage does not finish within its timeout"""
+
+    def __init__(self, stage, timeout):
+        super().__init__(f"Stage '{stage}' timed out after {timeout:.0f} seconds")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class StageExecutor:
+    """
+    Runs the blocking pipeline stages (PDF pre-extraction and extraction, specification research, analysis)
+    on a dedicated thread pool so the event loop stays free to serve other requests.
+
+    Each stage has its own concurrency limit and timeout. A request waiting for a
+    free slot in a stage does not hold a worker thread.
+    """
+
+    def __init__(self, concurrency=None, timeouts=None, max_workers=None):
+        self.concurrency = dict(DEFAULT_CONCURRENCY, **(concurrency or {}))
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.max_workers = max_workers or sum(self.concurrency.values())
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+        self._semaphores = {}
+        self._active = {stage: 0 for stage in self.concurrency}
+        self._waiting = {stage: 0 for stage in self.concurrency}
+        self._timeouts_hit = {stage: 0 for stage in self.concurrency}
+
+    @classmethod
+    def from_env(cls):
+        """Create an executor configured from STAGE_CONCURRENCY_* and STAGE_TIMEOUT_* environment variables"""
+        concurrency = {
+            stage: int(os.getenv(f"STAGE_CONCURRENCY_{stage.upper()}", DEFAULT_CONCURRENCY[stage]))
+            for stage in STAGES
+        }
+        timeouts = {
+            stage: float(os.getenv(f"STAGE_TIMEOUT_{stage.upper()}", DEFAULT_TIMEOUTS[stage]))
+            for stage in STAGES
+        }
+        max_workers = os.getenv("STAGE_MAX_WORKERS")
+        return cls(concurrency, timeouts, int(max_workers) if max_workers else None)
+
+    def _semaphore(self, stage):
+        # Created lazily so the semaphore belongs to the running event loop
+        if stage not in self._semaphores:
+            self._semaphores[stage] = asyncio.Semaphore(self.concurrency[stage])
+        return self._semaphores[stage]
+
+    async def run(self, stage, func, *args, llm=False, **kwargs):
+        """
+        Run func(*args, **kwargs) in the worker pool under the limits configured for stage
+
+        llm marks calls that issue an LLM request, for the request counters in metrics.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self.timeouts.get(stage)
+
+        queued = time.perf_counter()
+        self._waiting[stage] += 1
+        try:
+            await self._semaphore(stage).acquire()
+        finally:
+            self._waiting[stage] -= 1
+
+        self._active[stage] += 1
+        started = time.perf_counter()
+        queue_wait = started - queued
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._release(stage)
+            raise
+        # The worker thread cannot be interrupted, so the slot stays taken until the thread is done,
+        # even when the caller gives up on a timeout or is cancelled
+        future.add_done_callback(lambda _: self._release_threadsafe(loop, stage))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self._timeouts_hit[stage] += 1
+            logger.error(f"Stage {stage} timed out after {time.perf_counter() - started:.1f}s")
+            raise StageTimeoutError(stage, timeout)
+        finally:
+            record_stage(stage, time.perf_counter() - started, queue_wait, llm=llm)
+
+    def _release(self, stage):
+        self._active[stage] -= 1
+        self._semaphore(stage).release()
+
+    def _release_threadsafe(self, loop, stage):
+        try:
+            loop.call_soon_threadsafe(self._release, stage)
+        except RuntimeError:
+            # The event loop is already closed, so nobody is left waiting for the slot
+            pass
+
+    def stats(self) -> dict:
+        return {
+            stage: {
+                "limit": self.concurrency[stage],
+                "timeout": self.timeouts.get(stage),
+                "active": self._active[stage],
+                "waiting": self._waiting[stage],
+                "timeouts": self._timeouts_hit[stage],
+            }
+            for stage in self.concurrency
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
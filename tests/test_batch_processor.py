@@ -0,0 +1,60 @@
+import io
+import json
+import asyncio
+import zipfile
+
+import pytest
+
+from batch_processor import expand_uploads, stream_batch
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_zip_members_are_expanded_lazily_and_bounded():
+    archive = _zip({
+        "a.pdf": b"%PDF-a",
+        "big.pdf": b"%PDF-" + b"0" * 4096,
+        "notes.txt": b"skip",
+        "__MACOSX/._a.pdf": b"skip",
+    })
+    items = expand_uploads([("batch.zip", archive), ("c.pdf", b"%PDF-c")], max_member_bytes=1024)
+    assert [filename for filename, _ in items] == ["batch.zip/a.pdf", "batch.zip/big.pdf", "c.pdf"]
+    loaders = dict(items)
+    assert loaders["batch.zip/a.pdf"]() == b"%PDF-a"
+    assert loaders["c.pdf"]() == b"%PDF-c"
+    with pytest.raises(ValueError, match="upload limit"):
+        loaders["batch.zip/big.pdf"]()
+
+
+def test_batch_streams_results_and_shares_research():
+    async def find_specifications(certificate_data, manufacturer, model, equipment_type):
+        await asyncio.sleep(0.01)
+        return {"specifications": {"DC Voltage": "0.1%"}}
+
+    async def run_pipeline(pdf_bytes, filename, custom_instructions, bypass_cache, spec_lookup):
+        if pdf_bytes == b"broken":
+            raise ValueError("not a certificate")
+        equipment_type = pdf_bytes.decode()
+        certificate = [{"Manufacturer": "Fluke", "Model": "87V", "TestResults": [
+            {"Parameter": "DC Voltage", "Measurements": [{"Nominal": "1", "Tolerance": "0.1"}]}]}]
+        await spec_lookup(certificate, "Fluke", "87V", equipment_type)
+        return {"verdict": "PASS"}, "MISS"
+
+    async def main():
+        items = [(name, lambda data=data: data) for name, data in
+                 [("a.pdf", b"DMM"), ("b.pdf", b"DMM"), ("c.pdf", b"Calibrator"), ("d.pdf", b"broken")]]
+        return [json.loads(line) async for line in stream_batch(items, run_pipeline, find_specifications)]
+
+    lines = asyncio.run(main())
+    summary = lines[-1]
+    assert sorted(line["filename"] for line in lines[:-1]) == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]
+    assert summary["counts"]["PASS"] == 3
+    assert summary["counts"]["ERROR"] == 1
+    # The two DMMs share a lookup; the calibrator of the same model is researched separately
+    assert (summary["specification_lookups"], summary["shared_lookups"]) == (2, 1)
@@ -0,0 +1,51 @@
+import asyncio
+
+from instrument_fanout import split_instruments, fan_out, aggregate_instrument_results
+
+
+def _cert(model, serial, parameter="DC Voltage"):
+    return {"Manufacturer": "Fluke", "Model": model, "SerialNumber": serial,
+            "TestResults": [{"Parameter": parameter, "Measurements": [{"Nominal": "1", "Tolerance": "0.1"}]}]}
+
+
+def test_sections_of_one_instrument_stay_together():
+    units = split_instruments([_cert("87V", "1"), _cert("87V", "2"), _cert("87V", " 1", "Resistance")])
+    assert [[cert["SerialNumber"] for cert in unit] for unit in units] == [["1", " 1"], ["2"]]
+    assert split_instruments({"Model": "87V"}) == [{"Model": "87V"}]
+
+
+def test_fan_out_caps_concurrency_and_analyzes_identical_units_once():
+    calls, running, peak = [], [0], [0]
+
+    async def analyze(unit):
+        calls.append(unit[0]["SerialNumber"])
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        if unit[0]["SerialNumber"] == "bad":
+            raise ValueError("analysis failed")
+        return {"verdict": "PASS"}
+
+    units = [[_cert("87V", serial)] for serial in ("1", "2", "3", "bad")] + [[_cert("87V", "1")]]
+    outcomes = asyncio.run(fan_out(units, analyze, max_in_flight=2))
+
+    assert sorted(calls) == ["1", "2", "3", "bad"]
+    assert peak[0] == 2
+    assert [result for result, _ in outcomes] == [{"verdict": "PASS"}] * 3 + [None, {"verdict": "PASS"}]
+    assert isinstance(outcomes[3][1], ValueError)
+
+
+def test_aggregate_verdict_fails_if_any_instrument_fails():
+    units = [[_cert("87V", "1")], [_cert("179", "2")], [_cert("179", "3")]]
+    outcomes = [({"verdict": "PASS", "calculations": [{"parameter": "DC Voltage"}]}, None),
+                ({"verdict": "FAIL"}, None),
+                (None, ValueError("analysis failed"))]
+    result = aggregate_instrument_results(units, outcomes)
+    assert result["verdict"] == "FAIL"
+    assert result["instrument_counts"] == {"PASS": 1, "FAIL": 1, "CANNOT_VERIFY": 0, "ERROR": 1}
+    assert result["calculations"][0]["instrument"] == "Fluke 87V (S/N 1)"
+    assert result["instruments"][2]["error"] == "analysis failed"
+
+    passing = aggregate_instrument_results(units[:1], outcomes[:1])
+    assert passing["verdict"] == "PASS"
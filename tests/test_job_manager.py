@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from job_manager import JobManager, JobQueueFullError, STATUS_COMPLETED, STATUS_FAILED
+
+
+async def _runner(pdf_bytes, filename, custom_instructions, bypass_cache, on_progress):
+    if pdf_bytes == b"broken":
+        raise ValueError("extraction failed")
+    on_progress("extraction", "started")
+    await asyncio.sleep(0.01)
+    on_progress("extraction", "completed", [{"Model": "87V"}])
+    return {"verdict": "PASS"}
+
+
+def test_job_streams_stage_events_and_keeps_artifacts():
+    async def main():
+        manager = JobManager(_runner, workers=1)
+        await manager.start()
+        try:
+            job = await manager.submit(b"%PDF", "cert.pdf")
+            events = [event async for event in manager.events(job)]
+        finally:
+            await manager.stop()
+        return job, events
+
+    job, events = asyncio.run(main())
+    assert job.status == STATUS_COMPLETED
+    assert job.artifacts == {"certificate_data": [{"Model": "87V"}], "result": {"verdict": "PASS"}}
+    assert job.pdf_bytes is None
+    assert [(event["event"], event.get("stage"), event["status"]) for event in events] == [
+        ("status", None, "queued"), ("status", None, "running"), ("stage", "extraction", "started"),
+        ("stage", "extraction", "completed"), ("status", None, "completed"),
+    ]
+
+
+def test_failed_job_records_its_error():
+    async def main():
+        manager = JobManager(_runner, workers=1)
+        await manager.start()
+        try:
+            job = await manager.submit(b"broken", "cert.pdf")
+            async for _ in manager.events(job):
+                pass
+        finally:
+            await manager.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == STATUS_FAILED
+    assert job.error == "extraction failed"
+
+
+def test_submissions_beyond_the_queue_bound_are_rejected():
+    async def main():
+        gate = asyncio.Event()
+
+        async def blocked(*args):
+            await gate.wait()
+            return {"verdict": "PASS"}
+
+        manager = JobManager(blocked, workers=1, max_queued_jobs=2)
+        await manager.start()
+        try:
+            await manager.submit(b"1", "a.pdf")
+            await asyncio.sleep(0.01)
+            # The first job is running; two more fill the queue
+            await manager.submit(b"2", "b.pdf")
+            await manager.submit(b"3", "c.pdf")
+            with pytest.raises(JobQueueFullError):
+                await manager.submit(b"4", "d.pdf")
+            assert manager.stats()["queued"] == 2
+            gate.set()
+        finally:
+            await manager.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+import fitz
+
+from pdf_preextract import preextract_pdf, is_complete, to_certificate_data
+
+
+def _certificate_page(doc, manufacturer, model, serial, rows):
+    page = doc.new_page()
+    page.insert_text((72, 60), f"Manufacturer: {manufacturer}\nModel: {model}\nSerial Number: {serial}")
+    rows = [("Parameter", "Nominal", "Tolerance", "Measured")] + rows
+    xs = [72, 192, 292, 392, 492]
+    top = 140
+    for i in range(len(rows) + 1):
+        page.draw_line((xs[0], top + i * 18), (xs[-1], top + i * 18))
+    for x in xs:
+        page.draw_line((x, top), (x, top + len(rows) * 18))
+    for i, row in enumerate(rows):
+        for j, cell in enumerate(row):
+            page.insert_text((xs[j] + 3, top + i * 18 + 13), cell, fontsize=9)
+
+
+def test_single_instrument_is_extracted_locally():
+    doc = fitz.open()
+    _certificate_page(doc, "Fluke", "87V", "1001", [("DC Voltage", "1 V", "0.002 V", "1.001 V")])
+    preextraction = preextract_pdf(doc.tobytes())
+    assert is_complete(preextraction)
+    certificate = to_certificate_data(preextraction)[0]
+    assert (certificate["Manufacturer"], certificate["Model"]) == ("Fluke", "87V")
+    assert certificate["TestResults"][0]["Parameter"] == "DC Voltage"
+
+
+def test_two_instruments_are_left_to_the_llm():
+    doc = fitz.open()
+    _certificate_page(doc, "Fluke", "87V", "1001", [("DC Voltage", "1 V", "0.002 V", "1.001 V")])
+    _certificate_page(doc, "Keysight", "34461A", "MY123", [("DC Voltage", "10 V", "0.0004 V", "10.0001 V")])
+    preextraction = preextract_pdf(doc.tobytes())
+    assert len(preextraction["groups"]) == 2
+    assert preextraction["instrument_headers"] == 2
+    assert not is_complete(preextraction)
+
+
+def test_results_page_without_recognized_table_is_incomplete():
+    doc = fitz.open()
+    _certificate_page(doc, "Fluke", "87V", "1001", [("DC Voltage", "1 V", "0.002 V", "1.001 V")])
+    page = doc.new_page()
+    page.insert_text((72, 72), "AC Voltage nominal 1 V tolerance 0.01 V measured 1.002 V")
+    assert not is_complete(preextract_pdf(doc.tobytes()))
+
+
+def test_pages_past_the_cap_are_left_to_the_llm():
+    doc = fitz.open()
+    _certificate_page(doc, "Fluke", "87V", "1001", [("DC Voltage", "1 V", "0.002 V", "1.001 V")])
+    for _ in range(3):
+        doc.new_page().insert_text((72, 72), "Notes")
+    preextraction = preextract_pdf(doc.tobytes(), max_pages=2)
+    assert preextraction["truncated"]
+    assert len(preextraction["pages"]) == 2
+    assert preextraction["relevant_pages"] == [0, 2, 3]
+    assert not is_complete(preextraction)
+
+
+def test_tables_are_only_detected_on_pages_naming_a_nominal_column(monkeypatch):
+    doc = fitz.open()
+    _certificate_page(doc, "Fluke", "87V", "1001", [("DC Voltage", "1 V", "0.002 V", "1.001 V")])
+    for _ in range(3):
+        doc.new_page().insert_text((72, 72), "Calibration procedure and environmental conditions")
+    calls = []
+    find_tables = fitz.Page.find_tables
+    monkeypatch.setattr(fitz.Page, "find_tables", lambda page, *args, **kwargs: (
+        calls.append(page.number), find_tables(page, *args, **kwargs))[1])
+    assert is_complete(preextract_pdf(doc.tobytes()))
+    assert calls == [0]
@@ -0,0 +1,41 @@
+import math
+
+from prompt_renderer import PromptRenderer, compact, compact_json, estimate_tokens
+
+
+def _renderer(tmp_path):
+    template = tmp_path / "final_analysis" / "analysis_prompt.txt"
+    template.parent.mkdir()
+    template.write_text("Certificate: {{certificate_data}}\nSpecifications: {{specifications}}\n")
+    return PromptRenderer(prompts_dir=tmp_path)
+
+
+def _budget_for_chunks(renderer, certificate, specifications, chunks):
+    template = renderer.templates["final_analysis/analysis_prompt"]
+    fixed = estimate_tokens(template.render(certificate_data="", specifications=specifications))
+    needed = estimate_tokens(compact_json(compact(certificate)))
+    return fixed + int(math.ceil(needed / chunks))
+
+
+def test_every_analysis_chunk_gets_test_points(tmp_path):
+    renderer = _renderer(tmp_path)
+    certificate = {
+        "Manufacturer": "Fluke",
+        "DC Voltage": [{"nominal": f"{value} V", "reading": f"{value}.001 V"} for value in range(5)],
+    }
+    specifications = {"DC Voltage": {"accuracy": "±0.002 V"}}
+    renderer.budgets["analysis"] = _budget_for_chunks(renderer, certificate, specifications, 4)
+
+    chunks = renderer.chunk_analysis_input(certificate, specifications)
+
+    assert len(chunks) == 4
+    assert [len(chunk["DC Voltage"]) for chunk in chunks] == [2, 1, 1, 1]
+    assert all(chunk["Manufacturer"] == "Fluke" for chunk in chunks)
+    assert [point for chunk in chunks for point in chunk["DC Voltage"]] == certificate["DC Voltage"]
+
+
+def test_input_within_budget_is_not_split(tmp_path):
+    renderer = _renderer(tmp_path)
+    certificate = {"DC Voltage": [{"nominal": "1 V"}, {"nominal": "2 V"}]}
+    renderer.budgets["analysis"] = 10000
+    assert renderer.chunk_analysis_input(certificate, {}) == [certificate]
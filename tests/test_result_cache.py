@@ -0,0 +1,26 @@
+from result_cache import ResultCache, make_cache_key
+
+
+def test_key_ignores_whitespace_in_instructions_but_not_content():
+    key = make_cache_key(b"%PDF", "check  DC\nvoltage", "v1")
+    assert key == make_cache_key(b"%PDF", " check DC voltage ", "v1")
+    assert key != make_cache_key(b"%PDF", "check AC voltage", "v1")
+    assert key != make_cache_key(b"%PDF-2", "check DC voltage", "v1")
+    assert key != make_cache_key(b"%PDF", "check DC voltage", "v2")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path / "results.sqlite3", max_entries=2)
+    cache.put("a", {"verdict": "PASS"})
+    cache.put("b", {"verdict": "FAIL"})
+    assert cache.get("a") == {"verdict": "PASS"}
+    cache.put("c", {"verdict": "PASS"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = ResultCache(tmp_path / "results.sqlite3", max_age_seconds=-1)
+    cache.put("a", {"verdict": "PASS"})
+    assert cache.get("a") is None
@@ -0,0 +1,39 @@
+from run_store import RunStore, plan_reanalysis
+
+
+def _put(store, pdf_bytes, parent_id=None, custom_instructions=None):
+    return store.put(pdf_bytes, "cert.pdf", custom_instructions, [{"Model": "87V"}], {"specifications": {}},
+                     False, {"final_analysis/analysis_prompt": "a"}, {"verdict": "PASS"}, parent_id)
+
+
+def test_runs_of_the_same_pdf_share_one_stored_copy(tmp_path):
+    store = RunStore(tmp_path / "runs.sqlite3")
+    first = _put(store, b"%PDF-1")
+    second = _put(store, b"%PDF-1", parent_id=first)
+    _put(store, b"%PDF-2")
+
+    assert store.stats()["runs"] == 3
+    assert store.stats()["pdfs"] == 2
+    run = store.get(second, include_pdf=True)
+    assert run["pdf"] == b"%PDF-1"
+    assert run["parent_id"] == first
+    assert "pdf" not in store.get(second)
+
+
+def test_evicted_runs_take_their_unshared_pdfs_with_them(tmp_path):
+    store = RunStore(tmp_path / "runs.sqlite3", max_runs=2)
+    _put(store, b"%PDF-1")
+    _put(store, b"%PDF-2")
+    _put(store, b"%PDF-2")
+    assert store.stats()["pdfs"] == 1
+
+
+def test_plan_reanalysis_reruns_only_changed_stages():
+    run = {"custom_instructions": "check DC", "prompt_versions": {
+        "specification_research/gemini_research": "r1", "final_analysis/analysis_prompt": "a1"}}
+    same = dict(run["prompt_versions"])
+    assert plan_reanalysis(run, " check  DC ", same) == []
+    assert plan_reanalysis(run, "check AC", same) == ["analysis"]
+    assert plan_reanalysis(run, "check DC", dict(same, **{"specification_research/gemini_research": "r2"})) == [
+        "research", "analysis"]
+    assert plan_reanalysis(run, "check DC", same, force=["extraction"]) == ["extraction", "research", "analysis"]
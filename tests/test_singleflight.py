@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _slow_call(calls, cancelled, delay=0.1):
+    async def call():
+        calls.append(1)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return len(calls)
+    return call
+
+
+def test_concurrent_callers_share_one_call():
+    calls, cancelled = [], []
+
+    async def main():
+        flight = SingleFlight("test")
+        call = _slow_call(calls, cancelled)
+        return await asyncio.gather(flight.do("key", call), flight.do("key", call))
+
+    assert asyncio.run(main()) == [(1, False), (1, True)]
+    assert len(calls) == 1
+
+
+def test_call_keeps_running_while_a_caller_is_left():
+    calls, cancelled = [], []
+
+    async def main():
+        flight = SingleFlight("test")
+        call = _slow_call(calls, cancelled)
+        first = asyncio.create_task(flight.do("key", call))
+        second = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == (1, True)
+    assert not cancelled
+
+
+def test_call_is_cancelled_when_every_caller_leaves():
+    calls, cancelled = [], []
+
+    async def main():
+        flight = SingleFlight("test")
+        call = _slow_call(calls, cancelled)
+        waiters = [asyncio.create_task(flight.do("key", call)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert cancelled
+        assert flight.stats()["in_flight"] == 0
+        return await flight.do("key", call)
+
+    assert asyncio.run(main()) == (2, False)
+
+
+def test_failure_reaches_every_caller():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("research failed")
+
+    async def main():
+        flight = SingleFlight("test")
+        return await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_call_is_not_joined_by_later_callers():
+    calls, cancelled = [], []
+
+    async def main():
+        flight = SingleFlight("test")
+        call = _slow_call(calls, cancelled)
+        waiter = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # Joins immediately, before the cancelled call has finished unwinding
+        return await flight.do("key", call)
+
+    assert asyncio.run(main()) == (2, False)
@@ -0,0 +1,47 @@
+import time
+import asyncio
+
+from stage_executor import StageExecutor
+from spec_research import SpecResearcher, SpecSource, KIND_MANUAL, KIND_AI
+
+
+def _certificate(*parameters):
+    return [{"Manufacturer": "Fluke", "Model": "87V",
+             "TestResults": [{"Parameter": name, "Measurements": [{"Nominal": "1", "Tolerance": "0.1"}]}
+                             for name in parameters]}]
+
+
+def _provider(parameter, delay):
+    def lookup(certificate_data):
+        time.sleep(delay)
+        return {"specifications": {parameter: "0.1%"}}
+    return lookup
+
+
+def _research(certificate_data, manual_parameter, delay=0.2):
+    executor = StageExecutor()
+    researcher = SpecResearcher(executor)
+    researcher.register(SpecSource("manual_extraction", KIND_MANUAL,
+                                   [("library", _provider(manual_parameter, delay))], local=True))
+    researcher.register(SpecSource("ai_research", KIND_AI, [("ai", _provider("Resistance", delay))]))
+    started = time.perf_counter()
+    try:
+        result = asyncio.run(researcher.research(certificate_data))
+    finally:
+        executor.shutdown()
+    return result, researcher, time.perf_counter() - started
+
+
+def test_local_and_remote_sources_are_looked_up_concurrently():
+    result, researcher, seconds = _research(_certificate("DC Voltage", "Resistance"), "DC Voltage")
+    assert set(result["specifications"]) == {"DC Voltage", "Resistance"}
+    assert [source["source"] for source in result["research"]["sources"]] == ["manual_extraction", "ai_research"]
+    assert seconds < 0.35
+    assert researcher.counters["local_only"] == 0
+
+
+def test_remote_result_is_dropped_when_local_sources_cover_everything():
+    result, researcher, _ = _research(_certificate("DC Voltage"), "DC Voltage")
+    assert set(result["specifications"]) == {"DC Voltage"}
+    assert researcher.counters["local_only"] == 1
+    assert not result["research"]["degraded"]
@@ -0,0 +1,56 @@
+import asyncio
+
+from spec_store import SpecStore, merge_specifications
+from batch_processor import SharedResearch
+
+
+def _certificate(*parameters):
+    return [{"Manufacturer": "Fluke", "Model": "87V",
+             "TestResults": [{"Parameter": name, "Measurements": [{"Nominal": "1", "Tolerance": "0.1"}]}
+                             for name in parameters]}]
+
+
+def test_store_round_trip_and_expiry(tmp_path):
+    store = SpecStore(tmp_path / "specs.sqlite3")
+    store.put("Fluke", "87V", "DMM", {"specifications": {"DC Voltage": "0.05%"}, "spec_source": "AI research"})
+    assert store.get(" fluke ", "87v", "dmm")["specifications"] == {"DC Voltage": "0.05%"}
+    store.put("Fluke", "179", "DMM", {"specifications": {}}, ttl_seconds=-1)
+    assert store.get("Fluke", "179", "DMM") is None
+
+
+def test_filters_normalize_like_the_lookup_key(tmp_path):
+    store = SpecStore(tmp_path / "specs.sqlite3")
+    store.put("Rohde  & Schwarz", "NRP-Z21 ", "Power Sensor", {"specifications": {}})
+    store.put("Fluke", "87V", "DMM", {"specifications": {}})
+    assert [entry["model"] for entry in store.list(manufacturer="rohde & schwarz", model="nrp-z21")] == ["NRP-Z21 "]
+    assert store.invalidate(manufacturer=" ROHDE & SCHWARZ") == 1
+    assert [entry["model"] for entry in store.list()] == ["87V"]
+
+def test_merge_keeps_stored_groups_and_prefers_new_ones():
+    stored = {"specifications": {"DC Voltage": "old", "AC Voltage": "0.5%"}, "spec_source": "Manual extraction"}
+    researched = {"specifications": {"DC Voltage": "new", "Resistance": "0.2%"}, "spec_source": "AI research"}
+    merged = merge_specifications(stored, researched)
+    assert merged["specifications"] == {"DC Voltage": "new", "AC Voltage": "0.5%", "Resistance": "0.2%"}
+    assert merged["spec_source"] == "AI research; Manual extraction"
+
+
+def test_shared_research_looks_up_parameters_the_shared_result_misses():
+    calls = []
+
+    async def find_specifications(certificate_data, manufacturer, model, equipment_type):
+        calls.append(certificate_data)
+        await asyncio.sleep(0.01)
+        parameter = certificate_data[0]["TestResults"][0]["Parameter"]
+        return {"specifications": {parameter: "0.1%"}}
+
+    async def main():
+        shared = SharedResearch(find_specifications)
+        return await asyncio.gather(
+            shared(_certificate("DC Voltage"), "Fluke", "87V", "DMM"),
+            shared(_certificate("DC Voltage"), "Fluke", "87V", "DMM"),
+            shared(_certificate("Resistance"), "Fluke", "87V", "DMM"),
+        )
+
+    results = asyncio.run(main())
+    assert len(calls) == 2
+    assert "Resistance" in results[2]["specifications"]
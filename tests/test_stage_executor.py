@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import pytest
+
+from stage_executor import StageExecutor, StageTimeoutError
+
+
+def test_timed_out_stage_keeps_its_slot_until_its_thread_exits():
+    executor = StageExecutor(concurrency={"analysis": 1}, timeouts={"analysis": 0.05})
+    release = threading.Event()
+
+    async def main():
+        with pytest.raises(StageTimeoutError):
+            await executor.run("analysis", release.wait, 5)
+        assert executor.stats()["analysis"]["active"] == 1
+
+        second = asyncio.create_task(executor.run("analysis", lambda: "done"))
+        await asyncio.sleep(0.2)
+        assert not second.done()
+        assert executor.stats()["analysis"]["waiting"] == 1
+
+        release.set()
+        assert await asyncio.wait_for(second, 1) == "done"
+        await asyncio.sleep(0)
+        assert executor.stats()["analysis"]["active"] == 0
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_cancelled_caller_keeps_the_slot_until_its_thread_exits():
+    executor = StageExecutor(concurrency={"research": 1})
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+
+    async def main():
+        first = asyncio.create_task(executor.run("research", work))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert executor.stats()["research"]["active"] == 1
+
+        release.set()
+        assert await asyncio.wait_for(executor.run("research", lambda: 1), 1) == 1
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,117 @@
+from tolerance_engine import parse_tolerance, parse_quantity, evaluate_certificate
+
+
+def test_unitless_term_in_percentage_expression_is_left_to_llm():
+    assert parse_tolerance("±(0.1% + 1)") is None
+    assert parse_tolerance("1% + 3") is None
+    assert parse_tolerance("3 + 1% of range") is None
+
+
+def test_percentage_expression_with_explicit_terms():
+    tolerance = parse_tolerance("±(0.1% + 1 digit)")
+    assert tolerance.pct_reading == 0.1
+    assert tolerance.digits == 1
+
+    tolerance = parse_tolerance("1% + 3 mV")
+    assert tolerance.pct_reading == 1
+    assert abs(tolerance.absolute - 0.003) < 1e-12
+
+
+def test_bare_number_without_percentage_is_absolute():
+    tolerance = parse_tolerance("0.5")
+    assert tolerance.absolute == 0.5
+    assert tolerance.absolute_scale is None
+
+
+def test_unitless_percentage_spec_is_not_decided_locally():
+    certificate = {"DC Voltage": [{"nominal": "1 V", "tolerance": "0.01 V"}]}
+    specifications = {"DC Voltage": {"accuracy": "1% + 3"}}
+    result = evaluate_certificate(certificate, specifications)
+    assert result["decided"] == 0
+    assert result["undecided"] == 1
+
+
+def _evaluate(applied, resolution="0.001 V"):
+    certificate = {"DC Voltage": [{"nominal": "1 V", "tolerance": applied, "resolution": resolution}]}
+    specifications = {"DC Voltage": {"accuracy": "±0.002 V"}}
+    result = evaluate_certificate(certificate, specifications)
+    assert result["decided"] == 1
+    return result["calculations"][0]
+
+
+def test_applied_tolerance_wider_than_specification_is_flagged():
+    calculation = _evaluate("0.0025 V")
+    assert calculation["equivalent"] is False
+    assert "wider than the specification" in calculation["explanation"]
+
+
+def test_applied_tolerance_equal_to_specification_is_equivalent():
+    assert _evaluate("0.002 V")["equivalent"] is True
+
+
+def test_applied_tolerance_may_round_down_to_resolution():
+    certificate = {"DC Voltage": [{"nominal": "1 V", "tolerance": "0.002 V", "resolution": "0.001 V"}]}
+    specifications = {"DC Voltage": {"accuracy": "±0.0025 V"}}
+    assert evaluate_certificate(certificate, specifications)["calculations"][0]["equivalent"] is True
+    assert _evaluate("0.001 V")["equivalent"] is False
+
+
+def _evaluate_limits(lower, upper):
+    certificate = {"DC Voltage": [{"nominal": "10 V", "lower limit": lower, "upper limit": upper}]}
+    specifications = {"DC Voltage": {"accuracy": "±0.02 V"}}
+    result = evaluate_certificate(certificate, specifications)
+    assert result["decided"] == 1
+    return result["calculations"][0]
+
+
+def test_symmetric_limits_match_specification():
+    assert _evaluate_limits("9.98 V", "10.02 V")["equivalent"] is True
+
+
+def test_asymmetric_limits_are_judged_by_each_side():
+    wider = _evaluate_limits("9.99 V", "10.03 V")
+    assert wider["equivalent"] is False
+    assert wider["applied_tolerance"] == "-0.01 V/+0.03 V"
+    assert "wider than the specification" in wider["explanation"]
+    assert _evaluate_limits("9.99 V", "10.02 V")["equivalent"] is False
+
+
+def test_range_dependent_spec_without_point_range_is_left_to_llm():
+    specifications = {"specifications": {"DC Voltage": [
+        {"range": "2 V", "accuracy": "0.05% + 0.1% of range"},
+        {"range": "20 V", "accuracy": "0.05% + 0.1% of range"},
+    ]}}
+    certificate = {"DC Voltage": [{"nominal": "1 V", "tolerance": "0.0205 V"}]}
+    assert evaluate_certificate(certificate, specifications)["decided"] == 0
+
+    certificate = {"DC Voltage": [{"nominal": "1 V", "tolerance": "0.0205 V", "range": "20 V"}]}
+    result = evaluate_certificate(certificate, specifications)
+    assert result["decided"] == 1
+    assert result["calculations"][0]["equivalent"] is True
+
+
+def test_range_independent_spec_is_shared_by_every_range():
+    specifications = {"specifications": {"DC Voltage": [
+        {"range": "2 V", "accuracy": "±0.002 V"},
+        {"range": "20 V", "accuracy": "±0.002 V"},
+    ]}}
+    certificate = {"DC Voltage": [{"nominal": "1 V", "tolerance": "0.002 V"}]}
+    assert evaluate_certificate(certificate, specifications)["decided"] == 1
+
+
+def test_spans_have_no_single_value_unless_they_start_at_zero():
+    assert parse_quantity("-10...10 V") is None
+    assert parse_quantity("9.98 to 10.02 V") is None
+    assert parse_quantity("0 to 20 V") == (20.0, "v", 1.0)
+    assert parse_quantity("-5 V") == (-5.0, "v", 1.0)
+
+
+def test_limit_fields_are_limits_not_tolerances():
+    specifications = {"DC Voltage": {"accuracy": "±0.02 V"}}
+    single = {"DC Voltage": [{"nominal": "10 V", "limit": "10.02 V"}]}
+    assert evaluate_certificate(single, specifications)["decided"] == 0
+
+    span = {"DC Voltage": [{"nominal": "10 V", "limits": "9.98 to 10.02 V"}]}
+    result = evaluate_certificate(span, specifications)
+    assert result["decided"] == 1
+    assert result["calculations"][0]["equivalent"] is True
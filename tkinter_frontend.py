@@ -5,7 +5,11 @@ from tkinter import filedialog, scrolledtext, ttk, messagebox
 import requests
 import threading
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Setup logging
 logging.basicConfig(
@@ -18,6 +22,213 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Batch queue columns: (column id, heading, width)
+BATCH_COLUMNS = (
+    ("file", "File", 360),
+    ("status", "Status", 120),
+    ("elapsed", "Elapsed", 80),
+    ("verdict", "Verdict", 110),
+    ("confidence", "Confidence", 90),
+)
+BATCH_DONE_STATUSES = ("Completed", "Failed", "Cancelled")
+MAX_BATCH_WORKERS = 16
+# Seconds to upload a certificate to /jobs, and (connect, read) for a re-analysis, which runs on the request
+SUBMIT_TIMEOUT = 120
+REANALYZE_TIMEOUT = (10, 900)
+
+# Result tables: (key, heading, width); the last column's full text is shown below the table
+CALCULATION_COLUMNS = (
+    ("instrument", "Instrument", 140),
+    ("parameter", "Parameter", 150),
+    ("nominal", "Nominal", 90),
+    ("spec_tolerance", "Spec Tolerance", 150),
+    ("applied_tolerance", "Applied Tolerance", 150),
+    ("equivalent", "Equivalent", 80),
+    ("explanation", "Explanation", 320),
+)
+DISCREPANCY_COLUMNS = (
+    ("instrument", "Instrument", 140),
+    ("parameter", "Parameter", 150),
+    ("nominal", "Nominal", 90),
+    ("spec_tolerance", "Spec Tolerance", 150),
+    ("applied_tolerance", "Applied Tolerance", 150),
+    ("issue", "Issue", 400),
+)
+
+# Rendering is split into slices scheduled through root.after so large results never block the UI
+RENDER_CHUNK_ROWS = 100
+RENDER_CHUNK_CHARS = 32768
+# Rows added to a table each time it is scrolled to the end
+TABLE_PAGE_ROWS = 300
+MAX_CELL_CHARS = 200
+
+def create_session(pool_size=MAX_BATCH_WORKERS, retries=3, backoff_factor=1.0, retry_post=False):
+    """
+    HTTP session with pooled keep-alive connections and retry with backoff on transient errors
+
+    Failed connections are retried for every method. Error responses are only retried for
+    GET, and for POST when retry_post is set, which is only safe for job submission:
+    identical submissions are coalesced or served from the result cache.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"] if retry_post else ["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _sort_key(value):
+    """Sort numbers (including values with units, e.g. "0.5 V") numerically, everything else as text"""
+    text = str(value if value is not None else "")
+    number = text.strip().split(" ")[0].lstrip("±+")
+    try:
+        return (0, float(number), text.lower())
+    except ValueError:
+        return (1, 0.0, text.lower())
+
+class LazyTable:
+    """
+    Sortable, filterable Treeview for large lists of result rows.
+    
+    Rows are inserted in chunks through root.after, and only as far as the user has
+    scrolled: a page of rows is added each time the view reaches the end. Click a
+    heading to sort by it; the filter matches any column.
+    """
+    
+    def __init__(self, root, parent, columns):
+        self.root = root
+        self.columns = columns
+        self.rows = []
+        self.view = []
+        self.rendered = 0
+        self.target = 0
+        self.sort_column = None
+        self.sort_reverse = False
+        self._search_text = None
+        self._job = None
+        self._filter_job = None
+        
+        toolbar = ttk.Frame(parent)
+        toolbar.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(toolbar, text="Filter:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", self._schedule_filter)
+        ttk.Entry(toolbar, textvariable=self.filter_var, width=40).pack(side=tk.LEFT, padx=5)
+        self.count_var = tk.StringVar(value="No rows")
+        ttk.Label(toolbar, textvariable=self.count_var).pack(side=tk.RIGHT)
+        
+        table_frame = ttk.Frame(parent)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(table_frame, columns=[key for key, _, _ in columns], show="headings")
+        for key, heading, width in columns:
+            self.tree.heading(key, text=heading, command=lambda key=key: self.sort_by(key))
+            self.tree.column(key, width=width, stretch=(key == columns[-1][0]))
+        self.scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Full text of the selected row's last column
+        self.detail_text = scrolledtext.ScrolledText(parent, wrap=tk.WORD, height=4)
+        self.detail_text.pack(fill=tk.X, padx=5, pady=5)
+        self.tree.bind("<<TreeviewSelect>>", self._show_detail)
+    
+    def set_rows(self, rows):
+        self.rows = rows
+        self._search_text = None
+        self._apply()
+    
+    def sort_by(self, key):
+        """Sort by a column; clicking the same heading again reverses the order"""
+        self.sort_reverse = not self.sort_reverse if self.sort_column == key else False
+        self.sort_column = key
+        for column, heading, _ in self.columns:
+            arrow = (" \u25bc" if self.sort_reverse else " \u25b2") if column == key else ""
+            self.tree.heading(column, text=heading + arrow)
+        self._apply()
+    
+    def _schedule_filter(self, *args):
+        # Wait for a pause in typing before filtering large tables
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(250, self._apply)
+    
+    def _apply(self):
+        """Rebuild the filtered, sorted view and start rendering it from the top"""
+        self._filter_job = None
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        
+        text = self.filter_var.get().strip().lower()
+        if text:
+            if self._search_text is None:
+                self._search_text = [
+                    " ".join(str(row.get(key, "")) for key, _, _ in self.columns).lower() for row in self.rows
+                ]
+            view = [index for index, search_text in enumerate(self._search_text) if text in search_text]
+        else:
+            view = list(range(len(self.rows)))
+        if self.sort_column is not None:
+            view.sort(key=lambda index: _sort_key(self.rows[index].get(self.sort_column)), reverse=self.sort_reverse)
+        
+        self.view = view
+        self.rendered = 0
+        self.target = 0
+        self.tree.delete(*self.tree.get_children())
+        self.detail_text.delete(1.0, tk.END)
+        self._extend()
+    
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) > 0.9:
+            self._extend()
+    
+    def _extend(self):
+        """Render the next page of rows unless one is already being rendered"""
+        if self._job is None and self.rendered < len(self.view):
+            self.target = min(len(self.view), self.rendered + TABLE_PAGE_ROWS)
+            self._insert_chunk()
+        self._update_count()
+    
+    def _insert_chunk(self):
+        end = min(self.target, self.rendered + RENDER_CHUNK_ROWS)
+        for position in range(self.rendered, end):
+            row = self.rows[self.view[position]]
+            values = []
+            for key, _, _ in self.columns:
+                value = " ".join(str(row.get(key, "")).split())
+                values.append(value if len(value) <= MAX_CELL_CHARS else value[:MAX_CELL_CHARS] + "...")
+            self.tree.insert("", tk.END, iid=str(position), values=values)
+        self.rendered = end
+        self._job = self.root.after(1, self._next_chunk) if end < self.target else None
+        self._update_count()
+    
+    def _next_chunk(self):
+        self._job = None
+        self._insert_chunk()
+    
+    def _update_count(self):
+        if not self.rows:
+            self.count_var.set("No rows")
+            return
+        shown = f"Showing {self.rendered} of {len(self.view)}"
+        self.count_var.set(shown if len(self.view) == len(self.rows) else f"{shown} (filtered from {len(self.rows)})")
+    
+    def _show_detail(self, event=None):
+        selection = self.tree.selection()
+        self.detail_text.delete(1.0, tk.END)
+        if selection:
+            row = self.rows[self.view[int(selection[0])]]
+            self.detail_text.insert(tk.END, str(row.get(self.columns[-1][0], "")))
+
 class CalibrationAnalyzerApp:
     def __init__(self, root):
         self.root = root
@@ -27,6 +238,24 @@ class CalibrationAnalyzerApp:
         # API URL
         self.api_url = "http://localhost:8000"  # Default API server URL
         
+        # File, run id and instructions of the last completed analysis, for re-analysis
+        self.last_run = None
+        
+        # Pooled sessions for every API call, single and batch; only job submissions retry POST
+        self.session = create_session()
+        self.job_session = create_session(retry_post=True)
+        
+        # Result shown in the tabs; heavy tabs are rendered when first opened
+        self.current_result = None
+        self.rendered_tabs = set()
+        self._text_jobs = {}
+        
+        # Batch queue state: Treeview item id -> file path, status, timings and result
+        self.batch_items = {}
+        self.batch_lock = threading.Lock()
+        self.batch_cancel = threading.Event()
+        self.batch_running = False
+        
         # Setup UI components
         self.setup_ui()
     
@@ -76,6 +305,7 @@ class CalibrationAnalyzerApp:
         # Results notebook
         notebook = ttk.Notebook(main_frame)
         notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.notebook = notebook
         
         # Full response tab
         response_frame = ttk.Frame(notebook)
@@ -128,15 +358,25 @@ class CalibrationAnalyzerApp:
         calc_frame = ttk.Frame(notebook)
         notebook.add(calc_frame, text="Calculations")
         
-        self.calculations_text = scrolledtext.ScrolledText(calc_frame, wrap=tk.WORD)
-        self.calculations_text.pack(fill=tk.BOTH, expand=True)
+        self.calculations_table = LazyTable(self.root, calc_frame, CALCULATION_COLUMNS)
         
         # Discrepancies tab
         disc_frame = ttk.Frame(notebook)
         notebook.add(disc_frame, text="Discrepancies")
         
-        self.discrepancies_text = scrolledtext.ScrolledText(disc_frame, wrap=tk.WORD)
-        self.discrepancies_text.pack(fill=tk.BOTH, expand=True)
+        self.discrepancies_table = LazyTable(self.root, disc_frame, DISCREPANCY_COLUMNS)
+        
+        # Render the heavy tabs only when they are opened
+        self.tab_renderers = {
+            str(response_frame): self._render_full_response,
+            str(spec_frame): self._render_specifications,
+            str(calc_frame): self._render_calculations,
+            str(disc_frame): self._render_discrepancies,
+        }
+        notebook.bind("<<NotebookTabChanged>>", self._render_current_tab)
+        
+        # Batch queue tab
+        self.setup_batch_tab(notebook)
         
         # Debug log tab
         log_frame = ttk.Frame(notebook)
@@ -178,12 +418,7 @@ class CalibrationAnalyzerApp:
         custom_instructions = self.custom_instructions_text.get("1.0", tk.END).strip()
         
         # Clear previous results
-        self.response_text.delete(1.0, tk.END)
-        self.calculations_text.delete(1.0, tk.END)
-        self.discrepancies_text.delete(1.0, tk.END)
-        self.summary_text.delete(1.0, tk.END)
-        self.verdict_var.set("N/A")
-        self.confidence_var.set("N/A")
+        self.clear_results()
         
         # Start analysis in a separate thread
         self.update_status("Analysis started...")
@@ -191,75 +426,39 @@ class CalibrationAnalyzerApp:
         self.analyze_button.config(state=tk.DISABLED)
         threading.Thread(target=self._analysis_thread, args=(file_path, custom_instructions), daemon=True).start()
     
+    def clear_results(self):
+        self.current_result = None
+        self.rendered_tabs = set()
+        self._text_jobs = {}
+        self.response_text.delete(1.0, tk.END)
+        self.spec_text.delete(1.0, tk.END)
+        self.calculations_table.set_rows([])
+        self.discrepancies_table.set_rows([])
+        self.summary_text.delete(1.0, tk.END)
+        self.verdict_var.set("N/A")
+        self.confidence_var.set("N/A")
+    
     def _analysis_thread(self, file_path, custom_instructions):
         try:
-            # Prepare the API request
-            with open(file_path, 'rb') as f:
-                files = {'certificate_file': (os.path.basename(file_path), f, 'application/pdf')}
-                
-                data = {}
-                if custom_instructions:
-                    data['custom_instructions'] = custom_instructions
-                
-                # Log the request
-                self.log_message(f"Sending request to API: {self.api_url}/analyze")
-                self.log_message(f"File: {os.path.basename(file_path)}")
-                if custom_instructions:
-                    self.log_message(f"Custom instructions: {custom_instructions}")
-                
-                # Send the request to the API
-                response = requests.post(
-                    f"{self.api_url}/analyze",
-                    files=files,
-                    data=data
-                )
-                
-                # Log the response status
-                self.log_message(f"Response status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    # Parse the JSON response
-                    result = response.json()
-                    
-                    # Display the full response
-                    self.root.after(0, lambda: self.response_text.insert(tk.END, json.dumps(result, indent=2)))
-                    
-                    # Update the verdict display
-                    if "verdict" in result:
-                        self.root.after(0, lambda: self.verdict_var.set(result["verdict"]))
-                    
-                    if "confidence" in result:
-                        self.root.after(0, lambda: self.confidence_var.set(result["confidence"]))
-                    
-                    if "summary" in result:
-                        self.root.after(0, lambda: self.summary_text.insert(tk.END, result["summary"]))
-                    
-                    # Extract and display specification sources
-                    if "spec_source" in result:
-                        self.root.after(0, lambda: self.spec_source_var.set(result["spec_source"]))
-                    
-                    # Update specifications tab with formatted specification information
-                    if "specifications" in result:
-                        specs_formatted = self._format_specifications(result["specifications"])
-                        self.root.after(0, lambda: self.spec_text.insert(tk.END, specs_formatted))
-                    
-                    # Update calculations tab
-                    if "calculations" in result and result["calculations"]:
-                        calc_text = self._format_calculations(result["calculations"])
-                        self.root.after(0, lambda: self.calculations_text.insert(tk.END, calc_text))
-                    
-                    # Update discrepancies tab
-                    if "discrepancies" in result and result["discrepancies"]:
-                        disc_text = self._format_discrepancies(result["discrepancies"])
-                        self.root.after(0, lambda: self.discrepancies_text.insert(tk.END, disc_text))
-                    
-                    self.update_status("Analysis completed successfully")
-                else:
-                    # Display the error
-                    error_message = f"API Error: {response.status_code} - {response.text}"
-                    self.log_message(error_message, level=logging.ERROR)
-                    self.root.after(0, lambda: self.response_text.insert(tk.END, error_message))
-                    self.update_status(f"Error: {response.status_code}")
+            result = None
+            # When only the instructions changed since the last run of this file, re-run just the analysis stage
+            last_run = self.last_run
+            if (last_run and last_run["run_id"] and last_run["file_path"] == file_path
+                    and last_run["mtime"] == os.path.getmtime(file_path)
+                    and last_run["custom_instructions"] != custom_instructions):
+                result = self._reanalyze(last_run["run_id"], custom_instructions)
+            if result is None:
+                result = self._submit_job(file_path, custom_instructions)
+            
+            if result is not None:
+                self.last_run = {
+                    "file_path": file_path,
+                    "mtime": os.path.getmtime(file_path),
+                    "run_id": result.get("run_id"),
+                    "custom_instructions": custom_instructions,
+                }
+                self._display_result(result)
+                self.update_status("Analysis completed successfully")
             
         except Exception as e:
             self.log_message(f"Error during analysis: {str(e)}", level=logging.ERROR)
@@ -272,30 +471,401 @@ class CalibrationAnalyzerApp:
             self.root.after(0, self.progress.stop)
             self.root.after(0, lambda: self.analyze_button.config(state=tk.NORMAL))
     
-    def _format_calculations(self, calculations):
-        """Format calculations list for display"""
-        text = "CALCULATIONS:\n\n"
-        for i, calc in enumerate(calculations):
-            text += f"Calculation {i+1}:\n"
-            text += f"  Parameter: {calc.get('parameter', 'N/A')}\n"
-            text += f"  Nominal: {calc.get('nominal', 'N/A')}\n"
-            text += f"  Spec Tolerance: {calc.get('spec_tolerance', 'N/A')}\n"
-            text += f"  Applied Tolerance: {calc.get('applied_tolerance', 'N/A')}\n"
-            text += f"  Equivalent: {calc.get('equivalent', 'N/A')}\n"
-            text += f"  Explanation: {calc.get('explanation', 'N/A')}\n\n"
-        return text
-    
-    def _format_discrepancies(self, discrepancies):
-        """Format discrepancies list for display"""
-        text = "DISCREPANCIES:\n\n"
-        for i, disc in enumerate(discrepancies):
-            text += f"Discrepancy {i+1}:\n"
-            text += f"  Parameter: {disc.get('parameter', 'N/A')}\n"
-            text += f"  Nominal: {disc.get('nominal', 'N/A')}\n"
-            text += f"  Spec Tolerance: {disc.get('spec_tolerance', 'N/A')}\n"
-            text += f"  Applied Tolerance: {disc.get('applied_tolerance', 'N/A')}\n"
-            text += f"  Issue: {disc.get('issue', 'N/A')}\n\n"
-        return text
+    def _reanalyze(self, run_id, custom_instructions):
+        """Re-analyze a stored run with new instructions; returns None when the run is gone"""
+        self.log_message(f"Instructions changed, re-analyzing run {run_id}: {self.api_url}/runs/{run_id}/reanalyze")
+        self.update_status("Re-running analysis with new instructions...")
+        response = self.session.post(
+            f"{self.api_url}/runs/{run_id}/reanalyze",
+            json={"custom_instructions": custom_instructions or None},
+            timeout=REANALYZE_TIMEOUT
+        )
+        self.log_message(f"Response status: {response.status_code}")
+        
+        if response.status_code == 404:
+            self.log_message("Run no longer stored, submitting the certificate again")
+            return None
+        response.raise_for_status()
+        result = response.json()
+        reanalysis = result.get("reanalysis", {})
+        self.log_message(f"Re-ran {', '.join(reanalysis.get('rerun', [])) or 'nothing'}; "
+                         f"reused {', '.join(reanalysis.get('reused', [])) or 'nothing'}")
+        return result
+    
+    def _submit_job(self, file_path, custom_instructions):
+        """Submit the certificate as a background job and wait for its result; returns None on failure"""
+        # Prepare the API request
+        with open(file_path, 'rb') as f:
+            files = {'certificate_file': (os.path.basename(file_path), f, 'application/pdf')}
+            
+            data = {}
+            if custom_instructions:
+                data['custom_instructions'] = custom_instructions
+            
+            # Log the request
+            self.log_message(f"Submitting job to API: {self.api_url}/jobs")
+            self.log_message(f"File: {os.path.basename(file_path)}")
+            if custom_instructions:
+                self.log_message(f"Custom instructions: {custom_instructions}")
+            
+            # Submit the certificate as a background job
+            response = self.job_session.post(
+                f"{self.api_url}/jobs",
+                files=files,
+                data=data,
+                timeout=SUBMIT_TIMEOUT
+            )
+        
+        # Log the response status
+        self.log_message(f"Response status: {response.status_code}")
+        
+        if response.status_code == 202:
+            job_id = response.json()["job_id"]
+            self.log_message(f"Job queued: {job_id}")
+            job = self._wait_for_job(job_id)
+            
+            if job["status"] == "completed":
+                return job["artifacts"]["result"]
+            
+            # Display the job error
+            error_message = f"Analysis failed: {job.get('error')}"
+            self.log_message(error_message, level=logging.ERROR)
+            self.root.after(0, lambda: self.response_text.insert(tk.END, error_message))
+            self.update_status("Error: analysis failed")
+        else:
+            # Display the error
+            error_message = f"API Error: {response.status_code} - {response.text}"
+            self.log_message(error_message, level=logging.ERROR)
+            self.root.after(0, lambda: self.response_text.insert(tk.END, error_message))
+            self.update_status(f"Error: {response.status_code}")
+        return None
+    
+    def _display_result(self, result):
+        # Log where the time and LLM budget went
+        if "timings" in result:
+            self.log_message(self._format_timings(result["timings"]))
+        
+        # Widgets are only touched on the UI thread
+        self.root.after(0, lambda: self._show_result(result))
+    
+    def _show_result(self, result):
+        """Fill in the cheap verdict fields now; the other tabs render when they are opened"""
+        self.current_result = result
+        self.rendered_tabs = set()
+        
+        # Update the verdict display
+        if "verdict" in result:
+            self.verdict_var.set(result["verdict"])
+        
+        if "confidence" in result:
+            self.confidence_var.set(result["confidence"])
+        
+        if "summary" in result:
+            self.summary_text.insert(tk.END, result["summary"])
+        
+        # Extract and display specification sources
+        if "spec_source" in result:
+            self.spec_source_var.set(result["spec_source"])
+        
+        self._render_current_tab()
+    
+    def _render_current_tab(self, event=None):
+        tab = self.notebook.select()
+        renderer = self.tab_renderers.get(tab)
+        if renderer is not None and self.current_result is not None and tab not in self.rendered_tabs:
+            self.rendered_tabs.add(tab)
+            renderer(self.current_result)
+    
+    def _render_full_response(self, result):
+        self._insert_text_chunked(self.response_text, json.dumps(result, indent=2))
+    
+    def _render_specifications(self, result):
+        if "specifications" in result:
+            self._insert_text_chunked(self.spec_text, self._format_specifications(result["specifications"]))
+    
+    def _render_calculations(self, result):
+        self.calculations_table.set_rows(result.get("calculations") or [])
+    
+    def _render_discrepancies(self, result):
+        self.discrepancies_table.set_rows(result.get("discrepancies") or [])
+    
+    def _insert_text_chunked(self, widget, text, start=0):
+        """Insert text into a text widget in slices, one per root.after tick"""
+        if start == 0:
+            widget.delete(1.0, tk.END)
+            self._text_jobs[widget] = text
+        elif self._text_jobs.get(widget) is not text:
+            # Superseded by a newer result or cleared
+            return
+        widget.insert(tk.END, text[start:start + RENDER_CHUNK_CHARS])
+        if start + RENDER_CHUNK_CHARS < len(text):
+            self.root.after(1, self._insert_text_chunked, widget, text, start + RENDER_CHUNK_CHARS)
+        else:
+            self._text_jobs.pop(widget, None)
+    
+    def _wait_for_job(self, job_id, poll_interval=1.0, on_stage=None, cancel_event=None):
+        """
+        Poll the job until it finishes, reporting each stage transition in the status bar
+        
+        on_stage(stage), if given, is called on stage transitions instead. Returns None when
+        cancel_event is set before the job finishes.
+        """
+        last_stage = None
+        started = time.time()
+        while True:
+            response = self.session.get(f"{self.api_url}/jobs/{job_id}", timeout=30)
+            response.raise_for_status()
+            job = response.json()
+            
+            if job["status"] in ("completed", "failed"):
+                if on_stage is None:
+                    self.log_message(f"Job {job['status']} in {job.get('duration')}s (queued {job.get('queue_wait')}s)")
+                return job
+            
+            stage = job.get("stage") or job["status"]
+            if on_stage is not None:
+                if stage != last_stage:
+                    on_stage(stage)
+                    last_stage = stage
+            else:
+                if stage != last_stage:
+                    self.log_message(f"Job stage: {stage}")
+                    last_stage = stage
+                elapsed = time.time() - started
+                self.update_status(f"Running: {stage} ({elapsed:.0f}s)")
+            if cancel_event is None:
+                time.sleep(poll_interval)
+            elif cancel_event.wait(poll_interval):
+                return None
+    
+    def setup_batch_tab(self, notebook):
+        batch_frame = ttk.Frame(notebook)
+        notebook.add(batch_frame, text="Batch Queue")
+        
+        toolbar = ttk.Frame(batch_frame, padding="5")
+        toolbar.pack(fill=tk.X)
+        
+        ttk.Button(toolbar, text="Add Files...", command=self.add_batch_files).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Add Folder...", command=self.add_batch_folder).pack(side=tk.LEFT, padx=2)
+        self.batch_start_button = ttk.Button(toolbar, text="Start Batch", command=self.start_batch)
+        self.batch_start_button.pack(side=tk.LEFT, padx=2)
+        self.batch_cancel_button = ttk.Button(toolbar, text="Cancel", command=self.cancel_batch, state=tk.DISABLED)
+        self.batch_cancel_button.pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Clear Finished", command=self.clear_finished_batch_items).pack(side=tk.LEFT, padx=2)
+        
+        ttk.Label(toolbar, text="Workers:").pack(side=tk.LEFT, padx=(15, 2))
+        self.batch_workers_var = tk.IntVar(value=4)
+        ttk.Spinbox(toolbar, from_=1, to=MAX_BATCH_WORKERS, width=4,
+                    textvariable=self.batch_workers_var).pack(side=tk.LEFT)
+        
+        self.batch_summary_var = tk.StringVar(value="No files queued")
+        ttk.Label(toolbar, textvariable=self.batch_summary_var).pack(side=tk.RIGHT, padx=5)
+        
+        table_frame = ttk.Frame(batch_frame)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+        self.batch_tree = ttk.Treeview(table_frame, columns=[column for column, _, _ in BATCH_COLUMNS],
+                                       show="headings", selectmode="browse")
+        for column, heading, width in BATCH_COLUMNS:
+            self.batch_tree.heading(column, text=heading)
+            self.batch_tree.column(column, width=width, stretch=(column == "file"))
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.batch_tree.yview)
+        self.batch_tree.configure(yscrollcommand=scrollbar.set)
+        self.batch_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Double-click a finished file to show its result in the other tabs
+        self.batch_tree.bind("<Double-1>", self.show_batch_result)
+    
+    def add_batch_files(self):
+        file_paths = filedialog.askopenfilenames(
+            title="Select Certificate PDFs",
+            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
+        )
+        self._queue_batch_files(file_paths)
+    
+    def add_batch_folder(self):
+        folder = filedialog.askdirectory(title="Select Folder of Certificate PDFs")
+        if not folder:
+            return
+        file_paths = []
+        for directory, subdirectories, filenames in os.walk(folder):
+            subdirectories.sort()
+            file_paths.extend(os.path.join(directory, name) for name in sorted(filenames) if name.lower().endswith(".pdf"))
+        self._queue_batch_files(file_paths)
+    
+    def _queue_batch_files(self, file_paths):
+        queued = {item["path"] for item in self.batch_items.values()}
+        added = 0
+        for file_path in file_paths:
+            if file_path in queued:
+                continue
+            item_id = self.batch_tree.insert("", tk.END, values=(file_path, "Queued", "", "", ""))
+            self.batch_items[item_id] = {"path": file_path, "status": "Queued", "started": None, "finished": None,
+                                         "verdict": "", "confidence": "", "result": None, "error": None}
+            added += 1
+        if added:
+            self.log_message(f"Queued {added} files for batch analysis")
+        self._update_batch_summary()
+    
+    def start_batch(self):
+        if self.batch_running:
+            return
+        self.api_url = self.api_url_var.get()
+        if not self.api_url:
+            messagebox.showerror("Error", "Please enter API URL")
+            return
+        item_ids = [item_id for item_id, item in self.batch_items.items() if item["status"] != "Completed"]
+        if not item_ids:
+            messagebox.showinfo("Batch", "No files waiting; add files or a folder first")
+            return
+        
+        workers = max(1, min(MAX_BATCH_WORKERS, self.batch_workers_var.get()))
+        custom_instructions = self.custom_instructions_text.get("1.0", tk.END).strip()
+        for item_id in item_ids:
+            self._set_batch_item(item_id, status="Queued", started=None, finished=None, verdict="", confidence="",
+                                 result=None, error=None)
+        
+        self.batch_running = True
+        self.batch_cancel.clear()
+        self.batch_start_button.config(state=tk.DISABLED)
+        self.batch_cancel_button.config(state=tk.NORMAL)
+        self.log_message(f"Starting batch of {len(item_ids)} files with {workers} workers")
+        threading.Thread(target=self._batch_thread, args=(item_ids, workers, custom_instructions), daemon=True).start()
+        self._tick_batch_table()
+    
+    def cancel_batch(self):
+        """Stop submitting queued files and stop waiting for the ones in progress"""
+        if self.batch_running:
+            self.log_message("Cancelling batch...")
+            self.batch_cancel.set()
+            self.batch_cancel_button.config(state=tk.DISABLED)
+    
+    def clear_finished_batch_items(self):
+        for item_id, item in list(self.batch_items.items()):
+            if item["status"] in BATCH_DONE_STATUSES:
+                self.batch_tree.delete(item_id)
+                del self.batch_items[item_id]
+        self._update_batch_summary()
+    
+    def _batch_thread(self, item_ids, workers, custom_instructions):
+        started = time.time()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for item_id in item_ids:
+                    pool.submit(self._process_batch_item, item_id, custom_instructions)
+        finally:
+            counts = {}
+            for item_id in item_ids:
+                status = self.batch_items[item_id]["status"] if item_id in self.batch_items else "Removed"
+                counts[status] = counts.get(status, 0) + 1
+            self.log_message(f"Batch finished in {time.time() - started:.0f}s: "
+                             + ", ".join(f"{count} {status.lower()}" for status, count in counts.items()))
+            self.root.after(0, self._finish_batch)
+    
+    def _finish_batch(self):
+        self.batch_running = False
+        self.batch_start_button.config(state=tk.NORMAL)
+        self.batch_cancel_button.config(state=tk.DISABLED)
+        self._update_batch_summary()
+    
+    def _process_batch_item(self, item_id, custom_instructions):
+        """Submit one queued file as a job and follow it to completion (runs on a batch worker thread)"""
+        if self.batch_cancel.is_set():
+            self._set_batch_item(item_id, status="Cancelled")
+            return
+        file_path = self.batch_items[item_id]["path"]
+        self._set_batch_item(item_id, status="Submitting", started=time.time())
+        try:
+            with open(file_path, 'rb') as f:
+                data = {'custom_instructions': custom_instructions} if custom_instructions else {}
+                response = self.job_session.post(
+                    f"{self.api_url}/jobs",
+                    files={'certificate_file': (os.path.basename(file_path), f, 'application/pdf')},
+                    data=data,
+                    timeout=SUBMIT_TIMEOUT
+                )
+            response.raise_for_status()
+            job = self._wait_for_job(
+                response.json()["job_id"],
+                on_stage=lambda stage: self._set_batch_item(item_id, status=stage.capitalize()),
+                cancel_event=self.batch_cancel
+            )
+            if job is None:
+                # The server finishes the job anyway; its result lands in the result cache
+                self._set_batch_item(item_id, status="Cancelled", finished=time.time())
+            elif job["status"] == "completed":
+                result = job["artifacts"]["result"]
+                self._set_batch_item(item_id, status="Completed", finished=time.time(), result=result,
+                                     verdict=result.get("verdict", ""), confidence=result.get("confidence", ""))
+            else:
+                self._set_batch_item(item_id, status="Failed", finished=time.time(), error=job.get("error"))
+                self.log_message(f"{os.path.basename(file_path)}: analysis failed: {job.get('error')}", level=logging.ERROR)
+        except Exception as e:
+            self._set_batch_item(item_id, status="Failed", finished=time.time(), error=str(e))
+            self.log_message(f"{os.path.basename(file_path)}: {str(e)}", level=logging.ERROR)
+    
+    def _set_batch_item(self, item_id, **changes):
+        """Update a queued file's state from any thread and refresh its row on the UI thread"""
+        with self.batch_lock:
+            self.batch_items[item_id].update(changes)
+        self.root.after(0, lambda: self._render_batch_item(item_id))
+    
+    def _render_batch_item(self, item_id):
+        item = self.batch_items.get(item_id)
+        if item is None:
+            return
+        elapsed = ""
+        if item["started"]:
+            elapsed = f"{(item['finished'] or time.time()) - item['started']:.0f}s"
+        self.batch_tree.item(item_id, values=(item["path"], item["status"], elapsed, item["verdict"], item["confidence"]))
+        self._update_batch_summary()
+    
+    def _tick_batch_table(self):
+        """Refresh elapsed times of running files once a second while a batch runs"""
+        for item_id, item in self.batch_items.items():
+            if item["started"] and not item["finished"]:
+                self._render_batch_item(item_id)
+        if self.batch_running:
+            self.root.after(1000, self._tick_batch_table)
+    
+    def _update_batch_summary(self):
+        counts = {}
+        for item in self.batch_items.values():
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        verdicts = {}
+        for item in self.batch_items.values():
+            if item["verdict"]:
+                verdicts[item["verdict"]] = verdicts.get(item["verdict"], 0) + 1
+        summary = ", ".join(f"{count} {status.lower()}" for status, count in counts.items()) or "No files queued"
+        if verdicts:
+            summary += " | " + ", ".join(f"{count} {verdict}" for verdict, count in verdicts.items())
+        self.batch_summary_var.set(summary)
+    
+    def show_batch_result(self, event=None):
+        selection = self.batch_tree.selection()
+        if not selection:
+            return
+        item = self.batch_items[selection[0]]
+        if item["result"] is None:
+            if item["error"]:
+                messagebox.showerror("Error", f"{os.path.basename(item['path'])}: {item['error']}")
+            return
+        self.clear_results()
+        self.log_message(f"Showing batch result for {item['path']}")
+        self._display_result(item["result"])
+    
+    def _format_timings(self, timings):
+        """Format the per-stage timings block of a result for the debug log"""
+        lines = [f"Timings: {timings.get('total_seconds')}s total, {timings.get('llm_requests', 0)} LLM requests, "
+                 f"~${timings.get('estimated_cost_usd', 0)} estimated"]
+        for stage, values in timings.get("stages", {}).items():
+            line = f"  {stage}: {values['seconds']}s (queued {values['queue_wait']}s, {values['calls']} calls)"
+            if values.get("llm_requests"):
+                line += f", ~{values['input_tokens']} in / {values['output_tokens']} out tokens"
+            lines.append(line)
+        for cache, outcome in timings.get("cache", {}).items():
+            lines.append(f"  {cache} cache: {outcome}")
+        return "\n".join(lines)
     
     def _format_specifications(self, specifications):
         """Format specifications for better display"""
@@ -303,16 +873,15 @@ class CalibrationAnalyzerApp:
             return specifications
         
         if isinstance(specifications, dict):
-            text = "DETAILED SPECIFICATIONS:\n\n"
+            lines = ["DETAILED SPECIFICATIONS:", ""]
             for param, details in specifications.items():
-                text += f"{param}:\n"
+                lines.append(f"{param}:")
                 if isinstance(details, dict):
-                    for key, value in details.items():
-                        text += f"  {key}: {value}\n"
+                    lines.extend(f"  {key}: {value}" for key, value in details.items())
                 else:
-                    text += f"  {details}\n"
-                text += "\n"
-            return text
+                    lines.append(f"  {details}")
+                lines.append("")
+            return "\n".join(lines) + "\n"
         
         return str(specifications)
     